@@ -14,7 +14,7 @@ import {
   Assessment,
   People,
 } from '@mui/icons-material';
-import { programsAPI, batchesAPI, batchTraineesAPI, progressAPI } from '../../services/api';
+import { dashboardAPI } from '../../services/api';
 
 const Dashboard = () => {
   const [stats, setStats] = useState({
@@ -28,18 +28,13 @@ const Dashboard = () => {
   useEffect(() => {
     const fetchStats = async () => {
       try {
-        const [programsRes, batchesRes, traineesRes, progressRes] = await Promise.all([
-          programsAPI.getAll(),
-          batchesAPI.getAll(),
-          batchTraineesAPI.getAll(),
-          progressAPI.getAll(),
-        ]);
+        const { data } = await dashboardAPI.getSummary();
 
         setStats({
-          programs: programsRes.data.length,
-          batches: batchesRes.data.length,
-          trainees: traineesRes.data.length,
-          progress: progressRes.data.length,
+          programs: data.programs.total,
+          batches: data.batches.total,
+          trainees: data.batch_trainees.total,
+          progress: data.progress_records.total,
         });
       } catch (error) {
         console.error('Error fetching dashboard stats:', error);
@@ -23,7 +23,7 @@ import {
   PersonAdd,
   Assessment,
 } from '@mui/icons-material';
-import { usersAPI, programsAPI, batchesAPI, batchTraineesAPI, progressAPI } from '../../services/api';
+import { usersAPI, dashboardAPI } from '../../services/api';
 import { useAuth } from '../../contexts/AuthContext';
 
 const SuperAdminDashboard = () => {
@@ -52,18 +52,13 @@ const SuperAdminDashboard = () => {
 
   const fetchStats = async () => {
     try {
-      const [programsRes, batchesRes, traineesRes, progressRes] = await Promise.all([
-        programsAPI.getAll(),
-        batchesAPI.getAll(),
-        batchTraineesAPI.getAll(),
-        progressAPI.getAll(),
-      ]);
+      const { data } = await dashboardAPI.getSummary();
 
       setStats({
-        programs: programsRes.data.length,
-        batches: batchesRes.data.length,
-        trainees: traineesRes.data.length,
-        progress: progressRes.data.length,
+        programs: data.programs.total,
+        batches: data.batches.total,
+        trainees: data.batch_trainees.total,
+        progress: data.progress_records.total,
       });
     } catch (error) {
       console.error('Error fetching dashboard stats:', error);
@@ -34,8 +34,8 @@ const TraineeDashboard = () => {
 
   const fetchClasses = async () => {
     try {
-      const response = await classesAPI.getAll();
-      setClasses(response.data);
+      const response = await classesAPI.getUpcoming({ hours: 168 });
+      setClasses(response.data.results);
     } catch (error) {
       console.error('Error fetching classes:', error);
     } finally {
@@ -68,16 +68,16 @@ const TraineeDashboard = () => {
           <Card>
             <CardContent>
               <Typography variant="h6" gutterBottom>
-                Available Classes
+                Upcoming Classes
               </Typography>
               {classes.length === 0 ? (
                 <Typography variant="body2" color="textSecondary">
-                  No classes available at the moment.
+                  No classes in the next 7 days.
                 </Typography>
               ) : (
                 <List>
                   {classes.map((classItem, index) => (
-                    <div key={classItem.id}>
+                    <div key={`${classItem.id}-${classItem.start}`}>
                       <ListItem>
                         <ListItemIcon>
                           <School color="primary" />
@@ -109,7 +109,7 @@ const TraineeDashboard = () => {
                                 <Box display="flex" alignItems="center" gap={0.5}>
                                   <AccessTime fontSize="small" color="action" />
                                   <Typography variant="body2">
-                                    {classItem.class_timings}
+                                    {new Date(classItem.start).toLocaleString([], { weekday: 'short', hour: '2-digit', minute: '2-digit' })}
                                   </Typography>
                                 </Box>
                               </Box>
@@ -21,7 +21,7 @@ import {
   VideoCall,
   Add,
 } from '@mui/icons-material';
-import { classesAPI, batchesAPI } from '../../services/api';
+import { classesAPI, dashboardAPI } from '../../services/api';
 import { useAuth } from '../../contexts/AuthContext';
 
 const TrainerDashboard = () => {
@@ -47,14 +47,11 @@ const TrainerDashboard = () => {
 
   const fetchStats = async () => {
     try {
-      const [classesRes, batchesRes] = await Promise.all([
-        classesAPI.getAll(),
-        batchesAPI.getAll(),
-      ]);
+      const { data } = await dashboardAPI.getSummary();
 
       setStats({
-        classes: classesRes.data.length,
-        batches: batchesRes.data.length,
+        classes: data.classes.total,
+        batches: data.batches.total,
       });
     } catch (error) {
       console.error('Error fetching dashboard stats:', error);
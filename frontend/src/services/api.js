@@ -59,6 +59,7 @@ export const usersAPI = {
   create: (user) => api.post('/users/', user),
   update: (id, user) => api.put(`/users/${id}/`, user),
   delete: (id) => api.delete(`/users/${id}/`),
+  import: (formData) => api.post('/users/import/', formData, { headers: { 'Content-Type': 'multipart/form-data' } }),
 };
 
 // Programs
@@ -87,6 +88,7 @@ export const batchTraineesAPI = {
   update: (id, batchTrainee) => api.put(`/batch-trainees/${id}/`, batchTrainee),
   delete: (id) => api.delete(`/batch-trainees/${id}/`),
   getMyBatches: () => api.get('/batch-trainees/?trainee=current_user'),
+  export: (params = {}) => api.get('/batch-trainees/export/', { params, responseType: 'blob' }),
 };
 
 // Progress Records
@@ -97,6 +99,8 @@ export const progressAPI = {
   update: (id, progress) => api.put(`/progress-records/${id}/`, progress),
   delete: (id) => api.delete(`/progress-records/${id}/`),
   getMyProgress: () => api.get('/progress-records/?trainee=current_user'),
+  bulkUpsert: (records) => api.post('/progress-records/bulk/', records),
+  export: (params = {}) => api.get('/progress-records/export/', { params, responseType: 'blob' }),
 };
 
 // Designations
@@ -115,6 +119,23 @@ export const classesAPI = {
   create: (classData) => api.post('/classes/', classData),
   update: (id, classData) => api.put(`/classes/${id}/`, classData),
   delete: (id) => api.delete(`/classes/${id}/`),
+  getUpcoming: (params = {}) => api.get('/classes/upcoming/', { params }),
+  getConflicts: (params = {}) => api.get('/classes/conflicts/', { params }),
+  getFreeSlots: (params = {}) => api.get('/classes/free-slots/', { params }),
+  getCalendar: (params = {}) => api.get('/classes/calendar/', { params, responseType: 'text' }),
+};
+
+// Dashboard
+export const dashboardAPI = {
+  getSummary: () => api.get('/dashboard/summary/'),
+  getCohortAnalytics: (params = {}) => api.get('/analytics/cohorts/', { params }),
+};
+
+// Compliance
+export const complianceAPI = {
+  getSummary: () => api.get('/compliance/'),
+  getDesignationMatrix: (designationId) => api.get('/compliance/', { params: { designation: designationId } }),
+  getTrainee: (traineeId) => api.get(`/compliance/trainees/${traineeId}/`),
 };
 
 export default api;
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Program, ProgramTopic, Batch, BatchTrainer, BatchTrainee, Designation, DesignationProgram, TraineeDesignation, ProgressRecord, AuditLog
+from .models import User, Program, ProgramTopic, Batch, BatchTrainer, BatchTrainee, Designation, DesignationProgram, TraineeDesignation, ProgressRecord, AuditLog, OutboxEmail
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
 @admin.register(User)
@@ -7,7 +7,10 @@ class UserAdmin(BaseUserAdmin):
     pass
 
 admin.site.register(Program)
-admin.site.register(ProgramTopic)
+@admin.register(ProgramTopic)
+class ProgramTopicAdmin(admin.ModelAdmin):
+    list_select_related = ('program',)
+
 admin.site.register(Batch)
 admin.site.register(BatchTrainer)
 admin.site.register(BatchTrainee)
@@ -16,3 +19,8 @@ admin.site.register(DesignationProgram)
 admin.site.register(TraineeDesignation)
 admin.site.register(ProgressRecord)
 admin.site.register(AuditLog)
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
@@ -3,4 +3,5 @@ class TrainingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "training"
     def ready(self):
+        import training.db  # noqa
         import training.signals  # noqa
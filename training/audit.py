@@ -0,0 +1,189 @@
+"""Buffered audit log writer.
+
+``audit_sink.record(**fields)`` replaces direct ``AuditLog.objects.create`` calls.
+How entries reach the database depends on ``settings.AUDIT_LOG_MODE``:
+
+``sync``
+    Every entry is inserted immediately, exactly like the old code path.
+``buffered`` (default)
+    Entries recorded inside a transaction are only queued once it commits (and
+    are dropped with it on rollback).  Inside an :meth:`AuditSink.buffered`
+    scope -- every request, via ``AuditBufferMiddleware`` -- queued entries are
+    written with a single ``bulk_create`` when the scope ends or the buffer
+    reaches ``AUDIT_LOG_MAX_BUFFER``.  Outside a scope they are written at once.
+``background``
+    Committed entries go to a queue drained by a daemon thread every
+    ``AUDIT_LOG_FLUSH_INTERVAL`` seconds or ``AUDIT_LOG_MAX_BUFFER`` entries.
+    :meth:`AuditSink.shutdown` (registered with ``atexit``) has the thread write
+    the entries it holds and writes what is left in the queue.
+
+``created_at`` is stamped when an entry is written, so in background mode it
+may lag the audited change by up to one flush interval.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .caching import bump_table_versions
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+MODES = ('sync', 'buffered', 'background')
+# Put on the queue by AuditSink.shutdown to stop the background thread.
+_STOP = object()
+
+
+class AuditSink:
+    def __init__(self, mode=None, flush_interval=None, max_buffer=None):
+        self._mode = mode
+        self._flush_interval = flush_interval
+        self._max_buffer = max_buffer
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._atexit_registered = False
+
+    # Settings are read lazily so ``override_settings`` works in tests.
+    @property
+    def mode(self):
+        mode = self._mode or getattr(settings, 'AUDIT_LOG_MODE', 'buffered')
+        return mode if mode in MODES else 'buffered'
+
+    @property
+    def flush_interval(self):
+        return self._flush_interval or getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 2.0)
+
+    @property
+    def max_buffer(self):
+        return self._max_buffer or getattr(settings, 'AUDIT_LOG_MAX_BUFFER', 500)
+
+    def record(self, **fields):
+        """Queue one ``AuditLog`` row built from ``fields``."""
+        entry = AuditLog(**fields)
+        if self.mode == 'sync':
+            self._write([entry])
+        elif connection.in_atomic_block:
+            transaction.on_commit(partial(self._enqueue, entry))
+        else:
+            self._enqueue(entry)
+
+    @contextmanager
+    def buffered(self):
+        """Collect committed entries and write them in one batch when the scope exits."""
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            self._local.buffer = []
+        self._local.depth = depth + 1
+        try:
+            yield self
+        finally:
+            self._local.depth -= 1
+            if not self._local.depth:
+                self.flush()
+                self._local.buffer = None
+
+    def flush(self):
+        """Write everything queued by this thread (and the background queue) now."""
+        entries = []
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer:
+            entries.extend(buffer)
+            buffer.clear()
+        entries.extend(self._drain())
+        if entries:
+            self._write(entries)
+        return len(entries)
+
+    def _enqueue(self, entry):
+        if self.mode == 'background':
+            self._ensure_worker()
+            self._queue.put(entry)
+            return
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            self._write([entry])
+            return
+        buffer.append(entry)
+        if len(buffer) >= self.max_buffer:
+            self.flush()
+
+    def _write(self, entries):
+        try:
+            if len(entries) == 1:
+                entries[0].save()
+            else:
+                AuditLog.objects.bulk_create(entries, batch_size=self.max_buffer)
+            bump_table_versions(AuditLog)
+        except Exception:
+            logger.exception('Failed to write %d audit log entries', len(entries))
+
+    def shutdown(self, timeout=None):
+        """Stop the background thread once it has written the entries it holds, then write the rest."""
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None and worker.is_alive():
+            self._queue.put(_STOP)
+            worker.join(self.flush_interval + 5 if timeout is None else timeout)
+        return self.flush()
+
+    def _drain(self, limit=None):
+        entries = []
+        while limit is None or len(entries) < limit:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                entries.append(entry)
+        return entries
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+            self._worker.start()
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if first is _STOP:
+                break
+            entries = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(entries) < self.max_buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                entries.append(entry)
+            close_old_connections()
+            self._write(entries)
+        connection.close()
+
+
+audit_sink = AuditSink()
@@ -0,0 +1,262 @@
+"""Monthly compressed archives for old audit log rows.
+
+``manage.py archive_audit_logs`` moves rows older than the retention period
+out of ``AuditLog`` into one file per calendar month (UTC) under
+``settings.AUDIT_ARCHIVE_DIR``:
+
+``audit-YYYY-MM.ndjson.gz``
+    One JSON object per row, ordered by ``(created_at, id)``.  The file is a
+    series of independent gzip members of up to ``block_rows`` rows each, so
+    ``zcat`` reads it whole and a single block can be decompressed on its own.
+``audit-YYYY-MM.idx.json``
+    The offset index: byte offset, length, row count and first/last timestamp
+    of every block, plus ``last_key``, the newest ``(created_at, id)`` archived.
+
+Rows are always archived in ``(created_at, id)`` order and only deleted from
+the table once their block and index are on disk.  If a run dies in between,
+the next run finds those rows at or below ``last_key`` and just deletes them,
+so nothing is archived twice.
+
+:class:`AuditTimeline` serves a time range newest first across the live table
+and the archives, decompressing only the blocks that overlap the range.
+"""
+import gzip
+import json
+import os
+from datetime import timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+
+from .caching import bump_table_versions
+from .models import AuditLog
+
+FIELDS = ('id', 'created_at', 'user_id', 'action', 'table_name', 'record_id',
+          'old_values', 'new_values', 'ip_address', 'user_agent')
+BLOCK_ROWS = 1000
+DELETE_CHUNK = 500
+
+
+def archive_dir():
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'audit_archive'))
+
+
+def _month(created_at):
+    return created_at.astimezone(dt_timezone.utc).strftime('%Y-%m')
+
+
+def _key(row):
+    return (row['created_at'], row['id'])
+
+
+def _parse(value):
+    return parse_datetime(value) if isinstance(value, str) else value
+
+
+class MonthArchive:
+    """The data file and offset index of one month."""
+
+    def __init__(self, root, month):
+        self.month = month
+        self.data_path = Path(root) / f'audit-{month}.ndjson.gz'
+        self.index_path = Path(root) / f'audit-{month}.idx.json'
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            if self.index_path.exists():
+                with open(self.index_path, encoding='utf-8') as f:
+                    self._index = json.load(f)
+            else:
+                self._index = {'month': self.month, 'blocks': [], 'last_key': None}
+        return self._index
+
+    @property
+    def last_key(self):
+        last = self.index['last_key']
+        return (_parse(last[0]), last[1]) if last else None
+
+    def end_offset(self):
+        blocks = self.index['blocks']
+        return blocks[-1]['offset'] + blocks[-1]['length'] if blocks else 0
+
+    def append(self, rows, block_rows=BLOCK_ROWS):
+        """Append ``rows`` (dicts ordered by ``(created_at, id)``) as new blocks and save the index."""
+        if not rows:
+            return
+        self.data_path.parent.mkdir(parents=True, exist_ok=True)
+        end = self.end_offset()
+        with open(self.data_path, 'ab') as f:
+            # Drop anything written after the last indexed block by an interrupted run.
+            f.truncate(end)
+            f.seek(end)
+            for start in range(0, len(rows), block_rows):
+                block = rows[start:start + block_rows]
+                payload = ''.join(self._line(row) for row in block)
+                data = gzip.compress(payload.encode('utf-8'), mtime=0)
+                f.write(data)
+                self.index['blocks'].append({
+                    'offset': end,
+                    'length': len(data),
+                    'rows': len(block),
+                    'first': block[0]['created_at'].isoformat(),
+                    'last': block[-1]['created_at'].isoformat(),
+                    'first_id': block[0]['id'],
+                    'last_id': block[-1]['id'],
+                })
+                end += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.index['last_key'] = [rows[-1]['created_at'].isoformat(), rows[-1]['id']]
+        tmp = self.index_path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.index_path)
+
+    @staticmethod
+    def _line(row):
+        # isoformat() keeps microseconds, which DjangoJSONEncoder would truncate.
+        row = {**row, 'created_at': row['created_at'].isoformat()}
+        return json.dumps(row, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
+
+    def read_block(self, block):
+        """Rows of one block, oldest first, as unsaved ``AuditLog`` instances."""
+        with open(self.data_path, 'rb') as f:
+            f.seek(block['offset'])
+            data = gzip.decompress(f.read(block['length']))
+        rows = []
+        for line in data.decode('utf-8').splitlines():
+            row = json.loads(line)
+            row['created_at'] = parse_datetime(row['created_at'])
+            rows.append(AuditLog(**row))
+        return rows
+
+
+def months(root=None):
+    """Archived months, oldest first."""
+    root = Path(root or archive_dir())
+    if not root.exists():
+        return []
+    return sorted(path.name[len('audit-'):-len('.idx.json')] for path in root.glob('audit-*.idx.json'))
+
+
+def archive_older_than(cutoff, batch_size=5000, block_rows=BLOCK_ROWS, root=None, stdout=None):
+    """Move audit rows created before ``cutoff`` into the monthly archives.
+
+    Returns ``{'archived': n, 'deleted': n, 'months': [...]}``.
+    """
+    root = root or archive_dir()
+    archives = {}
+    result = {'archived': 0, 'deleted': 0, 'months': set()}
+    while True:
+        # Every pass deletes what it read, so the oldest remaining rows are always next.
+        rows = list(AuditLog.objects.filter(created_at__lt=cutoff).order_by('created_at', 'id').values(*FIELDS)[:batch_size])
+        if not rows:
+            break
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(_month(row['created_at']), []).append(row)
+        for month, month_rows in by_month.items():
+            archive = archives.setdefault(month, MonthArchive(root, month))
+            last_key = archive.last_key
+            # Rows at or below last_key were archived by a run that died before deleting them.
+            fresh = [row for row in month_rows if last_key is None or _key(row) > last_key]
+            archive.append(fresh, block_rows)
+            result['archived'] += len(fresh)
+            result['months'].add(month)
+
+        ids = [row['id'] for row in rows]
+        for start in range(0, len(ids), DELETE_CHUNK):
+            deleted, _ = AuditLog.objects.filter(pk__in=ids[start:start + DELETE_CHUNK]).delete()
+            result['deleted'] += deleted
+        bump_table_versions(AuditLog)
+        if stdout is not None:
+            stdout.write(f"archived {result['archived']} rows, deleted {result['deleted']}, up to {rows[-1]['created_at'].isoformat()}")
+    result['months'] = sorted(result['months'])
+    return result
+
+
+class AuditTimeline:
+    """Audit rows in ``[start, end)`` newest first: the live ``queryset``, then the archives.
+
+    Archived rows are all older than live ones, so the two sources are simply
+    concatenated.  Supports ``len()`` and slicing, which is all page-number
+    pagination needs; only the archive blocks a page touches are decompressed.
+    """
+
+    def __init__(self, queryset, start=None, end=None, root=None):
+        self.queryset = queryset
+        self.start = start
+        self.end = end
+        self.root = root or archive_dir()
+        self._live_count = None
+        self._blocks = None
+        self._decoded = {}
+
+    def _in_range(self, created_at):
+        return (self.start is None or created_at >= self.start) and (self.end is None or created_at < self.end)
+
+    def _archive_blocks(self):
+        """``[(archive, block, rows in range)]`` newest block first."""
+        if self._blocks is None:
+            self._blocks = []
+            for month in reversed(months(self.root)):
+                archive = MonthArchive(self.root, month)
+                for block in reversed(archive.index['blocks']):
+                    first, last = parse_datetime(block['first']), parse_datetime(block['last'])
+                    if (self.end is not None and first >= self.end) or (self.start is not None and last < self.start):
+                        continue
+                    if self._in_range(first) and self._in_range(last):
+                        count = block['rows']
+                    else:
+                        count = len(self._rows(archive, block))
+                    self._blocks.append((archive, block, count))
+        return self._blocks
+
+    def _rows(self, archive, block):
+        """Rows of ``block`` within the range, newest first."""
+        key = (archive.month, block['offset'])
+        if key not in self._decoded:
+            rows = [row for row in archive.read_block(block) if self._in_range(row.created_at)]
+            rows.sort(key=lambda row: (row.created_at, row.id), reverse=True)
+            self._decoded[key] = rows
+        return self._decoded[key]
+
+    def live_count(self):
+        if self._live_count is None:
+            self._live_count = self.queryset.count()
+        return self._live_count
+
+    def __len__(self):
+        return self.live_count() + sum(count for _, _, count in self._archive_blocks())
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            rows = self[item:item + 1]
+            if not rows:
+                raise IndexError(item)
+            return rows[0]
+        start, stop, _ = item.indices(len(self))
+        live = self.live_count()
+        rows = list(self.queryset[start:min(stop, live)]) if start < live else []
+        skip, wanted = max(start - live, 0), stop - max(start, live)
+        for archive, block, count in self._archive_blocks():
+            if wanted <= 0:
+                break
+            if skip >= count:
+                skip -= count
+                continue
+            taken = self._rows(archive, block)[skip:skip + wanted]
+            rows.extend(taken)
+            wanted -= len(taken)
+            skip = 0
+        return rows
+
+    def count(self):
+        return len(self)
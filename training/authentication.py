@@ -0,0 +1,120 @@
+"""JWT authentication with an in-process user cache.
+
+``JWTAuthentication`` loads the user row on every request.  Dashboards fire
+several requests per page load for the same user, so
+:class:`CachedJWTAuthentication` keeps recently resolved users in a bounded LRU
+keyed by user id and token version (the ``REVOKE_TOKEN_CLAIM`` password
+fingerprint when ``CHECK_REVOKE_TOKEN`` is on; older simplejwt releases
+have neither setting, and every token then has the same version).
+
+Entries are dropped by the ``User`` ``post_save``/``post_delete`` handlers in
+``training.signals``, so role changes, deactivation and password changes apply
+to the next request in this process.  Other processes only see such changes
+once their entry expires, after ``AUTH_USER_CACHE_TTL`` seconds; queryset
+``update()`` calls, which send no signals, behave the same way.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserCache:
+    """Thread-safe LRU of ``user_id -> (token version, user, expiry)`` with hit/miss counters.
+
+    Ids are compared as strings, since tokens may carry them either way.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Bumped by every invalidation; see ``set``.
+        self.epoch = 0
+
+    # Settings are read lazily so ``override_settings`` works in tests.
+    @property
+    def max_size(self):
+        return self._max_size or getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024)
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+
+    def get(self, user_id, version):
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version or entry[2] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+        # Each request gets its own copy, so changes made by a view never leak into the cache.
+        return copy.copy(entry[1])
+
+    def set(self, user_id, version, user, epoch=None):
+        """Cache ``user``; skipped if anything was invalidated since ``epoch`` was read,
+        as the row may have been loaded before that change."""
+        if not self.max_size:
+            return
+        user_id = str(user_id)
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            self._entries[user_id] = (version, copy.copy(user), time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            self.epoch += 1
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that resolves users through :data:`user_cache`."""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        revoke_claim = getattr(api_settings, 'REVOKE_TOKEN_CLAIM', None)
+        version = validated_token.get(revoke_claim) if revoke_claim else None
+        epoch = user_cache.epoch
+        if user_id is not None:
+            user = user_cache.get(user_id, version)
+            if user is not None:
+                return user
+        # The parent does the lookup and the is_active/revocation checks, so only
+        # users that pass them are cached.
+        user = super().get_user(validated_token)
+        user_cache.set(user_id, version, user, epoch)
+        return user
@@ -0,0 +1,46 @@
+"""Endpoint discovery and latency statistics shared by ``bench_api`` and the query budget tests."""
+import math
+
+from .urls import router
+
+
+def get_routes():
+    """``(basename, action, url)`` for every GET route of the router; detail URLs use the lowest pk."""
+    routes = []
+    for prefix, viewset, basename in router.registry:
+        model = viewset.queryset.model
+        pk = model.objects.order_by('pk').values_list('pk', flat=True).first()
+        routes.append((basename, 'list', f'/api/{prefix}/'))
+        routes.append((basename, 'retrieve', f'/api/{prefix}/{pk}/'))
+        for extra in viewset.get_extra_actions():
+            if 'get' not in extra.mapping:
+                continue
+            if extra.detail:
+                routes.append((basename, extra.__name__, f'/api/{prefix}/{pk}/{extra.url_path}/'))
+            else:
+                routes.append((basename, extra.__name__, f'/api/{prefix}/{extra.url_path}/'))
+    return routes
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def summarize(latencies, seconds, errors=0):
+    """Throughput and latency percentiles (ms) of one run; ``latencies`` are in seconds."""
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        'requests': count,
+        'errors': errors,
+        'seconds': round(seconds, 4),
+        'throughput_rps': round(count / seconds, 2) if seconds else 0.0,
+        'mean_ms': round(sum(ordered) / count * 1000, 3) if count else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3) if count else 0.0,
+    }
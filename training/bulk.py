@@ -0,0 +1,397 @@
+"""Set-based write paths that bypass per-row ``save()``.
+
+``bulk_create``/``bulk_update`` do not send model signals, so every function
+here updates the dashboard counters, progress rollups, compliance matrix, batch
+enrolled counts, table versions, event streams and audit log itself, in the
+same way the signal handlers in ``training.signals`` would.
+"""
+import csv
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .audit import audit_sink
+from .hashing import hash_passwords
+from .models import User, Batch, BatchTrainee, Designation, ProgramTopic, ProgressRecord, TraineeDesignation
+from .serializers import UserImportRowSerializer
+from . import caching, compliance, enrollment, events, rollups, stats
+
+PROGRESS_UPDATE_FIELDS = ('status', 'completion_percentage', 'notes', 'updated_by', 'last_updated')
+
+
+def _progress_key(trainee_id, batch_id, topic_id):
+    return (trainee_id, batch_id, topic_id)
+
+
+def validate_progress_rows(rows, user):
+    """Check references and scoping for validated bulk rows.
+
+    Returns one error dict per row (empty when the row is fine) plus the existing
+    records keyed by ``(trainee, batch, topic)``.
+    """
+    trainee_ids = {row['trainee'] for row in rows if row.get('trainee') is not None}
+    batch_ids = {row['batch'] for row in rows}
+    topic_ids = {row['topic'] for row in rows if row.get('topic') is not None}
+
+    known_trainees = set(User.objects.filter(pk__in=trainee_ids).values_list('id', flat=True))
+    known_batches = set(Batch.objects.filter(pk__in=batch_ids).values_list('id', flat=True))
+    known_topics = set(ProgramTopic.objects.filter(pk__in=topic_ids).values_list('id', flat=True))
+
+    existing = {}
+    for record in ProgressRecord.objects.filter(trainee_id__in=trainee_ids, batch_id__in=batch_ids).order_by('id'):
+        existing[_progress_key(record.trainee_id, record.batch_id, record.topic_id)] = record
+
+    errors, seen = [], set()
+    for row in rows:
+        row_errors = {}
+        if row.get('trainee') is None:
+            row_errors['trainee'] = ['This field is required.']
+        elif row['trainee'] not in known_trainees:
+            row_errors['trainee'] = [f'Invalid pk "{row["trainee"]}" - object does not exist.']
+        if row['batch'] not in known_batches:
+            row_errors['batch'] = [f'Invalid pk "{row["batch"]}" - object does not exist.']
+        if row.get('topic') is not None and row['topic'] not in known_topics:
+            row_errors['topic'] = [f'Invalid pk "{row["topic"]}" - object does not exist.']
+        key = _progress_key(row.get('trainee'), row['batch'], row.get('topic'))
+        if key in seen:
+            row_errors['non_field_errors'] = ['Duplicate (trainee, batch, topic) in this request.']
+        seen.add(key)
+        # Same scoping as ProgressRecordViewSet: non-staff users can only change
+        # their own existing records.
+        if key in existing and not user.is_staff and row.get('trainee') != user.id:
+            row_errors['non_field_errors'] = ['You do not have permission to update this record.']
+        errors.append(row_errors)
+    return errors, existing
+
+
+def upsert_progress(rows, user):
+    """Validate, then insert or update progress records for serializer-validated rows in one transaction.
+
+    Nothing enforces a unique (trainee, batch, topic) in the table, so the
+    batches of the rows are locked (:func:`training.enrollment.lock_batches`)
+    before the existing records are read; concurrent upserts of the same key
+    then queue up instead of both inserting it.  Returns ``(errors, created,
+    updated)``, writing nothing if any row has errors.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        enrollment.lock_batches({row['batch'] for row in rows})
+        errors, existing = validate_progress_rows(rows, user)
+        if any(errors):
+            return errors, [], []
+
+        to_create, to_update, old_keys = [], [], []
+        for row in rows:
+            key = _progress_key(row['trainee'], row['batch'], row.get('topic'))
+            record = existing.get(key)
+            if record is None:
+                to_create.append(ProgressRecord(
+                    trainee_id=row['trainee'],
+                    batch_id=row['batch'],
+                    topic_id=row.get('topic'),
+                    status=row['status'],
+                    completion_percentage=row['completion_percentage'],
+                    notes=row.get('notes'),
+                    updated_by=user,
+                ))
+                continue
+            old_keys.extend(stats.instance_keys(record))
+            record.status = row['status']
+            record.completion_percentage = row['completion_percentage']
+            if 'notes' in row:
+                record.notes = row['notes']
+            record.updated_by = user
+            record.last_updated = now
+            to_update.append(record)
+
+        created = ProgressRecord.objects.bulk_create(to_create, batch_size=500)
+        if created and any(record.pk is None for record in created):
+            # Backends such as MySQL do not return primary keys from bulk inserts.
+            ids = {
+                _progress_key(t, b, tp): pk
+                for pk, t, b, tp in ProgressRecord.objects.filter(
+                    trainee_id__in={r.trainee_id for r in created},
+                    batch_id__in={r.batch_id for r in created},
+                ).values_list('id', 'trainee_id', 'batch_id', 'topic_id')
+            }
+            for record in created:
+                record.pk = ids.get(_progress_key(record.trainee_id, record.batch_id, record.topic_id))
+        ProgressRecord.objects.bulk_update(to_update, PROGRESS_UPDATE_FIELDS, batch_size=500)
+        caching.bump_table_versions(ProgressRecord)
+        events.publish(events.progress_event(record) for record in created + to_update)
+
+        new_keys = [key for record in created + to_update for key in stats.instance_keys(record)]
+        stats.apply_deltas(stats.key_deltas(old_keys, new_keys))
+        rollups.refresh_trainees((r.batch_id, r.trainee_id) for r in created + to_update)
+        for action, records in (('create_progress', created), ('update_progress', to_update)):
+            for record in records:
+                audit_sink.record(
+                    user=user,
+                    action=action,
+                    table_name=ProgressRecord._meta.db_table,
+                    record_id=record.pk,
+                    new_values={'status': record.status, 'completion': record.completion_percentage},
+                )
+    return errors, created, to_update
+
+
+def read_user_csv(stream):
+    """Parse an import CSV into ``(line_number, row)`` pairs.
+
+    Header names are case-insensitive; values are stripped, except passwords.
+    """
+    reader = csv.DictReader(stream)
+    rows = []
+    for row in reader:
+        cleaned = {}
+        for name, value in row.items():
+            if name is None:
+                continue
+            name = name.strip().lower()
+            value = value or ''
+            cleaned[name] = value if name == 'password' else value.strip()
+        if any(cleaned.values()):
+            rows.append((reader.line_num, cleaned))
+    return rows
+
+
+def unknown_ids(model, ids):
+    """The subset of ``ids`` with no matching ``model`` row."""
+    ids = set(ids)
+    return sorted(ids - set(model.objects.filter(pk__in=ids).values_list('id', flat=True)))
+
+
+def validate_user_rows(rows):
+    """Check uniqueness and references for validated import rows.
+
+    Returns one error dict per row (empty when the row is fine).  Usernames and
+    non-blank emails must be new, both in the database and within the import.
+    """
+    usernames = {row['username'] for row in rows}
+    emails = {row['email'].lower() for row in rows if row['email']}
+    taken_usernames = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    taken_emails = {e.lower() for e in User.objects.filter(email__in=emails).values_list('email', flat=True)}
+    missing_designations = set(unknown_ids(Designation, {i for row in rows for i in row['designations']}))
+    missing_batches = set(unknown_ids(Batch, {i for row in rows for i in row['batches']}))
+
+    errors, seen_usernames, seen_emails = [], set(), set()
+    for row in rows:
+        row_errors = {}
+        if row['username'] in taken_usernames:
+            row_errors['username'] = ['A user with that username already exists.']
+        elif row['username'] in seen_usernames:
+            row_errors['username'] = ['Duplicate username in this import.']
+        seen_usernames.add(row['username'])
+        email = row['email'].lower()
+        if email in taken_emails:
+            row_errors['email'] = ['A user with that email already exists.']
+        elif email and email in seen_emails:
+            row_errors['email'] = ['Duplicate email in this import.']
+        if email:
+            seen_emails.add(email)
+        bad = [i for i in row['designations'] if i in missing_designations]
+        if bad:
+            row_errors['designations'] = [f'Invalid pk "{i}" - object does not exist.' for i in bad]
+        bad = [i for i in row['batches'] if i in missing_batches]
+        if bad:
+            row_errors['batches'] = [f'Invalid pk "{i}" - object does not exist.' for i in bad]
+        errors.append(row_errors)
+    return errors
+
+
+def parse_user_import(stream, designation_ids=(), batch_ids=()):
+    """Read and validate an import CSV.
+
+    ``designation_ids``/``batch_ids`` are assigned to every trainee row on top of
+    the row's own columns.  Returns the validated rows and a list of
+    ``{"line": n, "username": ..., "errors": {...}}`` for the rows that failed.
+    """
+    parsed = read_user_csv(stream)
+    rows, errors = [], []
+    for _, data in parsed:
+        serializer = UserImportRowSerializer(data=data)
+        valid = serializer.is_valid()
+        rows.append(serializer.validated_data if valid else None)
+        errors.append({} if valid else dict(serializer.errors))
+
+    for row in rows:
+        if row is not None and row['role'] == 'trainee':
+            row['designations'] = list(dict.fromkeys([*row['designations'], *designation_ids]))
+            row['batches'] = list(dict.fromkeys([*row['batches'], *batch_ids]))
+    checked = [row for row in rows if row is not None]
+    reference_errors = iter(validate_user_rows(checked))
+    for i, row in enumerate(rows):
+        if row is not None:
+            errors[i] = next(reference_errors)
+
+    report = [
+        {'line': line, 'username': row.get('username', ''), 'errors': row_errors}
+        for (line, row), row_errors in zip(parsed, errors) if row_errors
+    ]
+    return checked, report
+
+
+def import_users(rows, created_by=None, workers=None):
+    """Create users for validated rows, with their designations and enrollments, in one transaction.
+
+    Passwords are hashed in a process pool (see ``training.hashing``) before the
+    transaction starts, so no locks are held while hashing.  Returns the created
+    users and a dict of timings and throughput.
+    """
+    timings = {'rows': len(rows)}
+    started = time.perf_counter()
+    hashed = hash_passwords((row['password'] for row in rows), workers=workers)
+    timings['hash_seconds'] = time.perf_counter() - started
+
+    insert_started = time.perf_counter()
+    users = [
+        User(
+            username=row['username'],
+            email=row['email'],
+            first_name=row['first_name'],
+            last_name=row['last_name'],
+            phone=row.get('phone') or None,
+            role=row['role'],
+            password=password,
+        )
+        for row, password in zip(rows, hashed)
+    ]
+    with transaction.atomic():
+        created = User.objects.bulk_create(users, batch_size=500)
+        if any(user.pk is None for user in created):
+            # Backends such as MySQL do not return primary keys from bulk inserts.
+            ids = dict(User.objects.filter(username__in=[u.username for u in created]).values_list('username', 'id'))
+            for user in created:
+                user.pk = ids[user.username]
+
+        designations = [
+            TraineeDesignation(trainee=user, designation_id=designation_id, created_by=created_by)
+            for user, row in zip(created, rows) for designation_id in row['designations']
+        ]
+        TraineeDesignation.objects.bulk_create(designations, batch_size=500)
+        today = timezone.localdate()
+        enrollments = [
+            BatchTrainee(batch_id=batch_id, trainee=user, enrollment_date=today)
+            for user, row in zip(created, rows) for batch_id in row['batches']
+        ]
+        # Trainees past a batch's capacity go on its waitlist, in file order.
+        batches = enrollment.lock_batches({e.batch_id for e in enrollments})
+        seats = {batch_id: enrollment.allocate(batch, len(enrollments)) for batch_id, batch in batches.items()}
+        for obj in enrollments:
+            if seats[obj.batch_id]:
+                seats[obj.batch_id] -= 1
+            else:
+                obj.status, obj.enrollment_date = 'waitlisted', None
+        BatchTrainee.objects.bulk_create(enrollments, batch_size=500)
+        enrollment.apply_seat_deltas(enrollment.seat_deltas([], [(e.batch_id, e.status) for e in enrollments]))
+        caching.bump_table_versions(User, TraineeDesignation, BatchTrainee)
+        events.publish(events.enrollment_event(enrollment) for enrollment in enrollments)
+
+        new_keys = [key for obj in created + enrollments for key in stats.instance_keys(obj)]
+        stats.apply_deltas(stats.key_deltas([], new_keys))
+        compliance.refresh_trainees({obj.trainee_id for obj in designations + enrollments})
+        for user in created:
+            audit_sink.record(
+                user=created_by,
+                action='USER_IMPORTED',
+                table_name='User',
+                record_id=user.pk,
+                new_values={'username': user.username, 'role': user.role},
+            )
+    timings['insert_seconds'] = time.perf_counter() - insert_started
+    timings['total_seconds'] = time.perf_counter() - started
+    timings['users_per_second'] = len(created) / timings['total_seconds'] if timings['total_seconds'] else 0.0
+    timings['designations'] = len(designations)
+    timings['enrollments'] = len(enrollments)
+    timings['waitlisted'] = sum(e.status == 'waitlisted' for e in enrollments)
+    return created, timings
+
+
+def validate_enrollment(batch_id, trainee_ids):
+    """One error dict per trainee id (empty when it is fine).
+
+    Trainees must exist, have the trainee role, appear once in the request and
+    not be in the batch yet (waitlisted or dropped enrollments included).
+    """
+    roles = dict(User.objects.filter(pk__in=set(trainee_ids)).values_list('id', 'role'))
+    existing = set(
+        BatchTrainee.objects.filter(batch_id=batch_id, trainee_id__in=set(trainee_ids)).values_list('trainee_id', flat=True)
+    )
+    errors, seen = [], set()
+    for trainee_id in trainee_ids:
+        if trainee_id not in roles:
+            errors.append({'trainee': [f'Invalid pk "{trainee_id}" - object does not exist.']})
+        elif roles[trainee_id] != 'trainee':
+            errors.append({'trainee': ['Only trainees can be enrolled in batches.']})
+        elif trainee_id in seen:
+            errors.append({'trainee': ['Duplicate trainee in this request.']})
+        elif trainee_id in existing:
+            errors.append({'trainee': ['This trainee is already in the batch.']})
+        else:
+            errors.append({})
+        seen.add(trainee_id)
+    return errors
+
+
+def enroll_trainees(batch_id, trainee_ids, user, overflow='reject'):
+    """Enroll validated ``trainee_ids`` in a batch, in order, in one transaction.
+
+    The batch row is locked before its free seats are read, so concurrent
+    enrollers queue up behind each other.  Trainees past the capacity are put on
+    the waitlist (``overflow='waitlist'``), left out (``'trim'``) or make the
+    whole call write nothing (``'reject'``); the same happens if one of them was
+    enrolled by someone else in the meantime.  Returns a dict with the
+    ``enrolled`` and ``waitlisted`` enrollments, the ``refused`` and
+    ``duplicate`` trainee ids and the seats still free (None without a limit).
+    """
+    result = {'enrolled': [], 'waitlisted': [], 'refused': [], 'duplicates': [], 'free_seats': None}
+    today = timezone.localdate()
+    with transaction.atomic():
+        batch = enrollment.lock_batches([batch_id])[batch_id]
+        result['duplicates'] = sorted(set(
+            BatchTrainee.objects.filter(batch_id=batch_id, trainee_id__in=trainee_ids).values_list('trainee_id', flat=True)
+        ))
+        seats = enrollment.allocate(batch, len(trainee_ids))
+        result['free_seats'] = enrollment.free_seats(batch)
+        if result['duplicates']:
+            return result
+        if seats < len(trainee_ids) and overflow == 'reject':
+            result['refused'] = list(trainee_ids)
+            return result
+
+        rows = [
+            BatchTrainee(batch_id=batch_id, trainee_id=trainee_id, enrollment_date=today)
+            for trainee_id in trainee_ids[:seats]
+        ]
+        if overflow == 'waitlist':
+            rows += [BatchTrainee(batch_id=batch_id, trainee_id=trainee_id, status='waitlisted') for trainee_id in trainee_ids[seats:]]
+        else:
+            result['refused'] = list(trainee_ids[seats:])
+        BatchTrainee.objects.bulk_create(rows, batch_size=500)
+        if rows and any(row.pk is None for row in rows):
+            # Backends such as MySQL do not return primary keys from bulk inserts.
+            ids = dict(BatchTrainee.objects.filter(batch_id=batch_id, trainee_id__in=trainee_ids).values_list('trainee_id', 'id'))
+            for row in rows:
+                row.pk = ids[row.trainee_id]
+        result['enrolled'], result['waitlisted'] = rows[:seats], rows[seats:]
+        if result['free_seats'] is not None:
+            result['free_seats'] -= seats
+
+        enrollment.apply_seat_deltas({batch_id: seats})
+        caching.bump_table_versions(BatchTrainee)
+        events.publish(events.enrollment_event(row) for row in rows)
+        stats.apply_deltas(stats.key_deltas([], [key for row in rows for key in stats.instance_keys(row)]))
+        compliance.refresh_trainees({row.trainee_id for row in rows})
+        audit_sink.record(
+            user=user,
+            action='BULK_ENROLL',
+            table_name=BatchTrainee._meta.db_table,
+            record_id=batch_id,
+            new_values={
+                'enrolled': [row.trainee_id for row in result['enrolled']],
+                'waitlisted': [row.trainee_id for row in result['waitlisted']],
+                'refused': result['refused'],
+            },
+        )
+    return result
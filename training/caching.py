@@ -0,0 +1,173 @@
+"""Conditional GET (ETag/304) for list and detail endpoints, and response caching
+for the rarely changing program catalog.
+
+Every table served by the API has a ``TableVersion`` counter that the signals
+in ``training.signals`` (and the set-based writes in ``training.bulk``, the
+audit writer and the audit archiver) bump whenever its rows change.  A list or
+detail ETag combines the counters of the tables the response reads with the
+query string, the negotiated media type and the user's scope, so a matching
+``If-None-Match`` is answered with 304 after one small lookup, before the
+queryset runs.  Because the counters live in the database, they are shared by
+every worker process and roll back together with the write that bumped them.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.db.models import F
+from django.utils.http import parse_etags
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .models import (
+    Batch, BatchTrainee, BatchTrainer, Class, Designation, DesignationProgram, Program, ProgramTopic, ProgressRecord,
+    TableVersion, TraineeDesignation, User,
+)
+
+CONDITIONAL_ACTIONS = ('list', 'retrieve')
+# Models whose counters the signals bump on save and delete.
+VERSIONED_MODELS = (
+    User, Program, ProgramTopic, Batch, BatchTrainer, BatchTrainee, Designation, DesignationProgram,
+    TraineeDesignation, ProgressRecord, Class,
+)
+# on_delete handlers that leave the referencing rows alone or remove them with their own signals.
+_UNCHANGED_ON_DELETE = (models.CASCADE, models.PROTECT, models.RESTRICT, models.DO_NOTHING)
+
+
+def table_versions(*model_classes):
+    """``'table:version,...'`` for the tables of ``model_classes``; a table that was never
+    bumped counts as version 0."""
+    tables = sorted({model._meta.db_table for model in model_classes})
+    stored = dict(TableVersion.objects.filter(table_name__in=tables).values_list('table_name', 'version'))
+    return ','.join(f'{table}:{stored.get(table, 0)}' for table in tables)
+
+
+def bump_table_versions(*model_classes):
+    """Add one to the counters of ``model_classes``; one UPDATE unless a counter is new."""
+    tables = sorted({model._meta.db_table for model in model_classes})
+    if not tables or TableVersion.objects.filter(table_name__in=tables).update(version=F('version') + 1) == len(tables):
+        return
+    existing = set(TableVersion.objects.filter(table_name__in=tables).values_list('table_name', flat=True))
+    missing = [table for table in tables if table not in existing]
+    # A concurrent writer may create the same row; both increments still land.
+    TableVersion.objects.bulk_create([TableVersion(table_name=table) for table in missing], ignore_conflicts=True)
+    TableVersion.objects.filter(table_name__in=missing).update(version=F('version') + 1)
+
+
+def nulled_by_delete(model):
+    """Models whose rows a delete of ``model`` rewrites without signals (``SET_NULL`` and friends)."""
+    return {
+        relation.related_model for relation in model._meta.related_objects
+        if relation.on_delete not in _UNCHANGED_ON_DELETE
+    }
+
+
+def serializer_models(serializer):
+    """The models ``serializer`` (possibly a list serializer) reads, including nested serializers."""
+    serializer = getattr(serializer, 'child', serializer)
+    found = set()
+    meta = getattr(serializer, 'Meta', None)
+    if getattr(meta, 'model', None) is not None:
+        found.add(meta.model)
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.BaseSerializer):
+            found |= serializer_models(field)
+    return found
+
+
+def program_tree_version():
+    return table_versions(Program, ProgramTopic)
+
+
+def weak_etag(*parts):
+    digest = hashlib.sha1('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored.
+    def opaque(tag):
+        return tag[2:] if tag.startswith('W/') else tag
+    candidates = {opaque(tag) for tag in parse_etags(header)}
+    return '*' in candidates or opaque(etag) in candidates
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+class ConditionalGetMixin:
+    """ETag/304 for the list and retrieve actions of a viewset.
+
+    The check runs in ``initial()``, after authentication and permissions and
+    before the handler, so it also covers handlers that override ``list``.
+    """
+    etag_headers = {'Cache-Control': 'private, no-cache'}
+
+    def get_etag_models(self):
+        return serializer_models(self.get_serializer())
+
+    def get_etag_scope(self):
+        """What decides which rows the user sees; by default the user, their role and staff flag."""
+        user = self.request.user
+        return (user.pk, getattr(user, 'role', ''), user.is_staff)
+
+    def get_etag(self, request):
+        return weak_etag(
+            self.basename, table_versions(*self.get_etag_models()), self.get_etag_scope(),
+            getattr(request, 'accepted_media_type', ''), request.get_full_path(),
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if self.action in CONDITIONAL_ACTIONS and request.method in ('GET', 'HEAD'):
+            self.etag = self.get_etag(request)
+            if etag_matches(request, self.etag):
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'etag', None) and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = self.etag
+            for name, value in self.etag_headers.items():
+                response[name] = value
+        return response
+
+
+class ProgramTreeCacheMixin(ConditionalGetMixin):
+    """Also serve list/retrieve data from the cache, keyed on the ETag.
+
+    The catalog is the same for every user allowed to read it, so the ETag has
+    no user scope and cached responses are shared.
+    """
+    tree_cache_prefix = 'program-tree'
+
+    def get_etag_scope(self):
+        return ''
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(request, super().retrieve, *args, **kwargs)
+
+    def _cached_response(self, request, handler, *args, **kwargs):
+        key = f'{self.tree_cache_prefix}:{self.etag}'
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, getattr(settings, 'PROGRAM_CACHE_TIMEOUT', 3600))
+        return response
@@ -0,0 +1,216 @@
+"""Designation compliance: which required programs each trainee has completed.
+
+A trainee must complete every program that one of their active designations
+marks ``is_required``.  A requirement is ``completed`` once any enrollment of
+the trainee in a batch of that program is completed, ``in_progress`` while one
+is enrolled or in progress, and ``missing`` otherwise (dropped and waitlisted
+enrollments do not count).
+
+The matrix is materialised in ``ComplianceStatus``, one row per (trainee,
+designation, required program).  :func:`refresh_trainees` recomputes the rows
+of some trainees in three set-based queries; the signals in
+``training.signals`` call it for the trainees touched by a designation,
+``TraineeDesignation``, ``DesignationProgram`` or ``BatchTrainee`` change, and
+``manage.py rebuild_compliance`` recomputes everything.  Summaries are read
+from that table and cached until it changes.
+"""
+import hashlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from .models import BatchTrainee, ComplianceStatus, Designation, DesignationProgram, Program, TraineeDesignation, User
+
+CACHE_PREFIX = 'compliance'
+
+
+def _required_programs():
+    """``{designation_id: {program_id}}`` for active designations."""
+    required = defaultdict(set)
+    rows = DesignationProgram.objects.filter(is_required=True, designation__is_active=True).values_list('designation_id', 'program_id')
+    for designation_id, program_id in rows:
+        required[designation_id].add(program_id)
+    return required
+
+
+def rebuild_compliance(trainee_ids=None, chunk_size=2000):
+    """Recompute the matrix rows of ``trainee_ids`` (``None`` means everyone); returns the row count."""
+    required = _required_programs()
+    assignments = TraineeDesignation.objects.filter(designation_id__in=list(required))
+    enrollments = BatchTrainee.objects.exclude(status__in=BatchTrainee.NO_SEAT_STATUSES).filter(
+        batch__program_id__in={p for programs in required.values() for p in programs},
+    )
+    stale = ComplianceStatus.objects.all()
+    if trainee_ids is not None:
+        trainee_ids = list(trainee_ids)
+        assignments = assignments.filter(trainee_id__in=trainee_ids)
+        enrollments = enrollments.filter(trainee_id__in=trainee_ids)
+        stale = stale.filter(trainee_id__in=trainee_ids)
+
+    progress = {
+        (row['trainee_id'], row['batch__program_id']): row
+        for row in enrollments.values('trainee_id', 'batch__program_id').annotate(
+            completed=Count('id', filter=Q(status='completed')),
+            completed_on=Max('completion_date', filter=Q(status='completed')),
+        ).order_by()
+    }
+    rows = []
+    seen = set()
+    for trainee_id, designation_id in assignments.values_list('trainee_id', 'designation_id').iterator(chunk_size=chunk_size):
+        if (trainee_id, designation_id) in seen:
+            continue
+        seen.add((trainee_id, designation_id))
+        for program_id in required[designation_id]:
+            enrollment = progress.get((trainee_id, program_id))
+            rows.append(ComplianceStatus(
+                trainee_id=trainee_id,
+                designation_id=designation_id,
+                program_id=program_id,
+                status='missing' if enrollment is None else 'completed' if enrollment['completed'] else 'in_progress',
+                completed_on=enrollment['completed_on'] if enrollment else None,
+            ))
+    with transaction.atomic():
+        stale.delete()
+        ComplianceStatus.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def refresh_trainees(trainee_ids):
+    """Recompute the matrix rows of a few trainees."""
+    trainee_ids = {t for t in trainee_ids if t is not None}
+    if not trainee_ids:
+        return 0
+    return rebuild_compliance(trainee_ids)
+
+
+def refresh_designations(designation_ids):
+    """Recompute the rows of every trainee holding one of ``designation_ids``."""
+    designation_ids = {d for d in designation_ids if d is not None}
+    if not designation_ids:
+        return 0
+    return refresh_trainees(
+        TraineeDesignation.objects.filter(designation_id__in=designation_ids).values_list('trainee_id', flat=True).distinct()
+    )
+
+
+def matrix_version():
+    state = ComplianceStatus.objects.aggregate(latest=Max('updated_at'), total=Count('id'))
+    latest = state['latest'].timestamp() if state['latest'] else 0
+    return f"{latest}:{state['total']}"
+
+
+def _cached(name, compute):
+    version = hashlib.sha1(matrix_version().encode('utf-8')).hexdigest()
+    key = f'{CACHE_PREFIX}:{name}:{version}'
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, getattr(settings, 'COMPLIANCE_CACHE_TIMEOUT', 300))
+    return result
+
+
+def _status_counts():
+    return {
+        'completed': Count('id', filter=Q(status='completed')),
+        'in_progress': Count('id', filter=Q(status='in_progress')),
+        'missing': Count('id', filter=Q(status='missing')),
+    }
+
+
+def _compute_summaries():
+    designations = {
+        row['designation_id']: row
+        for row in ComplianceStatus.objects.values('designation_id').annotate(
+            trainees=Count('trainee_id', distinct=True),
+            noncompliant=Count('trainee_id', distinct=True, filter=~Q(status='completed')),
+        ).order_by()
+    }
+    cells = ComplianceStatus.objects.values('designation_id', 'program_id').annotate(**_status_counts()).order_by('designation_id', 'program_id')
+    designation_names = dict(Designation.objects.filter(pk__in=list(designations)).values_list('id', 'name'))
+    program_names = dict(Program.objects.filter(compliance_statuses__isnull=False).distinct().values_list('id', 'name'))
+
+    programs = defaultdict(list)
+    for cell in cells:
+        programs[cell['designation_id']].append({
+            'program': cell['program_id'],
+            'name': program_names.get(cell['program_id']),
+            'completed': cell['completed'],
+            'in_progress': cell['in_progress'],
+            'missing': cell['missing'],
+        })
+    summaries = []
+    for designation_id, row in designations.items():
+        compliant = row['trainees'] - row['noncompliant']
+        summaries.append({
+            'designation': designation_id,
+            'name': designation_names.get(designation_id),
+            'trainees': row['trainees'],
+            'compliant_trainees': compliant,
+            'compliance_rate': round(100.0 * compliant / row['trainees'], 1) if row['trainees'] else 100.0,
+            'programs': programs[designation_id],
+        })
+    summaries.sort(key=lambda s: (s['compliance_rate'], s['name'] or '', s['designation']))
+    return {'designations': summaries}
+
+
+def designation_summaries():
+    """Per active designation: trainees, fully compliant trainees and status counts per required program."""
+    return _cached('summary', _compute_summaries)
+
+
+def _compute_matrix(designation_id):
+    cells = list(ComplianceStatus.objects.filter(designation_id=designation_id).values_list('trainee_id', 'program_id', 'status'))
+    program_ids = sorted({program_id for _, program_id, _ in cells})
+    program_names = dict(Program.objects.filter(pk__in=program_ids).values_list('id', 'name'))
+    statuses = defaultdict(dict)
+    for trainee_id, program_id, status in cells:
+        statuses[trainee_id][program_id] = status
+    users = User.objects.filter(pk__in=list(statuses)).order_by('username').values_list('id', 'username', 'first_name', 'last_name')
+    trainees = []
+    for trainee_id, username, first_name, last_name in users:
+        row = [statuses[trainee_id].get(program_id) for program_id in program_ids]
+        trainees.append({
+            'trainee': trainee_id,
+            'username': username,
+            'name': f'{first_name} {last_name}'.strip() or username,
+            'compliant': all(status == 'completed' for status in row),
+            'statuses': row,
+        })
+    return {
+        'designation': designation_id,
+        'programs': [{'program': program_id, 'name': program_names.get(program_id)} for program_id in program_ids],
+        'trainees': trainees,
+    }
+
+
+def designation_matrix(designation_id):
+    """Trainee x required-program status matrix of one designation; ``statuses`` follow ``programs``."""
+    return _cached(f'designation:{designation_id}', lambda: _compute_matrix(designation_id))
+
+
+def trainee_compliance(trainee_id):
+    """Status of every program required of one trainee, with the designations requiring it."""
+    programs = {}
+    rows = ComplianceStatus.objects.filter(trainee_id=trainee_id).order_by('program__name', 'program_id', 'designation_id').values(
+        'program_id', 'program__name', 'designation_id', 'designation__name', 'status', 'completed_on',
+    )
+    for row in rows:
+        entry = programs.setdefault(row['program_id'], {
+            'program': row['program_id'],
+            'name': row['program__name'],
+            'status': row['status'],
+            'completed_on': row['completed_on'],
+            'required_by': [],
+        })
+        entry['required_by'].append({'designation': row['designation_id'], 'name': row['designation__name']})
+    programs = list(programs.values())
+    return {
+        'trainee': trainee_id,
+        'compliant': all(p['status'] == 'completed' for p in programs),
+        'required': len(programs),
+        'completed': sum(p['status'] == 'completed' for p in programs),
+        'programs': programs,
+    }
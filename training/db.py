@@ -0,0 +1,165 @@
+"""Primary/replica database routing and per-connection tuning.
+
+Queries go to the primary (``default``) unless
+:class:`~training.middleware.ReplicaRoutingMiddleware` marked the current
+request as a replica read: a GET/HEAD to a ``ReadOnlyModelViewSet`` or to a
+``list``/``retrieve`` action.  Once such a request writes, it is pinned to the
+primary for the rest of the request, and the same client keeps reading from the
+primary for ``DATABASE_REPLICA_PIN_SECONDS`` so it sees its own writes despite
+replication lag.  Reads inside a transaction on the primary, and reads through
+an instance loaded from the primary, stay there too.  Management commands and
+anything else outside a request never use a replica.
+
+:func:`tune_connection` runs for every new connection and applies the
+``SQLITE_*`` pragmas or the ``MYSQL_*`` session settings.
+"""
+import contextvars
+import hashlib
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRIMARY = 'default'
+REPLICA_ACTIONS = ('list', 'retrieve')
+PIN_CACHE_PREFIX = 'db-pin'
+
+SQLITE_JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SQLITE_SYNCHRONOUS_LEVELS = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+
+class RoutingState:
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self, use_replica=False):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('training_db_routing', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def current_state():
+    return _state.get()
+
+
+@contextmanager
+def routing(use_replica=False):
+    """Track the reads and writes of one request; reads may use a replica while ``use_replica`` is set."""
+    token = _state.set(RoutingState(use_replica))
+    try:
+        yield _state.get()
+    finally:
+        _state.reset(token)
+
+
+def is_replica_view(view_func, method):
+    """Whether a DRF view serves ``method`` with a read-only viewset or a list/retrieve action."""
+    from rest_framework.viewsets import ReadOnlyModelViewSet
+
+    if method not in ('GET', 'HEAD'):
+        return False
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return False
+    if issubclass(cls, ReadOnlyModelViewSet):
+        return True
+    actions = getattr(view_func, 'actions', None) or {}
+    return actions.get('get') in REPLICA_ACTIONS
+
+
+def _client_key(request):
+    client = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get('REMOTE_ADDR', '')
+    )
+    return f"{PIN_CACHE_PREFIX}:{hashlib.sha1(client.encode('utf-8')).hexdigest()}"
+
+
+def pin_client(request):
+    timeout = getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 5)
+    if timeout > 0:
+        cache.set(_client_key(request), 1, timeout)
+
+
+def client_pinned(request):
+    return getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 5) > 0 and cache.get(_client_key(request)) is not None
+
+
+class PrimaryReplicaRouter:
+    """Send replica reads to a random ``DATABASE_REPLICAS`` alias; everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        aliases = replicas()
+        return random.choice(aliases) if aliases else None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {PRIMARY, *replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+def _sqlite_statements():
+    journal_mode = settings.SQLITE_JOURNAL_MODE.upper()
+    synchronous = settings.SQLITE_SYNCHRONOUS.upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise ImproperlyConfigured(f'SQLITE_JOURNAL_MODE must be one of {sorted(SQLITE_JOURNAL_MODES)}')
+    if synchronous not in SQLITE_SYNCHRONOUS_LEVELS:
+        raise ImproperlyConfigured(f'SQLITE_SYNCHRONOUS must be one of {sorted(SQLITE_SYNCHRONOUS_LEVELS)}')
+    return [
+        (f'PRAGMA journal_mode = {journal_mode}', None),
+        (f'PRAGMA synchronous = {synchronous}', None),
+        (f'PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}', None),
+        (f'PRAGMA cache_size = -{int(settings.SQLITE_CACHE_SIZE_KB)}', None),
+        ('PRAGMA temp_store = MEMORY', None),
+    ]
+
+
+def _mysql_statements():
+    return [(
+        'SET SESSION transaction_isolation = %s, SESSION sql_mode = %s, SESSION innodb_lock_wait_timeout = %s',
+        [settings.MYSQL_TRANSACTION_ISOLATION, settings.MYSQL_SQL_MODE, int(settings.MYSQL_LOCK_WAIT_TIMEOUT)],
+    )]
+
+
+@receiver(connection_created)
+def tune_connection(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        statements = _sqlite_statements()
+    elif connection.vendor == 'mysql':
+        statements = _mysql_statements()
+    else:
+        return
+    with connection.cursor() as cursor:
+        for sql, params in statements:
+            cursor.execute(sql, params)
@@ -0,0 +1,96 @@
+"""Batch capacity: the denormalized ``Batch.enrolled_count`` and seat-checked enrollment.
+
+An enrollment holds a seat unless it is dropped or waitlisted, and a batch with
+a ``max_capacity`` of 0 has no limit.  ``enrolled_count`` is never recomputed
+with a COUNT: the signals in ``training.signals`` and the bulk paths in
+``training.bulk`` turn each change into ``UPDATE ... SET enrolled_count =
+enrolled_count + n`` (:func:`apply_seat_deltas`), and ``manage.py
+rebuild_enrolled_counts`` recomputes it from scratch.
+
+Writes that take seats first lock the batch row with :func:`lock_batches`, read
+the free seats under the lock and only then insert, so concurrent enrollers of
+one batch queue up instead of overbooking it.
+"""
+from collections import Counter, defaultdict
+
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Batch, BatchTrainee
+from . import caching
+
+# What bulk enrollment does with trainees past a batch's capacity.
+OVERFLOW_CHOICES = ('reject', 'trim', 'waitlist')
+
+
+def holds_seat(status):
+    return status not in BatchTrainee.NO_SEAT_STATUSES
+
+
+def seat_deltas(old_rows, new_rows):
+    """``{batch_id: delta}`` for enrollments going from ``old_rows`` to ``new_rows`` of ``(batch_id, status)``."""
+    deltas = Counter()
+    for rows, sign in ((old_rows, -1), (new_rows, 1)):
+        for row in rows:
+            if row and holds_seat(row[1]):
+                deltas[row[0]] += sign
+    return {batch_id: delta for batch_id, delta in deltas.items() if delta}
+
+
+def apply_seat_deltas(deltas):
+    """Add each ``{batch_id: delta}`` to ``enrolled_count``; batches changing by the same amount share one UPDATE."""
+    by_delta = defaultdict(list)
+    for batch_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(batch_id)
+    for delta, batch_ids in by_delta.items():
+        Batch.objects.filter(pk__in=batch_ids).update(enrolled_count=F('enrolled_count') + delta)
+    if by_delta:
+        caching.bump_table_versions(Batch)
+
+
+def lock_batches(batch_ids):
+    """Lock the rows of ``batch_ids`` until the transaction ends and return ``{id: batch}``
+    with their ``max_capacity`` and ``enrolled_count``.
+
+    Must run inside ``transaction.atomic()``.  Rows are locked in id order so that
+    enrollers of overlapping batches cannot deadlock.  Backends without
+    ``SELECT ... FOR UPDATE`` (SQLite) get a no-op UPDATE instead, which takes the
+    database write lock before the counts are read.
+    """
+    batch_ids = sorted(set(batch_ids))
+    batches = Batch.objects.filter(pk__in=batch_ids).order_by('pk').only('id', 'max_capacity', 'enrolled_count')
+    if connection.features.has_select_for_update:
+        batches = batches.select_for_update()
+    elif batch_ids:
+        Batch.objects.filter(pk__in=batch_ids).update(enrolled_count=F('enrolled_count'))
+    return {batch.pk: batch for batch in batches}
+
+
+def free_seats(batch):
+    """Seats left in a (locked) batch, or None if it has no limit."""
+    if batch.max_capacity <= 0:
+        return None
+    return max(batch.max_capacity - batch.enrolled_count, 0)
+
+
+def allocate(batch, wanted):
+    """How many of ``wanted`` new seat-holding enrollments fit in ``batch``."""
+    free = free_seats(batch)
+    return wanted if free is None else min(wanted, free)
+
+
+def rebuild_enrolled_counts(batch_ids=None):
+    """Recompute ``enrolled_count`` of ``batch_ids`` (``None`` means every batch); returns the batch count."""
+    seats = (
+        BatchTrainee.objects.filter(batch=OuterRef('pk')).exclude(status__in=BatchTrainee.NO_SEAT_STATUSES)
+        .order_by().values('batch').annotate(n=Count('id')).values('n')
+    )
+    batches = Batch.objects.all()
+    if batch_ids is not None:
+        batches = batches.filter(pk__in=list(batch_ids))
+    updated = batches.update(enrolled_count=Coalesce(Subquery(seats), Value(0)))
+    caching.bump_table_versions(Batch)
+    return updated
+
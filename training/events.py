@@ -0,0 +1,342 @@
+"""Server-sent event streams of progress and enrollment changes.
+
+``GET /api/events/batches/<id>/`` and ``/api/events/trainees/<id>/`` stay open
+and push one compact event per saved or deleted ``ProgressRecord`` or
+``BatchTrainee`` of that batch or trainee::
+
+    id: 17
+    event: progress
+    data: {"id":5,"trainee":3,"batch":2,"topic":9,"status":"completed","completion":100}
+
+The signal handlers in ``training.signals`` (and the bulk writes in
+``training.bulk``) call :func:`publish`.  With ``EVENT_RELAY=memory`` (the
+default) events reach the streams of the same process once the transaction
+commits, through :data:`broker`.  With several worker processes set
+``EVENT_RELAY=db``: events are written to ``StreamEvent`` in the writing
+transaction, every process polls the table and fans the rows out to its own
+streams, and a reconnecting ``EventSource`` gets what it missed through
+``Last-Event-ID``.
+
+Each stream is a coroutine waiting on an ``asyncio.Queue``, so idle
+connections hold no thread; this needs the ASGI entry point
+(``training_tracker.asgi``), and the endpoints answer 501 under WSGI.  A
+stream that falls more than ``EVENT_STREAM_QUEUE_SIZE`` events behind gets a
+``resync`` event telling the client to refetch, and streams end after
+``EVENT_STREAM_MAX_SECONDS`` so that clients reconnect.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+
+from .authentication import CachedJWTAuthentication
+from .models import Batch, StreamEvent, User
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/event-stream'
+STREAM_KINDS = {'batches': 'batch', 'trainees': 'trainee'}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def relay_enabled():
+    return _setting('EVENT_RELAY', 'memory') == 'db'
+
+
+def progress_event(record, deleted=False):
+    """``(event, payload, batch_id, trainee_id)`` for a progress record."""
+    payload = {
+        'id': record.pk, 'trainee': record.trainee_id, 'batch': record.batch_id, 'topic': record.topic_id,
+        'status': record.status, 'completion': record.completion_percentage,
+    }
+    if deleted:
+        payload = {'id': record.pk, 'trainee': record.trainee_id, 'batch': record.batch_id, 'deleted': True}
+    return 'progress', payload, record.batch_id, record.trainee_id
+
+
+def enrollment_event(enrollment, deleted=False):
+    """``(event, payload, batch_id, trainee_id)`` for a batch enrollment."""
+    payload = {'id': enrollment.pk, 'trainee': enrollment.trainee_id, 'batch': enrollment.batch_id, 'status': enrollment.status}
+    if deleted:
+        payload = {'id': enrollment.pk, 'trainee': enrollment.trainee_id, 'batch': enrollment.batch_id, 'deleted': True}
+    return 'enrollment', payload, enrollment.batch_id, enrollment.trainee_id
+
+
+def channels_of(batch_id, trainee_id):
+    return [channel for channel in (
+        f'batch:{batch_id}' if batch_id is not None else None,
+        f'trainee:{trainee_id}' if trainee_id is not None else None,
+    ) if channel]
+
+
+def encode(event_id, event, payload):
+    """One SSE message, encoded once and shared by every stream it goes to."""
+    data = json.dumps(payload, separators=(',', ':'))
+    head = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{head}event: {event}\ndata: {data}\n\n'.encode('utf-8')
+
+
+class Subscription:
+    __slots__ = ('channels', 'loop', 'queue', 'overflowed')
+
+    def __init__(self, channels, loop, size):
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+        self.overflowed = False
+
+    def put(self, item):
+        # Runs on the subscriber's loop.
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class Broker:
+    """In-process pub/sub from any thread to the queues of the connected streams."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._ids = itertools.count(1)
+
+    def subscribe(self, channels):
+        subscription = Subscription(tuple(channels), asyncio.get_running_loop(), _setting('EVENT_STREAM_QUEUE_SIZE', 256))
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subscribers in self._channels.values() for s in subscribers})
+
+    def next_id(self):
+        return next(self._ids)
+
+    def deliver(self, event_id, channels, message):
+        with self._lock:
+            targets = {s for channel in channels for s in self._channels.get(channel, ())}
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, (event_id, message))
+            except RuntimeError:
+                # The loop is closed; its stream is gone.
+                self.unsubscribe(subscription)
+
+
+broker = Broker()
+
+
+def publish(events):
+    """Send ``(event, payload, batch_id, trainee_id)`` tuples to the matching streams once the
+    current transaction commits (immediately outside one)."""
+    events = list(events)
+    if not events:
+        return
+    if relay_enabled():
+        StreamEvent.objects.bulk_create(
+            [StreamEvent(event=event, payload=payload, batch_id=batch_id, trainee_id=trainee_id)
+             for event, payload, batch_id, trainee_id in events],
+            batch_size=500,
+        )
+        return
+    if not broker.subscriber_count():
+        return
+
+    def deliver():
+        for event, payload, batch_id, trainee_id in events:
+            event_id = broker.next_id()
+            broker.deliver(event_id, channels_of(batch_id, trainee_id), encode(event_id, event, payload))
+    transaction.on_commit(deliver)
+
+
+class Relay:
+    """Polls ``StreamEvent`` for one process and hands new rows to :data:`broker`.
+
+    Ids are assigned at insert but become visible at commit, possibly out of
+    order, so every poll looks back ``EVENT_RELAY_LOOKBACK_SECONDS`` and skips
+    ids it already delivered.
+    """
+    PRUNE_EVERY = 60.0
+
+    def __init__(self):
+        self._seen = set()
+        self._order = deque()
+        self._since = None
+        self._pruned = 0.0
+        self._task = None
+
+    def ensure_running(self):
+        task = self._task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        # Rows written while nobody was listening are only replayed through Last-Event-ID.
+        self._since = None
+        await sync_to_async(self.poll)(deliver=False)
+        while broker.subscriber_count():
+            try:
+                await sync_to_async(self.poll)()
+            except Exception:
+                logger.exception('Event relay poll failed')
+            await asyncio.sleep(_setting('EVENT_RELAY_POLL_INTERVAL', 1.0))
+
+    def poll(self, deliver=True):
+        """Deliver rows committed since the last poll; returns how many."""
+        close_old_connections()
+        now = timezone.now()
+        lookback = timedelta(seconds=_setting('EVENT_RELAY_LOOKBACK_SECONDS', 5.0))
+        since = (self._since or now) - lookback
+        self._since = now
+        rows = StreamEvent.objects.filter(created_at__gte=since).order_by('id').values_list(
+            'id', 'event', 'payload', 'batch_id', 'trainee_id',
+        )
+        delivered = 0
+        for event_id, event, payload, batch_id, trainee_id in rows:
+            if event_id in self._seen:
+                continue
+            self._remember(event_id)
+            if deliver:
+                broker.deliver(event_id, channels_of(batch_id, trainee_id), encode(event_id, event, payload))
+                delivered += 1
+        if time.monotonic() - self._pruned > self.PRUNE_EVERY:
+            self._pruned = time.monotonic()
+            keep = timedelta(seconds=_setting('EVENT_RELAY_RETENTION_SECONDS', 3600))
+            StreamEvent.objects.filter(created_at__lt=now - keep).delete()
+        return delivered
+
+    def _remember(self, event_id):
+        self._seen.add(event_id)
+        self._order.append(event_id)
+        while len(self._order) > 10000:
+            self._seen.discard(self._order.popleft())
+
+
+relay = Relay()
+
+
+def missed_events(batch_id, trainee_id, last_event_id, limit):
+    """Relay rows after ``last_event_id`` for a reconnecting stream, or None if more than ``limit``."""
+    rows = list(
+        StreamEvent.objects.filter(Q(batch_id=batch_id) if batch_id is not None else Q(trainee_id=trainee_id), id__gt=last_event_id)
+        .order_by('id').values_list('id', 'event', 'payload')[:limit + 1]
+    )
+    if len(rows) > limit:
+        return None
+    return [(event_id, encode(event_id, event, payload)) for event_id, event, payload in rows]
+
+
+async def stream(subscription, replay=(), after=0):
+    """Yield the SSE byte stream of ``subscription`` until it times out or the client goes away."""
+    loop = asyncio.get_running_loop()
+    keepalive = _setting('EVENT_STREAM_KEEPALIVE_SECONDS', 15.0)
+    deadline = loop.time() + _setting('EVENT_STREAM_MAX_SECONDS', 600)
+    try:
+        yield b'retry: 3000\n\n'
+        for event_id, message in replay:
+            after = event_id
+            yield message
+        while True:
+            if subscription.overflowed:
+                subscription.overflowed = False
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                yield encode(None, 'resync', {})
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                event_id, message = await asyncio.wait_for(subscription.queue.get(), min(keepalive, remaining))
+            except asyncio.TimeoutError:
+                yield b': keepalive\n\n'
+                continue
+            # Relay rows already sent as part of the replay.
+            if after and event_id <= after:
+                continue
+            yield message
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def _authenticate(request):
+    """The user of a Bearer token (header or ``?token=``, since ``EventSource`` cannot set
+    headers), or of the session; None if there is none or it is invalid."""
+    auth = CachedJWTAuthentication()
+    try:
+        raw = request.GET.get('token')
+        if raw:
+            return auth.get_user(auth.get_validated_token(raw))
+        result = auth.authenticate(request)
+    except (AuthenticationFailed, TokenError):
+        return None
+    if result is not None:
+        return result[0]
+    user = request.user
+    return user if user.is_authenticated else None
+
+
+def _can_watch(user, kind, pk):
+    if user.is_staff or getattr(user, 'role', '') == 'trainer':
+        return True
+    # Trainees see their own progress, never a whole batch.
+    return kind == 'trainee' and user.pk == pk
+
+
+async def event_stream(request, kind, pk):
+    """``text/event-stream`` of the progress and enrollment changes of one batch or trainee."""
+    kind = STREAM_KINDS[kind]
+    if not hasattr(request, 'scope'):
+        return JsonResponse({'detail': 'Event streams need the ASGI server (training_tracker.asgi).'}, status=501)
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if not _can_watch(user, kind, pk):
+        return JsonResponse({'detail': 'You do not have permission to watch this stream.'}, status=403)
+    model = Batch if kind == 'batch' else User
+    if not await model.objects.filter(pk=pk).aexists():
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+
+    subscription = broker.subscribe([f'{kind}:{pk}'])
+    replay, after = [], 0
+    if relay_enabled():
+        relay.ensure_running()
+        last_event_id = request.headers.get('Last-Event-ID', '')
+        if last_event_id.isdigit():
+            ids = (pk, None) if kind == 'batch' else (None, pk)
+            missed = await sync_to_async(missed_events)(*ids, int(last_event_id), subscription.queue.maxsize)
+            if missed is None:
+                subscription.overflowed = True
+            else:
+                replay, after = missed, int(last_event_id)
+    response = StreamingHttpResponse(stream(subscription, replay, after), content_type=CONTENT_TYPE)
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
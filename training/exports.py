@@ -0,0 +1,197 @@
+"""Streaming CSV/NDJSON exports.
+
+Rows are read with ``values(...)`` -- related names come from JOINs in the same
+query -- and ``iterator(chunk_size=...)``, then encoded and optionally gzipped
+chunk by chunk, so memory use does not grow with the number of rows exported.
+
+``iterator()`` only streams where the driver does: PostgreSQL and Oracle use
+server-side cursors and SQLite steps through the result, but mysqlclient's
+default cursor reads the whole result set into memory first.  On MySQL the rows
+are therefore read with an unbuffered ``SSCursor`` on a connection of the
+export's own (:func:`_server_side_rows`), which MySQL requires to be read to
+the end before it can run anything else.
+
+Under ASGI, Django consumes a synchronous streaming body with
+``sync_to_async(list)``, i.e. it buffers the whole export before sending a
+byte.  Requests served by the ASGI handler therefore get the same chunks as an
+async iterator (:func:`async_chunks`), one thread hop per chunk.
+"""
+import csv
+import json
+import zlib
+from datetime import date, datetime
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+
+from .audit import audit_sink
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+
+
+class _Echo:
+    """File-like object whose ``write`` just returns the line, for ``csv.writer``."""
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(headers, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([_csv_value(v) for v in row])
+
+
+def ndjson_lines(headers, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(headers, row))) + '\n'
+
+
+def buffered(lines, flush_bytes=FLUSH_BYTES):
+    """Join small lines into ~``flush_bytes`` chunks of bytes."""
+    parts, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        parts.append(data)
+        size += len(data)
+        if size >= flush_bytes:
+            yield b''.join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b''.join(parts)
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _server_side_rows(queryset, chunk_size):
+    """Rows of a ``values_list`` queryset through an unbuffered MySQL cursor.
+
+    The cursor gets a connection of its own, closed once the rows are read, so
+    the request's connection stays free for other queries meanwhile.  Django's
+    compiler builds the SQL and applies its usual value converters.
+    """
+    from MySQLdb.cursors import SSCursor
+
+    connection = connections.create_connection(queryset.db)
+    try:
+        connection.ensure_connection()
+        compiler = queryset.query.get_compiler(connection=connection)
+        sql, params = compiler.as_sql()
+        cursor = connection.connection.cursor(SSCursor)
+        cursor.execute(sql, params)
+
+        def chunks():
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+
+        yield from compiler.results_iter(results=chunks(), tuple_expected=True)
+    finally:
+        # Closing the connection rather than the cursor does not read the rest of
+        # an abandoned result first.
+        connection.close()
+
+
+def export_rows(queryset, lookups, chunk_size=CHUNK_SIZE):
+    """Stream ``lookups`` of every row of ``queryset`` as tuples."""
+    queryset = queryset.values_list(*lookups)
+    if connections[queryset.db].vendor == 'mysql':
+        return _server_side_rows(queryset, chunk_size)
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+async def async_chunks(chunks):
+    """Yield from the synchronous generator ``chunks`` without blocking the event loop.
+
+    Every step runs in the thread that served the (sync) view, which holds the
+    database connection the rows are read through.
+    """
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await step(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Also on client disconnect, so a server-side cursor is released.
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def stream_export(queryset, columns, export_format='csv', compress=False, filename='export', chunk_size=CHUNK_SIZE,
+                  asynchronous=False):
+    """Build a ``StreamingHttpResponse`` for ``columns`` (``(header, lookup)`` pairs) of ``queryset``.
+
+    ``asynchronous`` gives the response an async iterator, for the ASGI handler.
+    """
+    content_type, extension = EXPORT_FORMATS[export_format]
+    headers = [header for header, _ in columns]
+    rows = export_rows(queryset, [lookup for _, lookup in columns], chunk_size)
+    lines = csv_lines(headers, rows) if export_format == 'csv' else ndjson_lines(headers, rows)
+    body = buffered(lines)
+    filename = f'{filename}-{timezone.now():%Y%m%d-%H%M%S}.{extension}'
+    if compress:
+        body = gzipped(body)
+        content_type = 'application/gzip'
+        filename += '.gz'
+    response = StreamingHttpResponse(async_chunks(body) if asynchronous else body, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class ExportMixin:
+    """Adds ``GET <prefix>/export/?output=csv|ndjson&compress=gzip`` to a viewset.
+
+    The export honours the same scoping (``get_queryset``) and filters
+    (``filter_queryset``) as the list endpoint, without pagination.
+    """
+    export_columns = ()
+    export_filename = 'export'
+    export_ordering = ('id',)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        export_format = request.query_params.get('output', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'output': f'Expected one of: {", ".join(EXPORT_FORMATS)}.'})
+        compress = request.query_params.get('compress') == 'gzip'
+        queryset = self.filter_queryset(self.get_queryset())
+        if 'ordering' not in request.query_params:
+            queryset = queryset.order_by(*self.export_ordering)
+        audit_sink.record(
+            user=request.user,
+            action='EXPORT',
+            table_name=queryset.model._meta.db_table,
+            new_values={'output': export_format, 'compress': compress, 'query': request.query_params.dict()},
+        )
+        return stream_export(queryset, self.export_columns, export_format, compress, self.export_filename,
+                             asynchronous=isinstance(request._request, ASGIRequest))
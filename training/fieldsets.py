@@ -0,0 +1,192 @@
+"""Sparse fieldsets (``?fields=``) and related-object expansion (``?expand=``).
+
+``?fields=id,name,batch`` limits a list/retrieve response to those fields, and
+``?expand=batch`` replaces the ``batch`` id with the batch itself, serialized
+by the serializer named in ``expandable_fields``.  Both take dotted paths into
+expanded objects: ``?expand=batch.program&fields=id,batch.name,batch.program``.
+
+:class:`SparseFieldsetMixin` passes the parsed paths to the serializer and
+narrows the queryset to match: ``only()`` the selected columns,
+``select_related`` for expanded foreign keys and ``prefetch_related`` only for
+the nested lists still selected, so a smaller payload is also a cheaper query.
+Requests without either parameter are served exactly as before.
+
+Expanding a field shows what the viewset serving its serializer would show, so
+it needs that viewset's permissions: a trainee cannot ``?expand=batch`` into
+data ``/batches/`` refuses them (403).  Serializers no viewset serves, such as
+the user summaries, can be expanded by anyone who can see the row.
+"""
+from importlib import import_module
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+FIELDSET_ACTIONS = ('list', 'retrieve')
+
+# Serializer class -> the viewset serving it, filled in as viewsets are defined.
+_viewsets = {}
+
+
+def parse_paths(value):
+    """``'id,batch.name,batch.program'`` -> ``{'id': {}, 'batch': {'name': {}, 'program': {}}}``;
+    ``None`` when the parameter is absent or blank."""
+    if not value or not value.strip():
+        return None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in (part.strip() for part in path.split('.')):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def expand_serializer_class(serializer_class, name):
+    """The serializer class ``serializer_class`` expands ``name`` with."""
+    serializer = serializer_class.expandable_fields[name]
+    if isinstance(serializer, str):
+        serializer = getattr(import_module(serializer_class.__module__), serializer)
+    return serializer
+
+
+class FieldsetSerializerMixin:
+    """Accepts ``fields``/``expand`` path trees (see :func:`parse_paths`) as keyword arguments.
+
+    ``expandable_fields`` maps a foreign key field to the name of a serializer
+    class in the same module, resolved when first used.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None or expand:
+            self._apply_fieldset(fields, expand or {})
+
+    def _apply_fieldset(self, fields, expand):
+        for name in expand:
+            if name not in self.expandable_fields:
+                raise ValidationError({'expand': [f'"{name}" cannot be expanded; expandable: {", ".join(sorted(self.expandable_fields)) or "none"}.']})
+        if fields is not None:
+            unknown = sorted(set(fields) - set(self.fields))
+            if unknown:
+                raise ValidationError({'fields': [f'Unknown field "{name}".' for name in unknown]})
+            for name, nested in fields.items():
+                if nested and name not in expand:
+                    raise ValidationError({'fields': [f'"{name}.{next(iter(nested))}" needs expand={name}.']})
+            for name in list(self.fields):
+                if name not in fields and name not in expand:
+                    self.fields.pop(name)
+        for name, nested_expand in expand.items():
+            nested_fields = (fields or {}).get(name) or None
+            self.fields[name] = expand_serializer_class(type(self), name)(read_only=True, fields=nested_fields, expand=nested_expand)
+
+
+def _lookup(prefetch):
+    return prefetch.prefetch_to if isinstance(prefetch, Prefetch) else prefetch
+
+
+def _plan(serializer, model, prefix, only, related, prefetch):
+    """Collect the columns, joins and prefetches ``serializer`` reads; False if a field has a
+    source that cannot be traced to the model, in which case nothing is deferred."""
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*' or '.' in field.source:
+            return False
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return False
+        path = prefix + field.source
+        if model_field.many_to_one or model_field.one_to_one:
+            if not model_field.concrete:
+                return False
+            only.append(path)
+            if isinstance(field, serializers.BaseSerializer):
+                related.append(path)
+                if not _plan(field, model_field.related_model, path + '__', only, related, prefetch):
+                    return False
+        elif model_field.one_to_many or model_field.many_to_many:
+            prefetch.append(path)
+        elif model_field.concrete:
+            only.append(path)
+        else:
+            return False
+    return True
+
+
+def narrow_queryset(queryset, serializer, required=()):
+    """Restrict ``queryset`` to what ``serializer`` (possibly a list serializer) outputs.
+
+    Prefetches already on the queryset (e.g. an ordered ``Prefetch``) are kept when
+    their field is still selected and dropped otherwise.
+    """
+    serializer = getattr(serializer, 'child', serializer)
+    only, related, prefetch = list(required), [], []
+    if not _plan(serializer, queryset.model, '', only, related, prefetch):
+        return queryset
+    # Django has no public accessor for the lookups already queued on a queryset.
+    existing = list(queryset._prefetch_related_lookups)
+    kept = [lookup for lookup in existing if _lookup(lookup) in prefetch]
+    kept += [path for path in prefetch if path not in {_lookup(lookup) for lookup in kept}]
+    queryset = queryset.only(*only)
+    if related:
+        queryset = queryset.select_related(*related)
+    if existing or kept:
+        queryset = queryset.prefetch_related(None).prefetch_related(*kept)
+    return queryset
+
+
+class SparseFieldsetMixin:
+    """Adds ``?fields=`` and ``?expand=`` to the list and retrieve actions of a viewset."""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__dict__.get('serializer_class') is not None:
+            _viewsets.setdefault(cls.serializer_class, cls)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        _, expand = self.get_fieldset()
+        if expand:
+            self.check_expand_permissions(self.get_serializer_class(), expand)
+
+    def check_expand_permissions(self, serializer_class, expand, prefix=''):
+        """Raise ``PermissionDenied`` unless the request may list every expanded serializer's viewset."""
+        for name, nested in expand.items():
+            if name not in getattr(serializer_class, 'expandable_fields', {}):
+                continue  # the serializer rejects it with a 400
+            target = expand_serializer_class(serializer_class, name)
+            viewset = _viewsets.get(target)
+            if viewset is not None:
+                view = viewset(request=self.request, args=(), kwargs={}, action='list', format_kwarg=None)
+                if not all(permission.has_permission(self.request, view) for permission in view.get_permissions()):
+                    raise PermissionDenied(f'You do not have permission to expand "{prefix}{name}".')
+            self.check_expand_permissions(target, nested, f'{prefix}{name}.')
+
+    def get_fieldset(self):
+        """``(fields, expand)`` path trees of the request, or ``(None, None)``."""
+        if getattr(self, 'action', None) not in FIELDSET_ACTIONS or self.request is None:
+            return None, None
+        params = self.request.query_params
+        return parse_paths(params.get('fields')), parse_paths(params.get('expand'))
+
+    def get_fieldset_required_fields(self):
+        # Keyset pagination reads the cursor fields of the last row on the page.
+        return [name.lstrip('-') for name in getattr(self, 'cursor_ordering', ())]
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_fieldset()
+        if fields is not None or expand:
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, expand = self.get_fieldset()
+        if fields is None and not expand:
+            return queryset
+        return narrow_queryset(queryset, self.get_serializer(), self.get_fieldset_required_fields())
@@ -0,0 +1,76 @@
+"""Parallel password hashing for bulk user imports.
+
+PBKDF2 is deliberately slow (hundreds of milliseconds per password with the
+default iteration count), so hashing a few thousand passwords on one core takes
+minutes.  :func:`hash_passwords` spreads the work over a process pool instead.
+
+The pool is started on first use and shared by every later import in the
+process, so a web worker pays the start-up once rather than per request.  Its
+processes are spawned, not forked: forking a threaded server copies locks held
+by its other threads into the child.
+
+This module must not import models: spawned worker processes import it before
+Django's app registry is ready.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+CHUNK_SIZE = 32
+# Below this many usable passwords a pool costs more to start than it saves.
+PARALLEL_MIN = 64
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _hash_chunk(passwords):
+    # make_password(None) gives an unusable password, for accounts that must reset first.
+    return [make_password(password or None) for password in passwords]
+
+
+def _init_worker(settings_module):
+    if settings_module:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+
+
+def get_pool(workers, discard=None):
+    """The shared pool with ``workers`` processes, started (or resized) on first use.
+
+    ``discard`` is a pool that broke; it is replaced even if the size matches.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and (_pool is discard or _pool_workers != workers):
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            settings_module = getattr(settings, 'SETTINGS_MODULE', None) or os.environ.get('DJANGO_SETTINGS_MODULE', '')
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker, initargs=(settings_module,),
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def hash_passwords(passwords, workers=None):
+    """Return ``make_password`` for each of ``passwords``, in order; blank ones become unusable."""
+    passwords = list(passwords)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or sum(1 for p in passwords if p) < PARALLEL_MIN:
+        return _hash_chunk(passwords)
+    chunks = [passwords[i:i + CHUNK_SIZE] for i in range(0, len(passwords), CHUNK_SIZE)]
+    pool = get_pool(workers)
+    try:
+        results = list(pool.map(_hash_chunk, chunks))
+    except BrokenProcessPool:
+        # A worker died (killed, out of memory); start a fresh pool and retry once.
+        results = list(get_pool(workers, discard=pool).map(_hash_chunk, chunks))
+    return [hashed for chunk in results for hashed in chunk]
@@ -0,0 +1,110 @@
+"""Date-driven batch lifecycle.
+
+A batch is ``scheduled`` until its ``start_date``, ``running`` until its
+``end_date`` and ``completed`` after it; cancelled batches, batches already
+completed and dates that are not set are left alone.  :func:`advance` moves
+every batch that is behind its dates with a few set-based UPDATEs per chunk of
+batches and cascades the change to their enrollments: ``enrolled`` trainees
+become ``in_progress`` when the batch starts, and ``enrolled`` or
+``in_progress`` ones become ``completed`` when it ends, with the batch's
+``end_date`` as their ``completion_date`` unless one was recorded.  Dropped and
+waitlisted enrollments are not touched.
+
+The UPDATEs bypass signals, so :func:`advance` updates the dashboard counters,
+compliance matrix, table versions and event streams itself and writes one
+summarized audit entry.  A tick with nothing to do writes nothing, which makes
+``manage.py advance_batches --loop`` safe to run as often as needed.
+"""
+from collections import Counter, namedtuple
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .audit import audit_sink
+from .models import Batch, BatchTrainee
+from . import caching, compliance, events, stats
+
+CHUNK_SIZE = 500
+# Batch status -> the status its active enrollments move to.
+ENROLLMENT_STATUS = {'running': 'in_progress', 'completed': 'completed'}
+# What events.enrollment_event reads, without building model instances.
+MovedEnrollment = namedtuple('MovedEnrollment', 'pk batch_id trainee_id status')
+
+
+def _due(today):
+    """``(new status, batches due for it, enrollment statuses that follow)``, completions first."""
+    return (
+        ('completed', Batch.objects.filter(status__in=('scheduled', 'running'), end_date__lt=today), ('enrolled', 'in_progress')),
+        ('running', Batch.objects.filter(Q(end_date__isnull=True) | Q(end_date__gte=today), status='scheduled', start_date__lte=today), ('enrolled',)),
+    )
+
+
+def _claim(batches):
+    """Ids of ``batches``, locked until the transaction ends.
+
+    The no-op UPDATE takes the row locks (the database write lock on SQLite)
+    before the ids are read, so overlapping ticks run one after the other and
+    the second finds nothing left to do.
+    """
+    if not batches.update(status=F('status')):
+        return []
+    return list(batches.order_by('pk').values_list('id', flat=True))
+
+
+def advance(today=None, user=None, chunk_size=CHUNK_SIZE):
+    """Move every batch whose dates have passed to its next status, in one transaction.
+
+    Returns ``{'batches': {status: n}, 'enrollments': {status: n}}`` for the
+    rows that changed.
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    moved_batches, moved_enrollments = {}, Counter({status: 0 for status in ENROLLMENT_STATUS.values()})
+    old_keys, new_keys, changed = [], [], []
+    with transaction.atomic():
+        for status, due, active in _due(today):
+            batch_ids = _claim(due)
+            moved_batches[status] = batch_ids
+            enrollment_status = ENROLLMENT_STATUS[status]
+            for start in range(0, len(batch_ids), chunk_size):
+                chunk = batch_ids[start:start + chunk_size]
+                batches = Batch.objects.filter(pk__in=chunk)
+                for old in batches.values_list('status', flat=True):
+                    old_keys.extend(stats.counter_keys(Batch, {'status': old}))
+                    new_keys.extend(stats.counter_keys(Batch, {'status': status}))
+                batches.update(status=status, updated_at=now)
+
+                enrollments = BatchTrainee.objects.filter(batch_id__in=chunk, status__in=active)
+                rows = list(enrollments.values_list('id', 'batch_id', 'trainee_id', 'status'))
+                values = {'status': enrollment_status, 'updated_at': now}
+                if status == 'completed':
+                    end_date = Batch.objects.filter(pk=OuterRef('batch_id')).values('end_date')[:1]
+                    values['completion_date'] = Coalesce(F('completion_date'), Subquery(end_date))
+                enrollments.update(**values)
+                for pk, batch_id, trainee_id, old in rows:
+                    old_keys.extend(stats.counter_keys(BatchTrainee, {'status': old, 'trainee_id': trainee_id}))
+                    new_keys.extend(stats.counter_keys(BatchTrainee, {'status': enrollment_status, 'trainee_id': trainee_id}))
+                    changed.append(MovedEnrollment(pk, batch_id, trainee_id, enrollment_status))
+                moved_enrollments[enrollment_status] += len(rows)
+
+        result = {
+            'batches': {status: len(ids) for status, ids in moved_batches.items()},
+            'enrollments': dict(moved_enrollments),
+        }
+        if not any(result['batches'].values()):
+            return result
+        stats.apply_deltas(stats.key_deltas(old_keys, new_keys))
+        caching.bump_table_versions(Batch, *([BatchTrainee] if changed else []))
+        # Starting only swaps enrolled for in_progress, which the matrix treats alike.
+        compliance.refresh_trainees({e.trainee_id for e in changed if e.status == 'completed'})
+        events.publish(events.enrollment_event(enrollment) for enrollment in changed)
+        audit_sink.record(
+            user=user,
+            action='BATCH_LIFECYCLE',
+            table_name=Batch._meta.db_table,
+            record_id=None,
+            new_values={'date': today.isoformat(), 'batches': result['batches'], 'enrollments': result['enrollments']},
+        )
+    return result
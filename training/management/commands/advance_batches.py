@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from training import lifecycle
+
+class Command(BaseCommand):
+    help = "Start and complete batches whose start/end dates have passed, cascading to their enrollments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Run as of this date (YYYY-MM-DD) instead of today')
+        parser.add_argument('--chunk-size', type=int, default=lifecycle.CHUNK_SIZE, help='Batches per UPDATE')
+        parser.add_argument('--loop', action='store_true', help='Keep running, ticking every --interval seconds')
+        parser.add_argument('--interval', type=float, default=300.0, help='Seconds between ticks with --loop')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError(f"Invalid --date {options['date']!r}; expected YYYY-MM-DD.")
+        while True:
+            started = time.perf_counter()
+            moved = lifecycle.advance(today, chunk_size=options['chunk_size'])
+            if any(moved['batches'].values()) or not options['loop']:
+                self.stdout.write(
+                    f"started {moved['batches']['running']} and completed {moved['batches']['completed']} batches, "
+                    f"{moved['enrollments']['in_progress']} enrollments in progress and "
+                    f"{moved['enrollments']['completed']} completed in {time.perf_counter() - started:.2f}s"
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
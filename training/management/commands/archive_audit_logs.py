@@ -0,0 +1,29 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from training.audit_archive import BLOCK_ROWS, archive_dir, archive_older_than
+from training.models import AuditLog
+
+class Command(BaseCommand):
+    help = "Move audit log rows older than --days into monthly gzip NDJSON archives, then delete them in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.AUDIT_RETENTION_DAYS, help='Keep this many days of audit rows in the table')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows read, archived and deleted per pass')
+        parser.add_argument('--block-rows', type=int, default=BLOCK_ROWS, help='Rows per independently compressed archive block')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be archived')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        if options['dry_run']:
+            count = AuditLog.objects.filter(created_at__lt=cutoff).count()
+            self.stdout.write(f'{count} audit rows older than {cutoff:%Y-%m-%d %H:%M} would be archived to {archive_dir()}')
+            return
+        result = archive_older_than(cutoff, options['batch_size'], options['block_rows'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result['archived']} and deleted {result['deleted']} audit rows older than {cutoff:%Y-%m-%d %H:%M} "
+            f"into {archive_dir()} ({', '.join(result['months']) or 'no months'})"
+        ))
@@ -0,0 +1,87 @@
+import statistics
+import time
+from collections import defaultdict
+import numpy as np
+from django.core.management.base import BaseCommand
+from training import analytics
+
+class Command(BaseCommand):
+    help = "Time the NumPy cohort analytics on synthetic progress data (default 1M rows) against a pure-Python pass"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Number of synthetic progress records')
+        parser.add_argument('--topics', type=int, default=20, help='Topics per program')
+        parser.add_argument('--batch-size', type=int, default=25, help='Trainees per batch')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (median is reported)')
+        parser.add_argument('--no-baseline', action='store_true', help='Skip the pure-Python comparison')
+        parser.add_argument('--db', action='store_true', help='Also time loading the columns from the database')
+
+    def handle(self, *args, **options):
+        data = self._synthetic(options['rows'], options['topics'], options['batch_size'])
+        self.stdout.write(f"{len(data['records'])} records, {len(data['enrollments'])} enrollments, "
+                          f"{len(data['batch_ids'])} batches, {len(data['topic_ids'])} topics")
+        numpy_s = self._median(lambda: analytics.compute_cohorts(data, 50), options['repeat'])
+        self.stdout.write(f'numpy:       {numpy_s * 1000:10.1f} ms')
+        if not options['no_baseline']:
+            python_s = self._median(lambda: self._python_baseline(data), 1)
+            self.stdout.write(f'pure python: {python_s * 1000:10.1f} ms ({python_s / numpy_s:.1f}x slower)')
+        if options['db']:
+            began = time.perf_counter()
+            loaded = analytics.load_columns()
+            load_s = time.perf_counter() - began
+            self.stdout.write(f"load_columns on this database ({len(loaded['records'])} records): {load_s * 1000:.1f} ms")
+
+    def _synthetic(self, rows, topics_per_program, batch_size):
+        rng = np.random.default_rng(42)
+        enrollments_needed = max(rows // topics_per_program, 1)
+        batches = max(enrollments_needed // batch_size, 1)
+        programs = max(batches // 10, 1)
+        batch_ids = np.arange(1, batches + 1)
+        batch_programs = rng.integers(1, programs + 1, batches)
+        topic_ids = np.arange(1, programs * topics_per_program + 1)
+        topic_programs = (topic_ids - 1) // topics_per_program + 1
+        enroll_batch = np.repeat(batch_ids, batch_size)
+        enroll_trainee = rng.integers(1, enrollments_needed + 1, len(enroll_batch))
+        pick = rng.integers(0, len(enroll_batch), rows)
+        record_topic = (batch_programs[enroll_batch[pick] - 1] - 1) * topics_per_program + rng.integers(1, topics_per_program + 1, rows)
+        records = np.empty(rows, dtype=analytics.RECORD_DTYPE)
+        records['batch'], records['trainee'], records['topic'] = enroll_batch[pick], enroll_trainee[pick], record_topic
+        records['pct'] = rng.choice([0, 25, 50, 75, 100], rows)
+        enrollments = np.empty(len(enroll_batch), dtype=analytics.ENROLLMENT_DTYPE)
+        enrollments['batch'], enrollments['trainee'] = enroll_batch, enroll_trainee
+        return {
+            'records': records, 'enrollments': enrollments,
+            'batch_ids': batch_ids, 'batch_programs': batch_programs, 'batch_names': [f'Batch {i}' for i in batch_ids],
+            'topic_ids': topic_ids, 'topic_programs': topic_programs,
+            'topic_hours': rng.integers(0, 8, len(topic_ids)).astype('f8'), 'topic_names': [f'Topic {i}' for i in topic_ids],
+            'program_names': {int(p): f'Program {p}' for p in np.unique(batch_programs)},
+        }
+
+    def _python_baseline(self, data):
+        """Per-batch mean/p50/p90 with dicts and loops, as a spreadsheet-style script would."""
+        batch_program = dict(zip(data['batch_ids'].tolist(), data['batch_programs'].tolist()))
+        hours = defaultdict(dict)
+        for topic, program, h in zip(data['topic_ids'].tolist(), data['topic_programs'].tolist(), data['topic_hours'].tolist()):
+            hours[program][topic] = h
+        latest = {}
+        for batch, trainee, topic, pct in data['records'].tolist():
+            latest[(batch, trainee, topic)] = min(max(pct, 0), 100)
+        completion = defaultdict(float)
+        for (batch, trainee, topic), pct in latest.items():
+            program_hours = hours[batch_program[batch]]
+            total = sum(program_hours.values())
+            weight = program_hours.get(topic, 0) / total if total else 1 / len(program_hours)
+            completion[(batch, trainee)] += pct * weight
+        by_batch = defaultdict(list)
+        for batch, trainee in set(map(tuple, data['enrollments'].tolist())):
+            by_batch[batch].append(completion.get((batch, trainee), 0.0))
+        return {b: (statistics.mean(v), statistics.median(v), statistics.quantiles(v, n=10)[-1] if len(v) > 1 else v[0])
+                for b, v in by_batch.items()}
+
+    def _median(self, func, repeat):
+        timings = []
+        for _ in range(max(repeat, 1)):
+            began = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - began)
+        return statistics.median(timings)
@@ -0,0 +1,173 @@
+import json
+import platform
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from rest_framework.test import APIClient
+from training.bench import get_routes, summarize
+from training.models import User
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class Command(BaseCommand):
+    help = "Drive every GET router endpoint with concurrent clients and write throughput and p50/p95/p99 latency to JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients per endpoint')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per endpoint first')
+        parser.add_argument('--only', action='append', help='Only endpoints whose basename, action or URL contains this (repeatable)')
+        parser.add_argument('--user', help='User the in-process client authenticates as (default: the first superuser)')
+        parser.add_argument('--server', help='Base URL of a running server, e.g. http://127.0.0.1:8000, instead of the in-process client')
+        parser.add_argument('--token', help='JWT access token for --server')
+        parser.add_argument('--username', help='Obtain a token for --server with this username and --password')
+        parser.add_argument('--password')
+        parser.add_argument('--output', default='bench_api.json', help='JSON results file')
+        parser.add_argument('--compare', help='Earlier results file to compare p95 latency and throughput against')
+
+    def handle(self, *args, **options):
+        routes = [
+            route for route in get_routes()
+            if not options['only'] or any(part in ' '.join(route) for part in options['only'])
+        ]
+        if not routes:
+            raise CommandError('No endpoints match --only')
+        fetch = self._server_fetcher(options) if options['server'] else self._client_fetcher(options)
+        concurrency = max(options['concurrency'], 1)
+
+        endpoints = []
+        for basename, action, url in routes:
+            for _ in range(options['warmup']):
+                fetch(url)
+            result = self._run(fetch, url, options['requests'], concurrency)
+            result.update(basename=basename, action=action, url=url)
+            endpoints.append(result)
+            self.stdout.write(
+                f"{basename + ' ' + action:<40} {result['throughput_rps']:>8.1f} req/s  p50 {result['p50_ms']:>8.2f}  "
+                f"p95 {result['p95_ms']:>8.2f}  p99 {result['p99_ms']:>8.2f} ms  queries {result['queries']}"
+                + (f"  errors {result['errors']}" if result['errors'] else '')
+            )
+        latencies = [latency for result in endpoints for latency in result.pop('latencies')]
+        report = {
+            'meta': {
+                'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'target': options['server'] or 'in-process',
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'requests_per_endpoint': options['requests'],
+                'concurrency': concurrency,
+            },
+            # Overall throughput over the timed runs only, without warm-up requests.
+            'summary': summarize(latencies, sum(r['seconds'] for r in endpoints), sum(r['errors'] for r in endpoints)),
+            'endpoints': endpoints,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2)
+        summary = report['summary']
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['requests']} requests, {summary['throughput_rps']} req/s overall, p95 {summary['p95_ms']} ms; "
+            f"wrote {options['output']}"
+        ))
+        if options['compare']:
+            self._compare(options['compare'], endpoints)
+
+    def _run(self, fetch, url, requests, concurrency):
+        """Split ``requests`` over ``concurrency`` threads; each records its own latencies."""
+        latencies, queries, errors = [], [], [0]
+        lock = threading.Lock()
+
+        def worker(count):
+            mine, counted, failed = [], [], 0
+            try:
+                for _ in range(count):
+                    started = time.perf_counter()
+                    ok, query_count = fetch(url)
+                    mine.append(time.perf_counter() - started)
+                    failed += not ok
+                    if query_count is not None:
+                        counted.append(query_count)
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connections.close_all()
+            with lock:
+                latencies.extend(mine)
+                queries.extend(counted)
+                errors[0] += failed
+
+        shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+        began = time.perf_counter()
+        if concurrency == 1:
+            worker(requests)
+        else:
+            threads = [threading.Thread(target=worker, args=(share,)) for share in shares if share]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        result = summarize(latencies, time.perf_counter() - began, errors[0])
+        result['queries'] = round(sum(queries) / len(queries), 1) if queries else None
+        result['latencies'] = latencies
+        return result
+
+    def _client_fetcher(self, options):
+        users = User.objects.filter(username=options['user']) if options['user'] else User.objects.filter(is_superuser=True).order_by('pk')
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to authenticate as; pass --user or create a superuser')
+        local = threading.local()
+
+        def fetch(url):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = APIClient()
+                client.force_authenticate(user)
+            response = client.get(url, HTTP_ACCEPT='application/json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            match = QUERIES.search(response.get('Server-Timing', ''))
+            return response.status_code == 200, int(match.group(1)) if match else None
+        return fetch
+
+    def _server_fetcher(self, options):
+        base = options['server'].rstrip('/')
+        token = options['token']
+        if not token:
+            if not options['username']:
+                raise CommandError('--server needs --token or --username/--password')
+            body = json.dumps({'username': options['username'], 'password': options['password'] or ''}).encode('utf-8')
+            request = urllib.request.Request(f'{base}/api/token/', body, {'Content-Type': 'application/json'})
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    token = json.load(response)['access']
+            except urllib.error.URLError as exc:
+                raise CommandError(f'Could not obtain a token from {base}: {exc}')
+        headers = {'Authorization': f'Bearer {token}', 'Accept': 'application/json'}
+
+        def fetch(url):
+            try:
+                with urllib.request.urlopen(urllib.request.Request(base + url, headers=headers), timeout=60) as response:
+                    response.read()
+                    match = QUERIES.search(response.headers.get('Server-Timing', ''))
+                    return response.status == 200, int(match.group(1)) if match else None
+            except (urllib.error.URLError, OSError):
+                return False, None
+        return fetch
+
+    def _compare(self, path, endpoints):
+        with open(path, encoding='utf-8') as handle:
+            baseline = {(e['basename'], e['action']): e for e in json.load(handle)['endpoints']}
+        self.stdout.write(f'Compared with {path} (ratio new/old):')
+        for result in endpoints:
+            old = baseline.get((result['basename'], result['action']))
+            if not old:
+                continue
+            p95 = result['p95_ms'] / old['p95_ms'] if old['p95_ms'] else float('inf')
+            rps = result['throughput_rps'] / old['throughput_rps'] if old['throughput_rps'] else float('inf')
+            flag = '  <-- slower' if p95 > 1.2 else ''
+            self.stdout.write(f"  {result['basename'] + ' ' + result['action']:<40} p95 {p95:>6.2f}x  throughput {rps:>6.2f}x{flag}")
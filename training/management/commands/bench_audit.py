@@ -0,0 +1,64 @@
+import time
+from contextlib import nullcontext
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from training.audit import AuditSink
+from training.caching import bump_table_versions
+from training.models import AuditLog
+
+class Command(BaseCommand):
+    help = "Compare audit log writes per second: direct inserts vs. the buffered and background sinks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=5000, help='Audit entries written per mode')
+        parser.add_argument('--per-request', type=int, default=20, help='Entries recorded per simulated request')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark rows instead of deleting them')
+
+    def handle(self, *args, **options):
+        entries, per_request = options['entries'], max(options['per_request'], 1)
+        start_id = AuditLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+        def fields(i):
+            return dict(action='bench', table_name='bench', record_id=i, new_values={'i': i})
+
+        def direct():
+            for i in range(entries):
+                AuditLog.objects.create(**fields(i))
+
+        def buffered(atomic):
+            sink = AuditSink(mode='buffered', max_buffer=max(per_request, 500))
+            def run():
+                for offset in range(0, entries, per_request):
+                    with sink.buffered(), (transaction.atomic() if atomic else nullcontext()):
+                        for i in range(offset, min(offset + per_request, entries)):
+                            sink.record(**fields(i))
+            return run
+
+        def background():
+            sink = AuditSink(mode='background', max_buffer=500)
+            for i in range(entries):
+                sink.record(**fields(i))
+            # Wait for the writer thread, so the rate includes the inserts and not just the queueing.
+            sink.shutdown()
+
+        results = {}
+        modes = (
+            ('direct create (old path)', direct),
+            ('buffered, autocommit', buffered(False)),
+            ('buffered, in transaction', buffered(True)),
+            ('background, drained', background),
+        )
+        for name, run in modes:
+            began = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - began
+            results[name] = entries / elapsed if elapsed else float('inf')
+
+        if not options['keep']:
+            AuditLog.objects.filter(id__gt=start_id, action='bench').delete()
+        bump_table_versions(AuditLog)
+
+        baseline = results['direct create (old path)']
+        self.stdout.write(f'{entries} entries, {per_request} per request')
+        for name, rate in results.items():
+            self.stdout.write(f'  {name:<28} {rate:>10.0f} writes/s  ({rate / baseline:.1f}x)')
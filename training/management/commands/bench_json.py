@@ -0,0 +1,96 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from training.models import AuditLog, ProgressRecord
+from training.renderers import ORJSONRenderer, orjson
+from training.serializers import AuditLogSerializer, ProgressRecordSerializer
+
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36'
+
+
+class Command(BaseCommand):
+    help = "Time serialize -> render -> compress of list pages: DRF's JSON renderer uncompressed vs. orjson + gzip"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='20,100,500', help='Comma-separated page sizes')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per measurement (median is reported)')
+        parser.add_argument('--db', action='store_true', help='Use the newest rows of the database instead of generated ones')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError('orjson is not installed; both renderers would be the same')
+        sizes = sorted(int(s) for s in options['sizes'].split(',') if s.strip())
+        self.stdout.write(
+            f'{"serializer":<26} {"rows":>5} {"serialize":>10} | {"json render":>11} {"bytes":>9} | '
+            f'{"orjson":>8} {"gzip":>8} {"bytes":>9} | {"render":>7} {"path":>6} {"bytes":>6}'
+        )
+        for serializer_class, rows in (
+            (ProgressRecordSerializer, self._progress_rows if not options['db'] else self._db_rows(ProgressRecord, '-last_updated')),
+            (AuditLogSerializer, self._audit_rows if not options['db'] else self._db_rows(AuditLog, '-created_at')),
+        ):
+            for size in sizes:
+                self._measure(serializer_class, rows(size), options['repeat'])
+
+    def _measure(self, serializer_class, page, repeat):
+        serialize = self._median(lambda: serializer_class(page, many=True).data, repeat)
+        data = serializer_class(page, many=True).data
+        today, new = JSONRenderer(), ORJSONRenderer()
+        old_body, new_body = today.render(data), new.render(data)
+        old_render = self._median(lambda: today.render(data), repeat)
+        new_render = self._median(lambda: new.render(data), repeat)
+        compress = self._median(lambda: compress_string(new_body), repeat)
+        wire = len(compress_string(new_body))
+        # Speed-ups (old / new) of rendering alone and of the whole CPU path, and the payload reduction.
+        old_path, new_path = serialize + old_render, serialize + new_render + compress
+        self.stdout.write(
+            f'{serializer_class.__name__:<26} {len(page):>5} {serialize:>7.2f} ms | {old_render:>8.2f} ms {len(old_body):>9} | '
+            f'{new_render:>5.2f} ms {compress:>5.2f} ms {wire:>9} | '
+            f'{old_render / new_render:>6.1f}x {old_path / new_path:>5.2f}x {len(old_body) / wire:>5.1f}x'
+        )
+
+    def _median(self, func, repeat):
+        timings = []
+        for _ in range(max(repeat, 1)):
+            began = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - began) * 1000)
+        return statistics.median(timings)
+
+    def _db_rows(self, model, ordering):
+        def rows(size):
+            page = list(model.objects.order_by(ordering, '-id')[:size])
+            if len(page) < size:
+                raise CommandError(f'Only {len(page)} {model.__name__} rows; seed more (seed_scale) or drop --db')
+            return page
+        return rows
+
+    def _progress_rows(self, size):
+        rng, now = random.Random(size), timezone.now()
+        return [
+            ProgressRecord(
+                id=i + 1, trainee_id=rng.randint(1, 2000), batch_id=rng.randint(1, 500), topic_id=rng.randint(1, 1200),
+                status=rng.choice(('not_started', 'in_progress', 'completed')), completion_percentage=rng.choice((0, 25, 50, 75, 100)),
+                notes=rng.choice((None, '', 'Reviewed the exercises; needs another pass on the quiz.')),
+                last_updated=now - timedelta(minutes=rng.randint(0, 100000)), updated_by_id=rng.choice((None, 1, 2)),
+            )
+            for i in range(size)
+        ]
+
+    def _audit_rows(self, size):
+        rng, now = random.Random(size), timezone.now()
+        return [
+            AuditLog(
+                id=i + 1, user_id=rng.randint(1, 50), action=rng.choice(('CREATE', 'UPDATE', 'DELETE')),
+                table_name=rng.choice(('training_batch', 'training_progressrecord', 'training_user')), record_id=rng.randint(1, 10000),
+                old_values={'status': 'in_progress', 'completion_percentage': 50, 'notes': None},
+                new_values={'status': 'completed', 'completion_percentage': 100, 'notes': 'Done', 'updated_by': 2},
+                ip_address=f'10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}', user_agent=USER_AGENT,
+                created_at=now - timedelta(minutes=rng.randint(0, 500000)),
+            )
+            for i in range(size)
+        ]
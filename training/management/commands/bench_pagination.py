@@ -0,0 +1,74 @@
+import statistics
+from base64 import b64encode
+import time
+from datetime import timedelta
+from urllib.parse import urlencode
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.test import APIClient
+from training.models import AuditLog, User
+
+BENCH_ACTION = 'bench_pagination'
+
+class Command(BaseCommand):
+    help = ("Show /audit-logs/ page latency for deep page-number vs. keyset pages as the table grows; "
+            "everything the benchmark writes is rolled back")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,50000,200000', help='Comma-separated table sizes to measure at')
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per measurement (median is reported)')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(s) for s in options['sizes'].split(',') if s.strip())
+        # The staff user and the generated rows only live in this transaction, so
+        # running it against a real database leaves nothing behind.
+        with transaction.atomic():
+            user = User.objects.create(username=f'bench-pagination-{time.time_ns()}', is_staff=True, role='admin')
+            client = APIClient()
+            client.force_authenticate(user)
+            self.stdout.write(f'{"rows":>10} {"page-number (last page)":>26} {"keyset (same depth)":>22}')
+            for size in sizes:
+                self._grow_to(size)
+                total = AuditLog.objects.count()
+                depth = max(total - 20, 0)
+                last_page = depth // 20 + 1
+                page_ms = self._median(client, f'/api/audit-logs/?page={last_page}', options['repeat'])
+                anchor = AuditLog.objects.order_by('-created_at', '-id').values_list('created_at', 'id')[depth:depth + 1].first()
+                cursor_ms = self._median(client, self._cursor_url(anchor), options['repeat'])
+                self.stdout.write(f'{total:>10} {page_ms:>23.1f} ms {cursor_ms:>19.1f} ms')
+            transaction.set_rollback(True)
+
+    def _grow_to(self, size):
+        missing = size - AuditLog.objects.count()
+        if missing <= 0:
+            return
+        # Spread timestamps out so the keyset is realistic rather than one huge tie.
+        base = timezone.now() - timedelta(days=365)
+        field = AuditLog._meta.get_field('created_at')
+        field.auto_now_add = False
+        try:
+            for offset in range(0, missing, 5000):
+                AuditLog.objects.bulk_create([
+                    AuditLog(action=BENCH_ACTION, table_name='bench', record_id=i,
+                             new_values={'i': i}, created_at=base + timedelta(milliseconds=i))
+                    for i in range(offset, min(offset + 5000, missing))
+                ])
+        finally:
+            field.auto_now_add = True
+
+    def _cursor_url(self, anchor):
+        if anchor is None:
+            return '/api/audit-logs/?cursor='
+        position = f'{anchor[0].isoformat()}|{anchor[1]}'
+        cursor = b64encode(urlencode({'p': position}).encode('ascii')).decode('ascii')
+        return '/api/audit-logs/?' + urlencode({'cursor': cursor})
+
+    def _median(self, client, url, repeat):
+        timings = []
+        for _ in range(repeat):
+            began = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - began) * 1000)
+            assert response.status_code == 200, response.content
+        return statistics.median(timings)
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from training import outbox
+
+class Command(BaseCommand):
+    help = "Deliver queued emails over one reused connection, retrying with backoff, and sweep expired/used reset tokens"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Messages claimed per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling every --interval seconds')
+        parser.add_argument('--interval', type=float, default=10.0, help='Seconds between polls with --loop')
+        parser.add_argument('--no-sweep', action='store_true', help='Do not delete expired/used tokens and old sent messages')
+
+    def handle(self, *args, **options):
+        while True:
+            totals = outbox.process_outbox(batch_size=options['batch_size'])
+            if any(totals.values()) or not options['loop']:
+                self.stdout.write(f"sent {totals['sent']}, retrying {totals['retrying']}, failed {totals['failed']}")
+            if not options['no_sweep']:
+                tokens, messages = outbox.sweep()
+                if tokens or messages or not options['loop']:
+                    self.stdout.write(f'swept {tokens} reset tokens and {messages} sent messages')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
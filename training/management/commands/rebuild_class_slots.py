@@ -0,0 +1,8 @@
+from django.core.management.base import BaseCommand
+from training.schedule import rebuild_slots
+
+class Command(BaseCommand):
+    help = "Re-parse every class's timings into weekly time slots"
+    def handle(self, *args, **options):
+        classes, slots = rebuild_slots()
+        self.stdout.write(self.style.SUCCESS(f'Parsed {slots} slots from {classes} classes'))
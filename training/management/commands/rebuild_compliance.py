@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from training.compliance import rebuild_compliance
+
+class Command(BaseCommand):
+    help = "Recompute the designation compliance matrix"
+    def add_arguments(self, parser):
+        parser.add_argument('--trainee', type=int, action='append', dest='trainees', help='Only rebuild this trainee (repeatable)')
+    def handle(self, *args, **options):
+        rows = rebuild_compliance(options['trainees'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} compliance rows'))
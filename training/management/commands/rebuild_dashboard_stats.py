@@ -0,0 +1,8 @@
+from django.core.management.base import BaseCommand
+from training.stats import rebuild_counters
+
+class Command(BaseCommand):
+    help = "Rebuild the dashboard counters table from the source tables"
+    def handle(self, *args, **kwargs):
+        rows = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} dashboard counters'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from training.enrollment import rebuild_enrolled_counts
+
+class Command(BaseCommand):
+    help = "Recompute the seat-holding enrollment count of every batch"
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, action='append', dest='batches', help='Only rebuild this batch (repeatable)')
+    def handle(self, *args, **options):
+        batches = rebuild_enrolled_counts(options['batches'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the enrolled counts of {batches} batches'))
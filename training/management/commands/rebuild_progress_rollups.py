@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from training.rollups import rebuild_rollups
+
+class Command(BaseCommand):
+    help = "Recompute the topic-hour weighted progress rollups"
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, action='append', dest='batches', help='Only rebuild this batch (repeatable)')
+    def handle(self, *args, **options):
+        trainees, batches = rebuild_rollups(options['batches'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {trainees} trainee rollups across {batches} batches'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import router
+from training.search import INDEXED_MODELS, rebuild, uses_fts5
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for programs, topics and classes"
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(INDEXED_MODELS), action='append', dest='kinds', help='Only rebuild this kind (repeatable)')
+    def handle(self, *args, **options):
+        counts = rebuild(options['kinds'])
+        backend = 'FTS5' if uses_fts5(router.db_for_write(INDEXED_MODELS['program'][0])) else 'SearchTerm postings'
+        summary = ', '.join(f'{kind}: {n}' for kind, n in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Indexed {summary} ({backend})'))
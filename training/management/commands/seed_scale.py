@@ -0,0 +1,203 @@
+import random
+import time
+from datetime import date, timedelta
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from training import caching, compliance, enrollment, rollups, schedule, search, stats
+from training.models import (
+    AuditLog, Batch, BatchTrainee, BatchTrainer, Class, Designation, DesignationProgram, Program, ProgramTopic,
+    ProgressRecord, TraineeDesignation, User,
+)
+
+WORDS = (
+    'python', 'django', 'sql', 'cloud', 'security', 'data', 'analytics', 'leadership', 'agile', 'testing',
+    'networking', 'linux', 'design', 'react', 'devops', 'compliance', 'safety', 'finance', 'negotiation', 'writing',
+    'kubernetes', 'machine', 'learning', 'excel', 'communication', 'onboarding', 'support', 'sales', 'privacy', 'api',
+)
+TIMINGS = (
+    '{days} {start}:00 AM - {end}:00 AM', '{days} {start}-{end}am', '{days} {start}:30 AM to {end}:30 AM',
+)
+DAY_SETS = ('Mon, Wed, Fri', 'Tue, Thu', 'Mon-Fri', 'Sat', 'Wed', 'Mon, Thu', 'Weekends')
+AUDIT_TABLES = ('training_program', 'training_batch', 'training_batchtrainee', 'training_progressrecord', 'training_user')
+
+
+class Command(BaseCommand):
+    help = "Generate a large synthetic data set with bulk inserts, then rebuild the derived tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trainees', type=int, default=2000)
+        parser.add_argument('--trainers', type=int, default=50)
+        parser.add_argument('--designations', type=int, default=20)
+        parser.add_argument('--programs', type=int, default=100)
+        parser.add_argument('--topics', type=int, default=12, help='Topics per program')
+        parser.add_argument('--batches', type=int, default=5, help='Batches per program')
+        parser.add_argument('--batch-size', type=int, default=25, help='Trainees enrolled per batch')
+        parser.add_argument('--progress', type=float, default=0.8, help='Fraction of topics with a progress record per enrollment')
+        parser.add_argument('--classes', type=int, default=300)
+        parser.add_argument('--audit-rows', type=int, default=50000)
+        parser.add_argument('--prefix', default='scale', help='Username/name prefix of the generated rows')
+        parser.add_argument('--password', default='scalepass', help='Password of every generated user')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f'Users named {prefix}-* already exist; pick another --prefix')
+        self.rng = random.Random(options['seed'])
+        self.timings = {}
+        with transaction.atomic():
+            counts = self._seed(options)
+            caching.bump_table_versions(*caching.VERSIONED_MODELS, AuditLog)
+        for name, rebuild in (
+            ('class slots', schedule.rebuild_slots),
+            ('search index', search.rebuild),
+            ('dashboard counters', stats.rebuild_counters),
+            ('progress rollups', rollups.rebuild_rollups),
+            ('compliance', compliance.rebuild_compliance),
+            ('enrolled counts', enrollment.rebuild_enrolled_counts),
+        ):
+            self._timed(name, rebuild)
+        for name, count in counts.items():
+            self.stdout.write(f'  {name:<22} {count:>9}')
+        for name, seconds in self.timings.items():
+            self.stdout.write(f'  {name:<22} {seconds:>8.2f}s')
+        self.stdout.write(self.style.SUCCESS(f"Seeded {sum(counts.values())} rows; users log in as {prefix}-trainee-0 ... with password {options['password']!r}"))
+
+    def _timed(self, name, func):
+        began = time.perf_counter()
+        result = func()
+        self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - began
+        return result
+
+    def _insert(self, model, objects, batch_size=1000):
+        """Bulk insert ``objects``; returns their primary keys in insertion order (portable to backends
+        where ``bulk_create`` does not set them)."""
+        before = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        self._timed(model.__name__, lambda: model.objects.bulk_create(objects, batch_size=batch_size))
+        return list(model.objects.filter(pk__gt=before).order_by('pk').values_list('pk', flat=True))
+
+    def _phrase(self, words):
+        return ' '.join(self.rng.sample(WORDS, words))
+
+    def _timing(self):
+        start = self.rng.randint(8, 10)
+        return self.rng.choice(TIMINGS).format(days=self.rng.choice(DAY_SETS), start=start, end=start + 1)
+
+    def _seed(self, options):
+        rng, prefix = self.rng, options['prefix']
+        password = make_password(options['password'])
+        today = date.today()
+
+        trainer_ids = self._insert(User, [
+            User(username=f'{prefix}-trainer-{i}', email=f'{prefix}-trainer-{i}@example.com', password=password,
+                 first_name='Trainer', last_name=str(i), role='trainer', expertise=self._phrase(3))
+            for i in range(options['trainers'])
+        ])
+        trainee_ids = self._insert(User, [
+            User(username=f'{prefix}-trainee-{i}', email=f'{prefix}-trainee-{i}@example.com', password=password,
+                 first_name='Trainee', last_name=str(i), role='trainee')
+            for i in range(options['trainees'])
+        ])
+        designation_ids = self._insert(Designation, [
+            Designation(name=f'{prefix} {self._phrase(1).title()} {i}') for i in range(options['designations'])
+        ])
+        program_ids = self._insert(Program, [
+            Program(name=f'{self._phrase(2).title()} {i}', description=f'{self._phrase(8)}. {self._phrase(8)}.',
+                    duration_days=rng.choice((5, 10, 20, 30, 60)), created_by_id=rng.choice(trainer_ids) if trainer_ids else None)
+            for i in range(options['programs'])
+        ])
+        topics = {}
+        topic_ids = self._insert(ProgramTopic, [
+            ProgramTopic(program_id=program_id, topic_name=f'{self._phrase(2).title()}', topic_description=self._phrase(10),
+                         topic_order=j, estimated_hours=rng.randint(1, 8))
+            for program_id in program_ids for j in range(options['topics'])
+        ])
+        for n, topic_id in enumerate(topic_ids):
+            topics.setdefault(program_ids[n // options['topics']], []).append(topic_id)
+
+        designation_programs = []
+        for designation_id in designation_ids:
+            for program_id in rng.sample(program_ids, min(4, len(program_ids))):
+                designation_programs.append(DesignationProgram(designation_id=designation_id, program_id=program_id,
+                                                               is_required=rng.random() < 0.75))
+        self._insert(DesignationProgram, designation_programs)
+        if designation_ids:
+            self._insert(TraineeDesignation, [
+                TraineeDesignation(trainee_id=trainee_id, designation_id=rng.choice(designation_ids)) for trainee_id in trainee_ids
+            ])
+
+        batches = []
+        for program_id in program_ids:
+            for k in range(options['batches']):
+                status = rng.choice(('scheduled', 'running', 'running', 'completed', 'completed'))
+                start = today + timedelta(days={'scheduled': 14, 'running': -20, 'completed': -120}[status] + rng.randint(-10, 10))
+                batches.append((program_id, status, start))
+        batch_ids = self._insert(Batch, [
+            Batch(name=f'{prefix} batch {n}', program_id=program_id, status=status, start_date=start,
+                  end_date=start + timedelta(days=60), max_capacity=options['batch_size'] + 5)
+            for n, (program_id, status, start) in enumerate(batches)
+        ])
+        if trainer_ids:
+            self._insert(BatchTrainer, [
+                BatchTrainer(batch_id=batch_id, trainer_id=rng.choice(trainer_ids), is_lead=True) for batch_id in batch_ids
+            ])
+
+        enrollments, records = [], []
+        for batch_id, (program_id, batch_status, start) in zip(batch_ids, batches):
+            for trainee_id in rng.sample(trainee_ids, min(options['batch_size'], len(trainee_ids))):
+                status = {'scheduled': 'enrolled', 'running': 'in_progress', 'completed': 'completed'}[batch_status]
+                if rng.random() < 0.05:
+                    status = 'dropped'
+                enrollments.append(BatchTrainee(
+                    batch_id=batch_id, trainee_id=trainee_id, status=status, enrollment_date=start - timedelta(days=7),
+                    completion_date=start + timedelta(days=60) if status == 'completed' else None,
+                    rating=rng.randint(3, 5) if status == 'completed' else None,
+                ))
+                if batch_status == 'scheduled':
+                    continue
+                for topic_id in topics.get(program_id, ()):
+                    if rng.random() >= options['progress']:
+                        continue
+                    pct = 100 if status == 'completed' else rng.choice((0, 25, 50, 75, 100))
+                    records.append(ProgressRecord(
+                        trainee_id=trainee_id, batch_id=batch_id, topic_id=topic_id, completion_percentage=pct,
+                        status='completed' if pct == 100 else 'not_started' if pct == 0 else 'in_progress',
+                    ))
+        self._insert(BatchTrainee, enrollments)
+        self._insert(ProgressRecord, records)
+
+        trainer_names = list(User.objects.filter(pk__in=trainer_ids).values_list('last_name', flat=True)) or ['Trainer']
+        self._insert(Class, [
+            Class(name=f'{self._phrase(2).title()} class {i}', trainer_name=f'Trainer {rng.choice(trainer_names)}',
+                  class_timings=self._timing(),
+                  description=self._phrase(6), google_meet_link=f'https://meet.example.com/{prefix}-{i}')
+            for i in range(options['classes'])
+        ])
+
+        audit_ids = self._insert(AuditLog, [
+            AuditLog(user_id=rng.choice(trainer_ids) if trainer_ids else None, action=rng.choice(('create', 'update', 'delete')),
+                     table_name=rng.choice(AUDIT_TABLES), record_id=rng.randint(1, 10000), new_values={'seed': i})
+            for i in range(options['audit_rows'])
+        ], batch_size=2000)
+        # auto_now_add stamps every row with now; spread them over the past year, one month per slice.
+        now = timezone.now()
+        per_month = -(-len(audit_ids) // 12)
+        for month in range(12):
+            ids = audit_ids[month * per_month:(month + 1) * per_month]
+            if ids:
+                AuditLog.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(created_at=now - timedelta(days=30 * (11 - month)))
+
+        return {
+            'users': len(trainer_ids) + len(trainee_ids),
+            'designations': len(designation_ids),
+            'programs': len(program_ids),
+            'topics': len(topic_ids),
+            'batches': len(batch_ids),
+            'enrollments': len(enrollments),
+            'progress records': len(records),
+            'classes': options['classes'],
+            'audit rows': len(audit_ids),
+        }
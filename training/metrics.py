@@ -0,0 +1,181 @@
+"""In-process request metrics in Prometheus text format.
+
+:class:`~training.middleware.RequestMetricsMiddleware` times every request and
+records its query count, database time, response render time and total latency
+in the histograms below, labelled by view (viewset or function view) and
+action.  ``GET /metrics`` renders them together with the counters kept here
+and the JWT user cache statistics.
+
+The numbers are per process: with several workers, each one reports its own
+series and Prometheus sums them.
+"""
+import hmac
+import math
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .authentication import user_cache
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}' for labels, value in values]
+
+    def render(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter', *self.samples()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram; each label set keeps per-bucket counts, a sum and a count."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labelvalues):
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        with self._lock:
+            series = sorted((labels, (list(counts), total, n)) for labels, (counts, total, n) in self._series.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total, n) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, [('le', _number(bound))])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {n}')
+        return lines
+
+
+REQUEST_LABELS = ('view', 'action')
+
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Total request latency.', REQUEST_LABELS + ('method', 'status'),
+)
+request_db_duration = Histogram('http_request_db_seconds', 'Time spent in database queries per request.', REQUEST_LABELS)
+request_queries = Histogram('http_request_db_queries', 'Database queries per request.', REQUEST_LABELS, QUERY_BUCKETS)
+request_render_duration = Histogram('http_request_render_seconds', 'Time spent rendering the response body.', REQUEST_LABELS)
+audit_records = Counter('audit_records_total', 'Audit entries recorded by record_audit.', ('action',))
+
+METRICS = [request_duration, request_db_duration, request_queries, request_render_duration, audit_records]
+
+
+def view_labels(view_func, method):
+    """``(view, action)`` for a resolved view: the viewset and its action, or the view name and method."""
+    cls = getattr(view_func, 'cls', None)
+    view = cls.__name__ if cls is not None else getattr(view_func, '__name__', type(view_func).__name__)
+    actions = getattr(view_func, 'actions', None) or {}
+    method = method.lower()
+    action = actions.get('get' if method == 'head' else method)
+    return view, action or method
+
+
+def _auth_lines():
+    stats = user_cache.stats()
+    return [
+        '# HELP auth_user_lookups_total JWT user lookups, served from the user cache (hit) or the database (miss).',
+        '# TYPE auth_user_lookups_total counter',
+        f'auth_user_lookups_total{{result="hit"}} {stats["hits"]}',
+        f'auth_user_lookups_total{{result="miss"}} {stats["misses"]}',
+        '# HELP auth_user_cache_invalidations_total Cached users dropped after a change.',
+        '# TYPE auth_user_cache_invalidations_total counter',
+        f'auth_user_cache_invalidations_total {stats["invalidations"]}',
+        '# HELP auth_user_cache_size Users currently cached.',
+        '# TYPE auth_user_cache_size gauge',
+        f'auth_user_cache_size {stats["size"]}',
+    ]
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    lines += _auth_lines()
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    for metric in METRICS:
+        metric.clear()
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; needs ``Authorization: Bearer <METRICS_TOKEN>`` when a token is set,
+    and is only open without one while ``DEBUG`` is on."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if not hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', '').encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,109 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+
+from . import db, metrics
+from .audit import audit_sink
+
+class AuditBufferMiddleware:
+    """Write all audit entries recorded during a request in one ``bulk_create``."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit_sink.buffered():
+            return self.get_response(request)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Django's gzip middleware (negotiated by ``Accept-Encoding``), skipping bodies that are
+    already compressed, event streams (gzip would hold events back) and bodies shorter
+    than ``COMPRESSION_MIN_BYTES``."""
+    skip_types = ('application/gzip', 'application/zip', 'text/event-stream')
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').split(';')[0].strip() in self.skip_types:
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESSION_MIN_BYTES', 200):
+            return response
+        return super().process_response(request, response)
+
+
+class ReplicaRoutingMiddleware:
+    """Let list/retrieve requests read from a replica until they write (see ``training.db``)."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not db.replicas():
+            return self.get_response(request)
+        with db.routing() as state:
+            response = self.get_response(request)
+            if state.wrote:
+                db.pin_client(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = db.current_state()
+        if state is not None and db.is_replica_view(view_func, request.method) and not db.client_pinned(request):
+            state.use_replica = True
+
+
+class RequestMetricsMiddleware:
+    """Time each request and its queries; report them in ``Server-Timing`` and ``training.metrics``."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = request._metrics_timer = RequestTimer()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer.query))
+            response = self.get_response(request)
+        total = time.perf_counter() - timer.started
+        metrics.request_duration.observe(total, timer.view, timer.action, request.method, str(response.status_code))
+        metrics.request_db_duration.observe(timer.db_time, timer.view, timer.action)
+        metrics.request_queries.observe(timer.queries, timer.view, timer.action)
+        metrics.request_render_duration.observe(timer.render_time, timer.view, timer.action)
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            app = max(total - timer.db_time - timer.render_time, 0)
+            response['Server-Timing'] = (
+                f'db;dur={timer.db_time * 1000:.1f};desc="{timer.queries} queries", '
+                f'app;dur={app * 1000:.1f}, render;dur={timer.render_time * 1000:.1f}, total;dur={total * 1000:.1f}'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_timer.view, request._metrics_timer.action = metrics.view_labels(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        timer = request._metrics_timer
+        started = time.perf_counter()
+
+        def rendered(response):
+            timer.render_time += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class RequestTimer:
+    __slots__ = ('started', 'view', 'action', 'queries', 'db_time', 'render_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view, self.action = 'unresolved', ''
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+
+    def query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+# model -> (metric, bucket field, also counted per trainee), as of this migration.
+COUNTED_MODELS = {
+    'Program': ('programs', None, False),
+    'Batch': ('batches', 'status', False),
+    'BatchTrainee': ('batch_trainees', 'status', True),
+    'ProgressRecord': ('progress_records', 'status', True),
+    'Class': ('classes', None, False),
+    'User': ('users', 'role', False),
+}
+
+
+def count_rows(apps, schema_editor):
+    """Fill the counters from the existing rows so the signals start from the right totals."""
+    DashboardCounter = apps.get_model('training', 'DashboardCounter')
+    rows = []
+    for model_name, (metric, bucket_field, per_trainee) in COUNTED_MODELS.items():
+        model = apps.get_model('training', model_name)
+        if not bucket_field:
+            rows.append(DashboardCounter(metric=metric, value=model.objects.count()))
+            continue
+        group_by = [bucket_field] + (['trainee_id'] if per_trainee else [])
+        totals = {}
+        for values in model.objects.values(*group_by).annotate(n=Count('pk')).order_by():
+            bucket = values[bucket_field] or ''
+            keys = [(bucket, None)]
+            if per_trainee and values['trainee_id']:
+                keys.append((bucket, values['trainee_id']))
+            for key in keys:
+                totals[key] = totals.get(key, 0) + values['n']
+        rows.extend(
+            DashboardCounter(metric=metric, bucket=bucket, trainee_id=trainee_id, value=n)
+            for (bucket, trainee_id), n in totals.items()
+        )
+    DashboardCounter.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0005_user_designation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('bucket', models.CharField(blank=True, default='', max_length=50)),
+                ('value', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('trainee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('metric', 'bucket', 'trainee')},
+            },
+        ),
+        migrations.RunPython(count_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0006_dashboardcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatchProgressRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completion', models.FloatField(default=0)),
+                ('trainee_count', models.IntegerField(default=0)),
+                ('completed_trainees', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('batch', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress_rollup', to='training.batch')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TraineeProgressRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completion', models.FloatField(default=0)),
+                ('completed_topics', models.IntegerField(default=0)),
+                ('topic_count', models.IntegerField(default=0)),
+                ('completed_hours', models.IntegerField(default=0)),
+                ('total_hours', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trainee_rollups', to='training.batch')),
+                ('trainee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('batch', 'trainee')},
+            },
+        ),
+    ]
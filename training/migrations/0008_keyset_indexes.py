@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0007_progress_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['created_at', 'id'], name='training_au_created_2d9660_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='progressrecord',
+            index=models.Index(fields=['last_updated', 'id'], name='training_pr_last_up_e45dfa_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0008_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['table_name', 'record_id'], name='training_au_table_n_542974_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(fields=['program', 'status'], name='training_ba_program_5f593e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='batchtrainee',
+            index=models.Index(fields=['batch', 'status'], name='training_ba_batch_i_df04f2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='progressrecord',
+            index=models.Index(fields=['trainee', 'batch', 'status'], name='training_pr_trainee_c06426_idx'),
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:57
+
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'training_search_fts'
+TITLE_WEIGHT = 10.0
+MAX_TERM_LENGTH = 64
+ROWID_STRIDE = 4
+# A frozen copy of training.search as of this migration: kind -> (model, title fields, body fields).
+INDEXED_MODELS = {
+    'program': ('Program', ('name',), ('description',)),
+    'topic': ('ProgramTopic', ('topic_name',), ('topic_description',)),
+    'class': ('Class', ('name', 'trainer_name'), ('description',)),
+}
+KIND_CODES = {kind: code for code, kind in enumerate(INDEXED_MODELS, start=1)}
+_WORD = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    if not text:
+        return []
+    text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return [word[:MAX_TERM_LENGTH] for word in _WORD.findall(text.lower())]
+
+
+def create_fts_table(apps, schema_editor):
+    # SQLite builds without FTS5 fall back to the SearchTerm postings table.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS training_search_fts "
+            "USING fts5(kind, title, body, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        pass
+
+
+def index_existing_rows(apps, schema_editor):
+    """Index what is already there, so ``?search=`` keeps finding it after the upgrade."""
+    connection = schema_editor.connection
+    SearchTerm = apps.get_model('training', 'SearchTerm')
+    fts5 = (getattr(settings, 'SEARCH_BACKEND', 'auto') != 'python' and connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names())
+    for kind, (model_name, title_fields, body_fields) in INDEXED_MODELS.items():
+        model = apps.get_model('training', model_name)
+        docs = []
+        for pk, *values in model.objects.order_by('pk').values_list('pk', *title_fields, *body_fields).iterator():
+            title = ' '.join(v for v in values[:len(title_fields)] if v)
+            body = ' '.join(v for v in values[len(title_fields):] if v)
+            docs.append((pk, title, body))
+        if fts5:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, kind, title, body) VALUES (%s, %s, %s, %s)',
+                    [(pk * ROWID_STRIDE + KIND_CODES[kind], kind, title, body) for pk, title, body in docs],
+                )
+            continue
+        postings = []
+        for pk, title, body in docs:
+            weights = Counter()
+            for word in tokenize(title):
+                weights[word] += TITLE_WEIGHT
+            for word in tokenize(body):
+                weights[word] += 1
+            norm = math.sqrt(sum(weights.values())) or 1
+            postings.extend(SearchTerm(kind=kind, object_id=pk, term=term, weight=weight / norm) for term, weight in weights.items())
+        SearchTerm.objects.bulk_create(postings, batch_size=1000)
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS training_search_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0010_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='training_se_kind_7bc2e0_idx')],
+                'unique_together': {('kind', 'term', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(index_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def compute_existing_statuses(apps, schema_editor):
+    """Fill the matrix as ``training.compliance.rebuild_compliance`` did when this migration was written."""
+    BatchTrainee = apps.get_model('training', 'BatchTrainee')
+    ComplianceStatus = apps.get_model('training', 'ComplianceStatus')
+    DesignationProgram = apps.get_model('training', 'DesignationProgram')
+    TraineeDesignation = apps.get_model('training', 'TraineeDesignation')
+
+    required = {}
+    rows = DesignationProgram.objects.filter(is_required=True, designation__is_active=True).values_list('designation_id', 'program_id')
+    for designation_id, program_id in rows:
+        required.setdefault(designation_id, set()).add(program_id)
+    progress = {
+        (row['trainee_id'], row['batch__program_id']): row
+        for row in BatchTrainee.objects.exclude(status__in=('dropped', 'waitlisted')).values('trainee_id', 'batch__program_id').annotate(
+            completed=Count('id', filter=Q(status='completed')),
+            completed_on=Max('completion_date', filter=Q(status='completed')),
+        ).order_by()
+    }
+    statuses = []
+    pairs = TraineeDesignation.objects.filter(designation_id__in=list(required)).values_list('trainee_id', 'designation_id').distinct()
+    for trainee_id, designation_id in pairs.iterator():
+        for program_id in required[designation_id]:
+            enrollment = progress.get((trainee_id, program_id))
+            statuses.append(ComplianceStatus(
+                trainee_id=trainee_id,
+                designation_id=designation_id,
+                program_id=program_id,
+                status='missing' if enrollment is None else 'completed' if enrollment['completed'] else 'in_progress',
+                completed_on=enrollment['completed_on'] if enrollment else None,
+            ))
+    ComplianceStatus.objects.bulk_create(statuses, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0011_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplianceStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('completed', 'Completed'), ('in_progress', 'In progress'), ('missing', 'Missing')], default='missing', max_length=20)),
+                ('completed_on', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('designation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compliance_statuses', to='training.designation')),
+                ('program', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compliance_statuses', to='training.program')),
+                ('trainee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compliance_statuses', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['designation', 'status'], name='training_co_designa_da839d_idx')],
+                'unique_together': {('trainee', 'designation', 'program')},
+            },
+        ),
+        migrations.RunPython(compute_existing_statuses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,145 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:06
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A frozen copy of training.timings.parse_timings as of this migration, so later
+# changes to the parser cannot change what this backfill produces.
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+DAYS = {
+    'm': 0, 'mo': 0, 'mon': 0, 'monday': 0, 'mondays': 0,
+    'tu': 1, 'tue': 1, 'tues': 1, 'tuesday': 1, 'tuesdays': 1,
+    'w': 2, 'wed': 2, 'weds': 2, 'wednesday': 2, 'wednesdays': 2,
+    'th': 3, 'thu': 3, 'thur': 3, 'thurs': 3, 'thursday': 3, 'thursdays': 3,
+    'f': 4, 'fr': 4, 'fri': 4, 'friday': 4, 'fridays': 4,
+    'sa': 5, 'sat': 5, 'saturday': 5, 'saturdays': 5,
+    'su': 6, 'sun': 6, 'sunday': 6, 'sundays': 6,
+}
+DAY_GROUPS = {
+    'daily': range(7), 'everyday': range(7),
+    'weekday': range(5), 'weekdays': range(5),
+    'weekend': (5, 6), 'weekends': (5, 6),
+}
+RANGE_WORDS = {'-', '–', '—', 'to', 'through', 'thru', 'till', 'until'}
+
+_CLOCK = r'(\d{1,2})(?:[:.](\d{2}))?(?:\s*([ap])\.?(?:m\.?)?(?![a-z]))?'
+_TIME_RANGE = re.compile(
+    rf'(?<![\d:]){_CLOCK}\s*(?:-|–|—|to|till|until)\s*{_CLOCK}(?![\d:])',
+    re.IGNORECASE,
+)
+_DAY_TOKEN = re.compile(r'[a-z]+|[-–—]', re.IGNORECASE)
+
+
+def _minutes(hour, minute, meridiem):
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower() == 'p' else 0)
+    if hour > 24 or minute > 59:
+        return None
+    return min(hour * 60 + minute, MINUTES_PER_DAY)
+
+
+def _time_range(match):
+    start_h, start_m, start_ap, end_h, end_m, end_ap = match.groups()
+    if end_ap and not start_ap:
+        # "9-11 AM" means 9 AM; "11-1 PM" means 11 AM.
+        start_ap = end_ap
+        if _minutes(start_h, start_m, start_ap) is not None and _minutes(start_h, start_m, start_ap) > _minutes(end_h, end_m, end_ap):
+            start_ap = 'a' if end_ap.lower() == 'p' else 'p'
+    start, end = _minutes(start_h, start_m, start_ap), _minutes(end_h, end_m, end_ap)
+    if start is None or end is None or start == end:
+        return None
+    return start, end
+
+
+def _days(text):
+    """Weekdays (0 = Monday) named in ``text``, with ``Mon-Fri`` style ranges expanded."""
+    tokens = [t.lower() for t in _DAY_TOKEN.findall(text)]
+    days = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token in DAY_GROUPS:
+            days.extend(DAY_GROUPS[token])
+        elif token in DAYS:
+            first = DAYS[token]
+            if i + 2 < len(tokens) and tokens[i + 1] in RANGE_WORDS and tokens[i + 2] in DAYS:
+                last = DAYS[tokens[i + 2]]
+                days.extend((first + k) % 7 for k in range((last - first) % 7 + 1))
+                i += 2
+            else:
+                days.append(first)
+        i += 1
+    return list(dict.fromkeys(days))
+
+
+def parse_timings(text):
+    """Sorted, de-duplicated ``(start, end)`` minute-of-week slots described by ``text``."""
+    if not text:
+        return []
+    slots = set()
+    days = []
+    position = 0
+    matches = list(_TIME_RANGE.finditer(text))
+    for n, match in enumerate(matches):
+        # Days are named before their time range ("Mon 9-10") or, for the last one, after it ("9-10 on Mon").
+        named = _days(text[position:match.start()])
+        if not named and n == len(matches) - 1:
+            named = _days(text[match.end():])
+        days = named or days or list(range(7))
+        position = match.end()
+        times = _time_range(match)
+        if times is None:
+            continue
+        start, end = times
+        length = end - start if end > start else end + MINUTES_PER_DAY - start
+        for day in days:
+            begin = day * MINUTES_PER_DAY + start
+            finish = begin + length
+            if finish > MINUTES_PER_WEEK:
+                slots.add((begin, MINUTES_PER_WEEK))
+                slots.add((0, finish - MINUTES_PER_WEEK))
+            else:
+                slots.add((begin, finish))
+    return sorted(slots)
+
+
+
+def parse_existing_timings(apps, schema_editor):
+    Class = apps.get_model('training', 'Class')
+    ClassSlot = apps.get_model('training', 'ClassSlot')
+    slots = [
+        ClassSlot(klass_id=class_id, start=start, end=end)
+        for class_id, timings in Class.objects.values_list('id', 'class_timings').iterator()
+        for start, end in parse_timings(timings)
+    ]
+    ClassSlot.objects.bulk_create(slots, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0012_compliancestatus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.IntegerField()),
+                ('end', models.IntegerField()),
+                ('klass', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='training.class')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['start', 'end'], name='training_cl_start_b8a95c_idx')],
+            },
+        ),
+        migrations.RunPython(parse_existing_timings, migrations.RunPython.noop),
+    ]
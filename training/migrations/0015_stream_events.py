@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0014_table_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StreamEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(max_length=30)),
+                ('batch_id', models.IntegerField(null=True)),
+                ('trainee_id', models.IntegerField(null=True)),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['batch_id', 'id'], name='training_st_batch_i_21bd2f_idx'), models.Index(fields=['trainee_id', 'id'], name='training_st_trainee_501396_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:46
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_enrollments(apps, schema_editor):
+    Batch = apps.get_model('training', 'Batch')
+    BatchTrainee = apps.get_model('training', 'BatchTrainee')
+    duplicates = BatchTrainee.objects.values('batch', 'trainee').annotate(n=Count('id')).filter(n__gt=1).count()
+    if duplicates:
+        raise RuntimeError(f'{duplicates} (batch, trainee) pairs are enrolled more than once; remove the extra enrollments first.')
+    seats = (
+        BatchTrainee.objects.filter(batch=OuterRef('pk')).exclude(status='dropped')
+        .order_by().values('batch').annotate(n=Count('id')).values('n')
+    )
+    Batch.objects.update(enrolled_count=Coalesce(Subquery(seats), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0015_stream_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='enrolled_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='batchtrainee',
+            name='status',
+            field=models.CharField(choices=[('enrolled', 'Enrolled'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('dropped', 'Dropped'), ('waitlisted', 'Waitlisted')], default='enrolled', max_length=20),
+        ),
+        migrations.RunPython(count_enrollments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='batchtrainee',
+            constraint=models.UniqueConstraint(fields=('batch', 'trainee'), name='unique_batch_trainee'),
+        ),
+    ]
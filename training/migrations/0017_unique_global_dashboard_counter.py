@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_global_counters(apps, schema_editor):
+    DashboardCounter = apps.get_model('training', 'DashboardCounter')
+    duplicates = (
+        DashboardCounter.objects.filter(trainee__isnull=True).values('metric', 'bucket')
+        .annotate(n=Count('id'), total=Sum('value')).filter(n__gt=1)
+    )
+    for row in duplicates:
+        rows = DashboardCounter.objects.filter(metric=row['metric'], bucket=row['bucket'], trainee__isnull=True).order_by('id')
+        keep = rows.first()
+        rows.exclude(pk=keep.pk).delete()
+        DashboardCounter.objects.filter(pk=keep.pk).update(value=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0016_batch_capacity'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_global_counters, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dashboardcounter',
+            constraint=models.UniqueConstraint(condition=models.Q(('trainee__isnull', True)), fields=('metric', 'bucket'), name='unique_global_dashboard_counter'),
+        ),
+    ]
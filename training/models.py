@@ -77,12 +77,27 @@ class Batch(models.Model):
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='scheduled')
     max_capacity = models.IntegerField(default=0)
+    # Seat-holding enrollments, maintained by training.enrollment.
+    enrolled_count = models.IntegerField(default=0, editable=False)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='batches_created')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     def __str__(self):
         return f"{self.name} ({self.program.name})"
 
+    def save(self, *args, **kwargs):
+        # enrolled_count only changes through UPDATE ... + n, never from a possibly stale instance.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name != 'enrolled_count'
+            ]
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['program', 'status']),
+        ]
+
 class BatchTrainer(models.Model):
     batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='trainers')
     trainer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='trainer_batches')
@@ -102,7 +117,10 @@ class BatchTrainee(models.Model):
         ('in_progress', 'In Progress'),
         ('completed', 'Completed'),
         ('dropped', 'Dropped'),
+        ('waitlisted', 'Waitlisted'),
     ]
+    # Enrollments that do not take a seat in the batch.
+    NO_SEAT_STATUSES = ('dropped', 'waitlisted')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='enrolled')
     rating = models.IntegerField(null=True, blank=True)
     feedback = models.TextField(blank=True, null=True)
@@ -111,6 +129,14 @@ class BatchTrainee(models.Model):
     def __str__(self):
         return f"{self.trainee} in {self.batch}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['batch', 'status']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['batch', 'trainee'], name='unique_batch_trainee'),
+        ]
+
 class DesignationProgram(models.Model):
     designation = models.ForeignKey(Designation, on_delete=models.CASCADE, related_name='designation_programs')
     program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='designation_programs')
@@ -144,6 +170,12 @@ class ProgressRecord(models.Model):
     def __str__(self):
         return f"{self.trainee} - {self.batch} - {self.topic}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_updated', 'id']),
+            models.Index(fields=['trainee', 'batch', 'status']),
+        ]
+
 class AuditLog(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     action = models.CharField(max_length=255)
@@ -156,6 +188,12 @@ class AuditLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     def __str__(self): return f"{self.action} - {self.table_name} - {self.record_id}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['table_name', 'record_id']),
+        ]
+
 class Class(models.Model):
     name = models.CharField(max_length=255)
     trainer_name = models.CharField(max_length=255)
@@ -169,3 +207,174 @@ class Class(models.Model):
 
     def __str__(self):
         return f"{self.name} - {self.trainer_name}"
+
+class ClassSlot(models.Model):
+    """A weekly recurring slot of a class, parsed from ``Class.class_timings`` by ``training.timings``.
+
+    ``start``/``end`` are minutes from Monday 00:00 in ``TIME_ZONE``.
+    """
+    klass = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='slots')
+    start = models.IntegerField()
+    end = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.klass.name}: {self.start}-{self.end}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start', 'end']),
+        ]
+
+class DashboardCounter(models.Model):
+    """Row count for one (metric, bucket) pair, optionally scoped to a trainee.
+
+    Maintained incrementally by the signals in ``training.signals`` and rebuilt
+    from scratch by ``manage.py rebuild_dashboard_stats``.
+    """
+    metric = models.CharField(max_length=50)
+    bucket = models.CharField(max_length=50, blank=True, default='')
+    trainee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='dashboard_counters')
+    value = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.metric}[{self.bucket}] = {self.value}"
+
+    class Meta:
+        unique_together = ('metric', 'bucket', 'trainee')
+        constraints = [
+            # NULLs are distinct in unique_together, so the global rows need their own constraint.
+            models.UniqueConstraint(fields=['metric', 'bucket'], condition=models.Q(trainee__isnull=True),
+                                    name='unique_global_dashboard_counter'),
+        ]
+
+class TableVersion(models.Model):
+    """Write counter of one table, bumped on every save/delete of its rows.
+
+    List and detail ETags are derived from these counters (see ``training.caching``).
+    """
+    table_name = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.table_name} v{self.version}"
+
+class StreamEvent(models.Model):
+    """A progress or enrollment change queued for the event streams of every worker.
+
+    Only written with ``EVENT_RELAY=db`` (see ``training.events``); rows older
+    than ``EVENT_RELAY_RETENTION_SECONDS`` are pruned by the relay.
+    """
+    event = models.CharField(max_length=30)
+    batch_id = models.IntegerField(null=True)
+    trainee_id = models.IntegerField(null=True)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.event} #{self.pk}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['batch_id', 'id']),
+            models.Index(fields=['trainee_id', 'id']),
+        ]
+
+class TraineeProgressRollup(models.Model):
+    """Completion of one trainee in one batch, weighted by ``ProgramTopic.estimated_hours``."""
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='trainee_rollups')
+    trainee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='progress_rollups')
+    completion = models.FloatField(default=0)
+    completed_topics = models.IntegerField(default=0)
+    topic_count = models.IntegerField(default=0)
+    completed_hours = models.IntegerField(default=0)
+    total_hours = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.trainee} in {self.batch}: {self.completion:.1f}%"
+
+    class Meta:
+        unique_together = ('batch', 'trainee')
+
+class BatchProgressRollup(models.Model):
+    """Average of the trainee rollups of one batch."""
+    batch = models.OneToOneField(Batch, on_delete=models.CASCADE, related_name='progress_rollup')
+    completion = models.FloatField(default=0)
+    trainee_count = models.IntegerField(default=0)
+    completed_trainees = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.batch}: {self.completion:.1f}%"
+
+class ComplianceStatus(models.Model):
+    """One cell of the compliance matrix: a program ``designation`` requires of ``trainee``.
+
+    Maintained by ``training.compliance`` from the designation and enrollment signals.
+    """
+    STATUS_CHOICES = [
+        ('completed', 'Completed'),
+        ('in_progress', 'In progress'),
+        ('missing', 'Missing'),
+    ]
+    trainee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='compliance_statuses')
+    designation = models.ForeignKey(Designation, on_delete=models.CASCADE, related_name='compliance_statuses')
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='compliance_statuses')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='missing')
+    completed_on = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.trainee} / {self.designation} / {self.program}: {self.status}"
+
+    class Meta:
+        unique_together = ('trainee', 'designation', 'program')
+        indexes = [
+            models.Index(fields=['designation', 'status']),
+        ]
+
+class OutboxEmail(models.Model):
+    """An email queued by a request and delivered by ``manage.py process_outbox``."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True, default='')
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+class SearchTerm(models.Model):
+    """One posting of the portable search index: ``term`` occurs in object ``object_id`` of ``kind``.
+
+    Only used when SQLite FTS5 is unavailable; see ``training.search``.
+    """
+    kind = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    term = models.CharField(max_length=64)
+    weight = models.FloatField()
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.term} ({self.weight})"
+
+    class Meta:
+        unique_together = ('kind', 'term', 'object_id')
+        indexes = [
+            models.Index(fields=['kind', 'object_id']),
+        ]
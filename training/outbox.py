@@ -0,0 +1,135 @@
+"""Database-backed email outbox.
+
+Requests never talk to the mail server: :func:`enqueue` inserts one
+``OutboxEmail`` row.  ``manage.py process_outbox`` delivers due messages in
+batches over a single reused connection from the configured ``EMAIL_BACKEND``,
+retrying failures with exponential backoff until ``EMAIL_OUTBOX_MAX_ATTEMPTS``.
+
+A batch is claimed by pushing its ``next_attempt_at`` forward by a lease inside
+a short transaction, so concurrent workers skip it and a crashed worker's
+messages become due again once the lease runs out.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .audit import audit_sink
+from .models import OutboxEmail, PasswordResetToken
+
+logger = logging.getLogger(__name__)
+
+LEASE = timedelta(minutes=5)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(subject, body, to, from_email=None):
+    """Queue one message for delivery; a single INSERT."""
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        to=list(to),
+        from_email=from_email or _setting('DEFAULT_FROM_EMAIL', 'noreply@example.com'),
+    )
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``: base * 2^(attempts - 1), capped."""
+    base = _setting('EMAIL_OUTBOX_BACKOFF_SECONDS', 30)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), _setting('EMAIL_OUTBOX_MAX_BACKOFF_SECONDS', 3600)))
+
+
+def claim(batch_size):
+    """Lease up to ``batch_size`` due pending messages to this worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboxEmail.objects.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        messages = list(due[:batch_size])
+        OutboxEmail.objects.filter(pk__in=[m.pk for m in messages]).update(next_attempt_at=now + LEASE)
+    return messages
+
+
+def send_batch(messages, mail_connection):
+    """Send ``messages`` over ``mail_connection`` and record the outcome of each in bulk."""
+    max_attempts = _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    sent = failed = 0
+    for message in messages:
+        message.attempts += 1
+        try:
+            # A no-op while the connection is open, so every message shares one SMTP session.
+            mail_connection.open()
+            EmailMessage(message.subject, message.body, message.from_email, message.to,
+                         connection=mail_connection).send()
+        except Exception as exc:
+            logger.warning('Outbox message %s failed (attempt %s): %s', message.pk, message.attempts, exc)
+            message.last_error = f'{type(exc).__name__}: {exc}'
+            if message.attempts >= max_attempts:
+                message.status = 'failed'
+                failed += 1
+                audit_sink.record(
+                    action='EMAIL_DELIVERY_FAILED',
+                    table_name=OutboxEmail._meta.db_table,
+                    record_id=message.pk,
+                    new_values={'to': message.to, 'subject': message.subject, 'error': message.last_error},
+                )
+            message.next_attempt_at = timezone.now() + backoff(message.attempts)
+            _reset(mail_connection)
+            continue
+        message.status = 'sent'
+        message.sent_at = timezone.now()
+        message.last_error = ''
+        sent += 1
+    OutboxEmail.objects.bulk_update(messages, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+    return sent, failed
+
+
+def _reset(mail_connection):
+    """Drop a connection the server may have broken, so the next message opens a fresh one."""
+    try:
+        mail_connection.close()
+    except Exception:
+        logger.debug('Ignoring error while closing the mail connection', exc_info=True)
+
+
+def process_outbox(batch_size=100, max_batches=None):
+    """Deliver due messages until none are left (or ``max_batches`` ran).
+
+    Returns ``{'sent': n, 'failed': n, 'retrying': n}`` for this run.
+    """
+    totals = {'sent': 0, 'failed': 0, 'retrying': 0}
+    mail_connection = get_connection(fail_silently=False)
+    batches = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            messages = claim(batch_size)
+            if not messages:
+                break
+            batches += 1
+            sent, failed = send_batch(messages, mail_connection)
+            totals['sent'] += sent
+            totals['failed'] += failed
+            totals['retrying'] += len(messages) - sent - failed
+    finally:
+        _reset(mail_connection)
+    return totals
+
+
+def sweep(now=None):
+    """Delete expired or used password reset tokens and old sent messages in bulk.
+
+    Returns ``(tokens deleted, messages deleted)``.
+    """
+    now = now or timezone.now()
+    tokens, _ = PasswordResetToken.objects.filter(Q(expires_at__lt=now) | Q(is_used=True)).delete()
+    keep = timedelta(days=_setting('EMAIL_OUTBOX_RETENTION_DAYS', 7))
+    messages, _ = OutboxEmail.objects.filter(status='sent', sent_at__lt=now - keep).delete()
+    return tokens, messages
@@ -0,0 +1,125 @@
+"""Keyset pagination for append-mostly tables.
+
+DRF's ``CursorPagination`` only seeks on the first ordering field and falls
+back to OFFSET for ties, which breaks down when bulk writes give thousands of
+rows the same timestamp.  ``KeysetCursorPagination`` seeks on the full
+``(timestamp, id)`` key instead, so every page is a single index range scan
+no matter how deep it is.
+
+Requests without a ``cursor`` parameter keep the project-wide page-number
+pagination, so existing ``?page=N`` clients are unaffected.  Pass ``?cursor=``
+(empty) to get the first keyset page and follow ``next``/``previous`` links.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor, PageNumberPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    fallback_class = PageNumberPagination
+
+    def __init__(self):
+        self.fallback = None
+
+    def uses_cursor(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def get_ordering(self, request, queryset, view):
+        # The key is fixed by the view: ``?ordering=`` cannot be served by the index.
+        ordering = getattr(view, 'cursor_ordering', self.ordering)
+        return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.uses_cursor(request):
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        position = self.cursor.position if self.cursor else None
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(f[1:] if f.startswith('-') else f'-{f}' for f in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek(ordering, self._parse_position(position)))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        if self.page:
+            self.next_position = self._position(self.page[-1])
+            self.previous_position = self._position(self.page[0])
+        else:
+            self.has_next = self.has_previous = False
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+    def get_html_context(self):
+        if self.fallback is not None:
+            return self.fallback.get_html_context()
+        return super().get_html_context()
+
+    def _position(self, instance):
+        timestamp, pk = (getattr(instance, f.lstrip('-')) for f in self.ordering)
+        return f'{timestamp.isoformat()}|{pk}'
+
+    def _parse_position(self, position):
+        try:
+            timestamp, pk = position.split('|')
+            timestamp = parse_datetime(timestamp)
+            if timestamp is None:
+                raise ValueError(position)
+            return timestamp, int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _seek(ordering, values):
+        """Rows strictly after ``values`` in ``ordering``.
+
+        Written as ``a <= x AND (a < x OR (a = x AND b < y) ...)`` rather than a
+        bare OR so that the leading bound is a range the index can seek to.
+        """
+        clauses, equal = [], {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': value}))
+            equal[name] = value
+        lead = ordering[0]
+        bound = Q(**{f"{lead.lstrip('-')}__{'lte' if lead.startswith('-') else 'gte'}": values[0]})
+        return bound & reduce(or_, clauses)
@@ -0,0 +1,165 @@
+"""Precomputed progress rollups weighted by topic hours.
+
+A trainee's completion in a batch is the mean of their ``completion_percentage``
+over the topics of the batch's program, weighted by ``estimated_hours``.  When
+a program has no hours recorded every topic weighs the same.  Topics without a
+progress record count as 0%, and if several records exist for one topic the most
+recently updated one wins.
+
+:func:`refresh_trainee` recomputes a single (batch, trainee) pair and its batch
+from the signals; :func:`rebuild_rollups` recomputes whole batches in a few
+set-based queries for the management command and for topic-hour changes.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+
+from .models import Batch, ProgramTopic, ProgressRecord, TraineeProgressRollup, BatchProgressRollup
+
+
+def _program_topics(program_ids):
+    """``{program_id: {topic_id: estimated_hours}}`` for the given programs."""
+    topics = defaultdict(dict)
+    rows = ProgramTopic.objects.filter(program_id__in=program_ids).values_list('program_id', 'id', 'estimated_hours')
+    for program_id, topic_id, hours in rows:
+        topics[program_id][topic_id] = max(hours or 0, 0)
+    return topics
+
+
+def _trainee_values(topic_hours, pct_by_topic):
+    total_hours = sum(topic_hours.values())
+    weights = topic_hours if total_hours else {topic_id: 1 for topic_id in topic_hours}
+    total_weight = sum(weights.values())
+    weighted = 0
+    completed_topics = completed_hours = 0
+    for topic_id, pct in pct_by_topic.items():
+        if topic_id not in weights:
+            continue
+        pct = min(max(pct or 0, 0), 100)
+        weighted += weights[topic_id] * pct
+        if pct >= 100:
+            completed_topics += 1
+            completed_hours += topic_hours[topic_id]
+    return {
+        'completion': weighted / total_weight if total_weight else 0,
+        'completed_topics': completed_topics,
+        'topic_count': len(topic_hours),
+        'completed_hours': completed_hours,
+        'total_hours': total_hours,
+    }
+
+
+def _batch_values(trainee_rollups):
+    totals = trainee_rollups.aggregate(
+        average=Avg('completion'),
+        trainee_count=Count('id'),
+        completed_trainees=Count('id', filter=Q(completion__gte=100)),
+    )
+    return {
+        'completion': totals['average'] or 0,
+        'trainee_count': totals['trainee_count'],
+        'completed_trainees': totals['completed_trainees'],
+    }
+
+
+def refresh_batch(batch_id):
+    """Recompute one batch rollup from its trainee rollups."""
+    values = _batch_values(TraineeProgressRollup.objects.filter(batch_id=batch_id))
+    if not values['trainee_count']:
+        BatchProgressRollup.objects.filter(batch_id=batch_id).delete()
+        return None
+    rollup, _ = BatchProgressRollup.objects.update_or_create(batch_id=batch_id, defaults=values)
+    return rollup
+
+
+def refresh_trainee(batch_id, trainee_id):
+    """Recompute the rollup of one trainee in one batch, then that batch's rollup."""
+    program_id = Batch.objects.filter(pk=batch_id).values_list('program_id', flat=True).first()
+    if program_id is None:
+        return None
+    records = (
+        ProgressRecord.objects.filter(batch_id=batch_id, trainee_id=trainee_id, topic__isnull=False)
+        .order_by('last_updated', 'id')
+        .values_list('topic_id', 'completion_percentage')
+    )
+    pct_by_topic = dict(records)
+    with transaction.atomic():
+        if pct_by_topic:
+            values = _trainee_values(_program_topics([program_id])[program_id], pct_by_topic)
+            TraineeProgressRollup.objects.update_or_create(batch_id=batch_id, trainee_id=trainee_id, defaults=values)
+        else:
+            TraineeProgressRollup.objects.filter(batch_id=batch_id, trainee_id=trainee_id).delete()
+        return refresh_batch(batch_id)
+
+
+def rebuild_rollups(batch_ids=None, trainee_ids=None, chunk_size=2000):
+    """Recompute trainee rollups for ``batch_ids`` x ``trainee_ids`` (``None`` means all),
+    then the rollups of every batch touched."""
+    batches = Batch.objects.all()
+    if batch_ids is not None:
+        batches = batches.filter(pk__in=batch_ids)
+    program_by_batch = dict(batches.values_list('id', 'program_id'))
+    topics = _program_topics(set(program_by_batch.values()))
+
+    records = ProgressRecord.objects.filter(topic__isnull=False).order_by('last_updated', 'id')
+    stale_trainees = TraineeProgressRollup.objects.all()
+    if batch_ids is not None:
+        records = records.filter(batch_id__in=program_by_batch)
+        stale_trainees = stale_trainees.filter(batch_id__in=program_by_batch)
+    if trainee_ids is not None:
+        records = records.filter(trainee_id__in=trainee_ids)
+        stale_trainees = stale_trainees.filter(trainee_id__in=trainee_ids)
+    pct = defaultdict(dict)
+    for batch_id, trainee_id, topic_id, completion in records.values_list(
+        'batch_id', 'trainee_id', 'topic_id', 'completion_percentage'
+    ).iterator(chunk_size=chunk_size):
+        pct[(batch_id, trainee_id)][topic_id] = completion
+
+    trainee_rollups = [
+        TraineeProgressRollup(
+            batch_id=batch_id, trainee_id=trainee_id,
+            **_trainee_values(topics[program_by_batch[batch_id]], pct_by_topic),
+        )
+        for (batch_id, trainee_id), pct_by_topic in pct.items()
+        if batch_id in program_by_batch
+    ]
+
+    with transaction.atomic():
+        stale_trainees.delete()
+        TraineeProgressRollup.objects.bulk_create(trainee_rollups, batch_size=500)
+
+        trainee_rows = TraineeProgressRollup.objects.all()
+        stale_batches = BatchProgressRollup.objects.all()
+        if batch_ids is not None:
+            trainee_rows = trainee_rows.filter(batch_id__in=program_by_batch)
+            stale_batches = stale_batches.filter(batch_id__in=program_by_batch)
+        batch_rollups = [
+            BatchProgressRollup(
+                batch_id=row['batch_id'],
+                completion=row['average'] or 0,
+                trainee_count=row['trainee_count'],
+                completed_trainees=row['completed_trainees'],
+            )
+            for row in trainee_rows.values('batch_id').annotate(
+                average=Avg('completion'),
+                trainee_count=Count('id'),
+                completed_trainees=Count('id', filter=Q(completion__gte=100)),
+            ).order_by()
+        ]
+        stale_batches.delete()
+        BatchProgressRollup.objects.bulk_create(batch_rollups, batch_size=500)
+    return len(trainee_rollups), len(batch_rollups)
+
+
+def refresh_trainees(pairs):
+    """Recompute the rollups of many (batch_id, trainee_id) pairs in a few set-based queries."""
+    pairs = set(pairs)
+    if not pairs:
+        return 0, 0
+    return rebuild_rollups({b for b, _ in pairs}, {t for _, t in pairs})
+
+
+def rebuild_program(program_id):
+    """Recompute the rollups of every batch of a program after its topics changed."""
+    return rebuild_rollups(list(Batch.objects.filter(program_id=program_id).values_list('id', flat=True)))
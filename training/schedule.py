@@ -0,0 +1,286 @@
+"""Weekly class schedule queries over an interval index of ``ClassSlot`` rows.
+
+Slots are kept in sync with ``Class.class_timings`` by the ``Class`` signals
+(see ``training.timings`` for the parser).  :func:`get_index` loads the slots of
+active classes once into a :class:`ScheduleIndex`, sorted by start with the
+longest slot length on the side, so "what overlaps ``[a, b)``" is a bisect plus
+a scan of the candidates rather than a pass over every class.  The index and
+the calendar cache are keyed on the ``TableVersion`` counters of ``Class`` and
+``ClassSlot`` (bumped by the ``Class`` signals and by :func:`sync_slots`), so
+checking for changes is one small lookup rather than a scan of the classes.
+
+All times are wall-clock minutes from Monday 00:00 in ``TIME_ZONE``.
+"""
+import hashlib
+import threading
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.negotiation import BaseContentNegotiation
+
+from .caching import bump_table_versions, table_versions
+from .models import Class, ClassSlot
+from .timings import MINUTES_PER_DAY, MINUTES_PER_WEEK, format_minute, parse_timings
+
+CACHE_PREFIX = 'class-schedule'
+
+Slot = namedtuple('Slot', 'start end class_id name trainer_name class_timings google_meet_link description')
+
+
+def trainer_key(name):
+    return ' '.join((name or '').split()).casefold()
+
+
+def sync_slots(klass):
+    """Replace the slots of ``klass`` with those parsed from its ``class_timings``."""
+    with transaction.atomic():
+        ClassSlot.objects.filter(klass=klass).delete()
+        ClassSlot.objects.bulk_create([
+            ClassSlot(klass=klass, start=start, end=end) for start, end in parse_timings(klass.class_timings)
+        ])
+        bump_table_versions(ClassSlot)
+
+
+def rebuild_slots(chunk_size=2000):
+    """Re-parse every class; returns ``(classes, slots)``."""
+    slots = []
+    classes = 0
+    for class_id, timings in Class.objects.values_list('id', 'class_timings').iterator(chunk_size=chunk_size):
+        classes += 1
+        slots.extend(ClassSlot(klass_id=class_id, start=start, end=end) for start, end in parse_timings(timings))
+    with transaction.atomic():
+        ClassSlot.objects.all().delete()
+        ClassSlot.objects.bulk_create(slots, batch_size=500)
+        bump_table_versions(ClassSlot)
+    return classes, len(slots)
+
+
+class _Intervals:
+    """Slots sorted by start; ``overlapping`` costs O(log n + candidates)."""
+
+    def __init__(self, slots):
+        self.slots = sorted(slots)
+        self.starts = [slot.start for slot in self.slots]
+        self.max_length = max((slot.end - slot.start for slot in self.slots), default=0)
+
+    def overlapping(self, start, end):
+        # A slot starting more than max_length before ``start`` has ended by then.
+        lo = bisect_left(self.starts, start - self.max_length + 1)
+        hi = bisect_left(self.starts, end)
+        return [slot for slot in self.slots[lo:hi] if slot.end > start]
+
+
+class ScheduleIndex:
+    """Interval index over all active slots, plus one per trainer."""
+
+    def __init__(self, slots):
+        self.all = _Intervals(slots)
+        by_trainer = defaultdict(list)
+        for slot in self.all.slots:
+            by_trainer[trainer_key(slot.trainer_name)].append(slot)
+        self.trainers = {key: _Intervals(trainer_slots) for key, trainer_slots in by_trainer.items()}
+
+    def intervals(self, trainer=None):
+        if trainer is None:
+            return self.all
+        return self.trainers.get(trainer_key(trainer)) or _Intervals([])
+
+    def window(self, start, end, trainer=None):
+        """``(start, end, slot)`` occurrences meeting ``[start, end)``, where both may run past the
+        first week; occurrence times are on the same scale."""
+        intervals = self.intervals(trainer)
+        occurrences = []
+        offset = start // MINUTES_PER_WEEK * MINUTES_PER_WEEK
+        while offset < end:
+            lo, hi = max(start - offset, 0), min(end - offset, MINUTES_PER_WEEK)
+            occurrences.extend((offset + s.start, offset + s.end, s) for s in intervals.overlapping(lo, hi))
+            offset += MINUTES_PER_WEEK
+        occurrences.sort(key=lambda o: (o[0], o[2].class_id))
+        return occurrences
+
+    def conflicts(self, trainer=None):
+        """Pairs of different classes whose slots overlap for the same trainer."""
+        groups = [self.intervals(trainer)] if trainer is not None else self.trainers.values()
+        found = []
+        for intervals in groups:
+            running = []
+            for slot in intervals.slots:
+                running = [other for other in running if other.end > slot.start]
+                found.extend((other, slot) for other in running if other.class_id != slot.class_id)
+                running.append(slot)
+        return found
+
+    def free_slots(self, trainer=None, day_start=8 * 60, day_end=18 * 60, min_length=30):
+        """``(start, end)`` gaps of at least ``min_length`` minutes within each day's working hours."""
+        intervals = self.intervals(trainer)
+        free = []
+        for day in range(7):
+            cursor = day * MINUTES_PER_DAY + day_start
+            closing = day * MINUTES_PER_DAY + day_end
+            for slot in intervals.overlapping(cursor, closing):
+                if slot.start - cursor >= min_length:
+                    free.append((cursor, slot.start))
+                cursor = max(cursor, slot.end)
+            if closing - cursor >= min_length:
+                free.append((cursor, closing))
+        return free
+
+
+def schedule_version():
+    """Changes whenever a class is saved or deleted, or its slots are rewritten."""
+    return table_versions(Class, ClassSlot)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The :class:`ScheduleIndex` of active classes, rebuilt when :func:`schedule_version` changes."""
+    global _index
+    version = schedule_version()
+    cached = _index
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _index_lock:
+        # Another thread may have rebuilt it while this one waited.
+        cached = _index
+        if cached is None or cached[0] != version:
+            rows = ClassSlot.objects.filter(klass__is_active=True).values_list(
+                'start', 'end', 'klass_id', 'klass__name', 'klass__trainer_name', 'klass__class_timings',
+                'klass__google_meet_link', 'klass__description',
+            )
+            cached = (version, ScheduleIndex([Slot(*row) for row in rows]))
+            _index = cached
+    return cached[1]
+
+
+def _week_start(moment):
+    """Naive local Monday 00:00 of the week containing ``moment``."""
+    local = timezone.localtime(moment).replace(tzinfo=None)
+    return (local - timedelta(days=local.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def upcoming(now=None, hours=24, trainer=None):
+    """Class occurrences running at any time in the next ``hours`` hours, soonest first."""
+    now = now or timezone.now()
+    monday = _week_start(now)
+    minute = int((timezone.localtime(now).replace(tzinfo=None) - monday).total_seconds() // 60)
+    results = []
+    for start, end, slot in get_index().window(minute, minute + int(hours * 60), trainer):
+        results.append({
+            'id': slot.class_id,
+            'name': slot.name,
+            'trainer_name': slot.trainer_name,
+            'class_timings': slot.class_timings,
+            'google_meet_link': slot.google_meet_link,
+            'description': slot.description,
+            'start': timezone.make_aware(monday + timedelta(minutes=start)),
+            'end': timezone.make_aware(monday + timedelta(minutes=end)),
+        })
+    return results
+
+
+def conflicts(trainer=None):
+    return [
+        {
+            'trainer_name': first.trainer_name,
+            'classes': [
+                {'id': first.class_id, 'name': first.name, 'start': format_minute(first.start), 'end': format_minute(first.end)},
+                {'id': second.class_id, 'name': second.name, 'start': format_minute(second.start), 'end': format_minute(second.end)},
+            ],
+            'overlap_start': format_minute(second.start),
+            'overlap_end': format_minute(min(first.end, second.end)),
+            'overlap_minutes': min(first.end, second.end) - second.start,
+        }
+        for first, second in get_index().conflicts(trainer)
+    ]
+
+
+def free_slots(trainer=None, day_start=8 * 60, day_end=18 * 60, min_length=30):
+    return [
+        {'start': format_minute(start), 'end': format_minute(end), 'minutes': end - start}
+        for start, end in get_index().free_slots(trainer, day_start, day_end, min_length)
+    ]
+
+
+# iCalendar feed
+
+def _escape(text):
+    return (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _fold(line):
+    """Split ``line`` into 75-octet lines as RFC 5545 requires."""
+    parts, current, size = [], '', 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > 75:
+            parts.append(current)
+            current, size = ' ', 1
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n'.join(parts)
+
+
+def _compute_calendar(trainer=None):
+    tzid = settings.TIME_ZONE
+    slots = ClassSlot.objects.filter(klass__is_active=True).select_related('klass').order_by('klass_id', 'start')
+    lines = [
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Training Tracker//Classes//EN',
+        'CALSCALE:GREGORIAN', 'X-WR-CALNAME:Classes', f'X-WR-TIMEZONE:{tzid}',
+    ]
+    for slot in slots:
+        klass = slot.klass
+        if trainer is not None and trainer_key(klass.trainer_name) != trainer_key(trainer):
+            continue
+        # The first weekly occurrence on or after the class was created.
+        monday = _week_start(klass.created_at)
+        first = monday + timedelta(minutes=slot.start)
+        if first < timezone.localtime(klass.created_at).replace(tzinfo=None):
+            first += timedelta(weeks=1)
+        last = first + timedelta(minutes=slot.end - slot.start)
+        stamp = klass.updated_at.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        description = '\n'.join(filter(None, [f'Trainer: {klass.trainer_name}', klass.description]))
+        event = [
+            'BEGIN:VEVENT',
+            f'UID:class-{klass.pk}-{slot.start}@training-tracker',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART;TZID={tzid}:{first:%Y%m%dT%H%M%S}',
+            f'DTEND;TZID={tzid}:{last:%Y%m%dT%H%M%S}',
+            'RRULE:FREQ=WEEKLY',
+            f'SUMMARY:{_escape(klass.name)}',
+            f'DESCRIPTION:{_escape(description)}',
+        ]
+        if klass.google_meet_link:
+            event += [f'LOCATION:{_escape(klass.google_meet_link)}', f'URL:{klass.google_meet_link}']
+        lines += event + ['END:VEVENT']
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
+
+
+def calendar(trainer=None):
+    """``(version, iCalendar text)`` of every active class slot as a weekly event, cached per version."""
+    version = hashlib.sha1(schedule_version().encode('utf-8')).hexdigest()
+    key = f'{CACHE_PREFIX}:ical:{trainer_key(trainer) if trainer else ""}:{version}'
+    text = cache.get(key)
+    if text is None:
+        text = _compute_calendar(trainer)
+        cache.set(key, text, getattr(settings, 'CLASS_CALENDAR_CACHE_TIMEOUT', 3600))
+    return version, text
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """Always use the view's first renderer: calendar clients send all sorts of ``Accept`` headers."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
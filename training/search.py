@@ -0,0 +1,233 @@
+"""Ranked full-text search over programs, topics and classes.
+
+DRF's ``SearchFilter`` ORs one ``icontains`` per field and word, so every
+``?search=`` is a LIKE scan of the whole table with no notion of relevance.
+This module keeps an inverted index instead, maintained by the
+``post_save``/``post_delete`` handlers in ``training.signals`` and rebuilt by
+``manage.py rebuild_search_index``:
+
+* On SQLite with FTS5, the ``training_search_fts`` virtual table created by
+  migration 0011 holds one row per object and ranks matches with ``bm25()``.
+* Elsewhere, or with ``SEARCH_BACKEND=python``, ``SearchTerm`` holds one
+  posting per (object, word) and matches are ranked in Python by tf-idf.
+
+Both backends split text into lowercase, accent-free Unicode words, match each
+query word as a prefix (all words must match) and weight title fields
+``TITLE_WEIGHT`` times higher than body text.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Case, IntegerField, When
+from rest_framework import filters
+
+from .models import Class, Program, ProgramTopic, SearchTerm
+
+FTS_TABLE = 'training_search_fts'
+TITLE_WEIGHT = 10.0
+MAX_TERM_LENGTH = 64
+CHUNK_SIZE = 1000
+
+# kind -> (model, title fields, body fields)
+INDEXED_MODELS = {
+    'program': (Program, ('name',), ('description',)),
+    'topic': (ProgramTopic, ('topic_name',), ('topic_description',)),
+    'class': (Class, ('name', 'trainer_name'), ('description',)),
+}
+KINDS = {model: kind for kind, (model, _, _) in INDEXED_MODELS.items()}
+# FTS5 rows are keyed by a rowid that packs (object id, kind).
+KIND_CODES = {kind: code for code, kind in enumerate(INDEXED_MODELS, start=1)}
+ROWID_STRIDE = 4
+
+# Same word boundaries as FTS5's unicode61 tokenizer: letters and digits only.
+_WORD = re.compile(r'[^\W_]+')
+_fts5_tables = {}
+
+
+def tokenize(text):
+    """Lowercase, accent-free words of ``text``."""
+    if not text:
+        return []
+    text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return [word[:MAX_TERM_LENGTH] for word in _WORD.findall(text.lower())]
+
+
+def uses_fts5(using):
+    if getattr(settings, 'SEARCH_BACKEND', 'auto') == 'python':
+        return False
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    key = (using, connection.settings_dict['NAME'])
+    if key not in _fts5_tables:
+        _fts5_tables[key] = FTS_TABLE in connection.introspection.table_names()
+    return _fts5_tables[key]
+
+
+def _rowid(kind, pk):
+    return pk * ROWID_STRIDE + KIND_CODES[kind]
+
+
+def _document(kind, values):
+    """``(title, body)`` from the title field values followed by the body field values."""
+    _, title_fields, _ = INDEXED_MODELS[kind]
+    title = ' '.join(v for v in values[:len(title_fields)] if v)
+    body = ' '.join(v for v in values[len(title_fields):] if v)
+    return title, body
+
+
+def _postings(kind, pk, title, body):
+    weights = Counter()
+    for word in tokenize(title):
+        weights[word] += TITLE_WEIGHT
+    for word in tokenize(body):
+        weights[word] += 1
+    # Long descriptions should not outrank a short exact title just by repeating words.
+    norm = math.sqrt(sum(weights.values())) or 1
+    return [SearchTerm(kind=kind, object_id=pk, term=term, weight=weight / norm) for term, weight in weights.items()]
+
+
+def _write(using, kind, docs, replace=True):
+    """Index ``docs`` (``(pk, title, body)`` tuples), replacing what was indexed for them."""
+    if uses_fts5(using):
+        with connections[using].cursor() as cursor:
+            if replace:
+                cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(_rowid(kind, pk),) for pk, _, _ in docs])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, kind, title, body) VALUES (%s, %s, %s, %s)',
+                [(_rowid(kind, pk), kind, title, body) for pk, title, body in docs],
+            )
+        return
+    if replace:
+        SearchTerm.objects.using(using).filter(kind=kind, object_id__in=[pk for pk, _, _ in docs]).delete()
+    SearchTerm.objects.using(using).bulk_create(
+        [posting for pk, title, body in docs for posting in _postings(kind, pk, title, body)],
+        batch_size=CHUNK_SIZE,
+    )
+
+
+def index_instance(instance):
+    kind = KINDS.get(type(instance))
+    if kind is None:
+        return
+    _, title_fields, body_fields = INDEXED_MODELS[kind]
+    values = [getattr(instance, field) for field in title_fields + body_fields]
+    _write(router.db_for_write(type(instance)), kind, [(instance.pk, *_document(kind, values))])
+
+
+def remove_instance(instance):
+    kind = KINDS.get(type(instance))
+    if kind is None:
+        return
+    using = router.db_for_write(type(instance))
+    if uses_fts5(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [_rowid(kind, instance.pk)])
+    else:
+        SearchTerm.objects.using(using).filter(kind=kind, object_id=instance.pk).delete()
+
+
+def rebuild(kinds=None, using=None):
+    """Re-index every object of ``kinds`` (default: all) from scratch; returns ``{kind: objects}``."""
+    counts = {}
+    fts_databases = set()
+    for kind in kinds or INDEXED_MODELS:
+        model, title_fields, body_fields = INDEXED_MODELS[kind]
+        db = using or router.db_for_write(model)
+        with transaction.atomic(using=db):
+            if uses_fts5(db):
+                fts_databases.add(db)
+                with connections[db].cursor() as cursor:
+                    cursor.execute(
+                        f'DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+                        [f'kind:{kind}'],
+                    )
+            else:
+                SearchTerm.objects.using(db).filter(kind=kind).delete()
+            counts[kind] = 0
+            rows = model.objects.using(db).order_by('pk').values_list('pk', *title_fields, *body_fields)
+            docs = []
+            for pk, *values in rows.iterator(chunk_size=CHUNK_SIZE):
+                docs.append((pk, *_document(kind, values)))
+                if len(docs) == CHUNK_SIZE:
+                    _write(db, kind, docs, replace=False)
+                    counts[kind] += len(docs)
+                    docs = []
+            _write(db, kind, docs, replace=False)
+            counts[kind] += len(docs)
+    for db in fts_databases:
+        # Merge the index segments written above into one b-tree.
+        with connections[db].cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return counts
+
+
+def _fts_search(using, kind, words, limit):
+    prefixes = ' '.join(f'"{word}"*' for word in words)
+    sql = (
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+        f'ORDER BY bm25({FTS_TABLE}, 0, {TITLE_WEIGHT}, 1.0), rowid LIMIT %s'
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [f'kind:{kind} AND {{title body}}:({prefixes})', limit])
+        return [rowid // ROWID_STRIDE for rowid, in cursor.fetchall()]
+
+
+def _python_search(using, kind, words, limit):
+    model = INDEXED_MODELS[kind][0]
+    total = model.objects.using(using).count() or 1
+    scores = None
+    for word in words:
+        # A range on the (kind, term) index rather than LIKE, which SQLite cannot seek on.
+        postings = list(SearchTerm.objects.using(using).filter(
+            kind=kind, term__gte=word, term__lt=word + chr(0x10FFFF),
+        ).values_list('term', 'object_id', 'weight'))
+        df = Counter(term for term, _, _ in postings)
+        word_scores = defaultdict(float)
+        for term, object_id, weight in postings:
+            word_scores[object_id] += weight * math.log(1 + total / df[term])
+        if scores is None:
+            scores = word_scores
+        else:
+            scores = {pk: score + word_scores[pk] for pk, score in scores.items() if pk in word_scores}
+        if not scores:
+            return []
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [pk for pk, _ in ranked[:limit]]
+
+
+def search(model, query, limit=None):
+    """Primary keys of ``model`` objects matching every word of ``query``, best match first."""
+    kind = KINDS[model]
+    words = list(dict.fromkeys(tokenize(query)))
+    if not words:
+        return []
+    limit = limit or getattr(settings, 'SEARCH_MAX_RESULTS', 1000)
+    using = router.db_for_read(model)
+    if uses_fts5(using):
+        return _fts_search(using, kind, words, limit)
+    return _python_search(using, kind, words, limit)
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """``SearchFilter`` that answers ``?search=`` from the index for the indexed models.
+
+    Results are ordered by rank; an explicit ``?ordering=`` still applies afterwards.
+    Other models keep the ``search_fields`` LIKE lookups.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if queryset.model not in KINDS:
+            return super().filter_queryset(request, queryset, view)
+        query = request.query_params.get(self.search_param, '')
+        if not tokenize(query):
+            return queryset
+        ids = search(queryset.model, query)
+        if not ids:
+            return queryset.none()
+        rank = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+        return queryset.filter(pk__in=ids).order_by(rank)
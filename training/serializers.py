@@ -2,7 +2,11 @@ from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
-from .models import User, Program, ProgramTopic, Batch, BatchTrainer, BatchTrainee, Designation, DesignationProgram, TraineeDesignation, ProgressRecord, AuditLog, PasswordResetToken, Class
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from .enrollment import OVERFLOW_CHOICES
+from .fieldsets import FieldsetSerializerMixin
+from .models import User, Program, ProgramTopic, Batch, BatchTrainer, BatchTrainee, Designation, DesignationProgram, TraineeDesignation, ProgressRecord, AuditLog, PasswordResetToken, Class, TraineeProgressRollup, BatchProgressRollup
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
@@ -21,11 +25,17 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         }
         return data
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id','username','email','first_name','last_name','phone','role','expertise','designation','is_active_flag']
 
+class UserSummarySerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    """The public part of a user, used when another object expands a user field."""
+    class Meta:
+        model = User
+        fields = ['id','username','first_name','last_name','role']
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
@@ -77,60 +87,137 @@ class PasswordResetSerializer(serializers.Serializer):
         attrs['reset_token'] = reset_token
         return attrs
 
-class DesignationSerializer(serializers.ModelSerializer):
+class DesignationSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Designation
         fields = '__all__'
 
-class ProgramTopicSerializer(serializers.ModelSerializer):
+class ProgramTopicSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {'program': 'ProgramSerializer'}
     class Meta:
         model = ProgramTopic
         fields = '__all__'
 
-class ProgramSerializer(serializers.ModelSerializer):
+class ProgramSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {'created_by': 'UserSummarySerializer'}
     topics = ProgramTopicSerializer(many=True, read_only=True)
     class Meta:
         model = Program
         fields = '__all__'
 
-class BatchSerializer(serializers.ModelSerializer):
+class BatchSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {'program': 'ProgramSerializer', 'created_by': 'UserSummarySerializer'}
     class Meta:
         model = Batch
         fields = '__all__'
 
-class BatchTrainerSerializer(serializers.ModelSerializer):
+class BatchTrainerSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {'batch': 'BatchSerializer', 'trainer': 'UserSummarySerializer'}
     class Meta:
         model = BatchTrainer
         fields = '__all__'
 
-class BatchTraineeSerializer(serializers.ModelSerializer):
+class BatchTraineeSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {'batch': 'BatchSerializer', 'trainee': 'UserSummarySerializer'}
     class Meta:
         model = BatchTrainee
         fields = '__all__'
 
-class DesignationProgramSerializer(serializers.ModelSerializer):
+class DesignationProgramSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {'designation': 'DesignationSerializer', 'program': 'ProgramSerializer'}
     class Meta:
         model = DesignationProgram
         fields = '__all__'
 
-class TraineeDesignationSerializer(serializers.ModelSerializer):
+class TraineeDesignationSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {'trainee': 'UserSummarySerializer', 'designation': 'DesignationSerializer', 'created_by': 'UserSummarySerializer'}
     class Meta:
         model = TraineeDesignation
         fields = '__all__'
 
-class ProgressRecordSerializer(serializers.ModelSerializer):
+class ProgressRecordSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {'trainee': 'UserSummarySerializer', 'batch': 'BatchSerializer', 'topic': 'ProgramTopicSerializer', 'updated_by': 'UserSummarySerializer'}
     class Meta:
         model = ProgressRecord
         fields = '__all__'
+        # ProgramTopic.__str__ reads program.name, e.g. for browsable API choices.
+        extra_kwargs = {'topic': {'queryset': ProgramTopic.objects.select_related('program')}}
+
+class ProgressRecordBulkRowSerializer(serializers.Serializer):
+    """One row of a bulk progress upsert, keyed by (trainee, batch, topic)."""
+    trainee = serializers.IntegerField(required=False)
+    batch = serializers.IntegerField()
+    topic = serializers.IntegerField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=ProgressRecord.STATUS_CHOICES)
+    completion_percentage = serializers.IntegerField(min_value=0, max_value=100)
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+class BatchEnrollmentSerializer(serializers.Serializer):
+    """A bulk enrollment: trainee ids for one batch, first come first seated."""
+    batch = serializers.IntegerField()
+    trainees = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=5000)
+    overflow = serializers.ChoiceField(choices=OVERFLOW_CHOICES, default='reject')
+
+class UserImportRowSerializer(serializers.Serializer):
+    """One CSV row of a bulk user import.
+
+    ``designations`` and ``batches`` are ``;``-separated ids.  A blank password
+    leaves the account unusable until the user resets it.
+    """
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField(required=False, allow_blank=True, default='')
+    first_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default='')
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default='')
+    phone = serializers.CharField(max_length=50, required=False, allow_blank=True, allow_null=True)
+    role = serializers.ChoiceField(choices=User.ROLE_CHOICES, default='trainee')
+    password = serializers.CharField(required=False, allow_blank=True, default='', trim_whitespace=False)
+    designations = serializers.CharField(required=False, allow_blank=True, default='')
+    batches = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def _ids(self, value):
+        try:
+            return list(dict.fromkeys(int(part) for part in value.replace(',', ';').split(';') if part.strip()))
+        except ValueError:
+            raise serializers.ValidationError('Expected ";"-separated ids.')
+
+    def validate_designations(self, value):
+        return self._ids(value)
+
+    def validate_batches(self, value):
+        return self._ids(value)
 
-class AuditLogSerializer(serializers.ModelSerializer):
+    def validate(self, attrs):
+        if attrs['password']:
+            candidate = User(username=attrs['username'], email=attrs['email'],
+                             first_name=attrs['first_name'], last_name=attrs['last_name'])
+            try:
+                validate_password(attrs['password'], candidate)
+            except DjangoValidationError as exc:
+                raise serializers.ValidationError({'password': list(exc.messages)})
+        if (attrs['designations'] or attrs['batches']) and attrs['role'] != 'trainee':
+            raise serializers.ValidationError('Only trainees can be given designations or enrolled in batches.')
+        return attrs
+
+class AuditLogSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': 'UserSummarySerializer'}
     class Meta:
         model = AuditLog
         fields = '__all__'
         read_only_fields = ('created_at',)
 
-class ClassSerializer(serializers.ModelSerializer):
+class ClassSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {'created_by': 'UserSummarySerializer'}
     class Meta:
         model = Class
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
+
+class TraineeProgressRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TraineeProgressRollup
+        fields = ('trainee', 'completion', 'completed_topics', 'topic_count', 'completed_hours', 'total_hours', 'updated_at')
+
+class BatchProgressRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BatchProgressRollup
+        fields = ('batch', 'completion', 'trainee_count', 'completed_trainees', 'updated_at')
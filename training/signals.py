@@ -1,9 +1,15 @@
-from django.db.models.signals import post_save, pre_delete, pre_save
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Program, ProgressRecord, AuditLog
+from django.utils import timezone
+from .models import Batch, BatchTrainee, Class, Designation, DesignationProgram, Program, ProgramTopic, ProgressRecord, TraineeDesignation, User
+from .audit import audit_sink
+from .authentication import user_cache
+from . import caching, compliance, enrollment, events, metrics, rollups, schedule, search, stats
 def record_audit(instance, action, old=None, new=None, user=None):
+    metrics.audit_records.inc(action)
     try:
-        AuditLog.objects.create(
+        audit_sink.record(
             user=user,
             action=action,
             table_name=instance._meta.db_table,
@@ -35,13 +41,247 @@ def post_save_program(sender, instance, created, **kwargs):
     else:
         record_audit(instance, 'update', old=getattr(instance, '_old_values', None), new={'name': instance.name})
 
+@receiver(pre_save, sender=ProgressRecord)
+def pre_save_progress(sender, instance, **kwargs):
+    instance._old_scope = None
+    if instance.pk:
+        instance._old_scope = sender.objects.filter(pk=instance.pk).values_list('batch_id', 'trainee_id').first()
+
 @receiver(post_save, sender=ProgressRecord)
 def post_save_progress(sender, instance, created, **kwargs):
     if created:
         record_audit(instance, 'create_progress', new={'status': instance.status, 'completion': instance.completion_percentage})
     else:
         record_audit(instance, 'update_progress', new={'status': instance.status, 'completion': instance.completion_percentage})
+    old_scope = getattr(instance, '_old_scope', None)
+    if old_scope and old_scope != (instance.batch_id, instance.trainee_id):
+        rollups.refresh_trainee(*old_scope)
+    rollups.refresh_trainee(instance.batch_id, instance.trainee_id)
+
+@receiver(post_delete, sender=ProgressRecord)
+def post_delete_progress(sender, instance, **kwargs):
+    rollups.refresh_trainee(instance.batch_id, instance.trainee_id)
+
+@receiver(pre_save, sender=ProgramTopic)
+def pre_save_topic(sender, instance, **kwargs):
+    instance._old_hours = None
+    if instance.pk:
+        instance._old_hours = sender.objects.filter(pk=instance.pk).values_list('program_id', 'estimated_hours').first()
+
+def touch_program(program_id):
+    # Topic changes bump the program's updated_at so cached program trees expire.
+    Program.objects.filter(pk=program_id).update(updated_at=timezone.now())
+    caching.bump_table_versions(Program)
+
+@receiver(post_save, sender=ProgramTopic)
+def post_save_topic(sender, instance, created, **kwargs):
+    touch_program(instance.program_id)
+    old = getattr(instance, '_old_hours', None)
+    if created or old != (instance.program_id, instance.estimated_hours):
+        rollups.rebuild_program(instance.program_id)
+        if old and old[0] != instance.program_id:
+            touch_program(old[0])
+            rollups.rebuild_program(old[0])
+
+@receiver(post_delete, sender=ProgramTopic)
+def post_delete_topic(sender, instance, origin=None, **kwargs):
+    # When the whole program is being deleted its batches and rollups go with it.
+    if isinstance(origin, Program):
+        return
+    touch_program(instance.program_id)
+    rollups.rebuild_program(instance.program_id)
 
 @receiver(pre_delete, sender=Program)
 def pre_delete_program(sender, instance, **kwargs):
     record_audit(instance, 'delete', old={'name': instance.name})
+
+# Dashboard counters
+
+def _counted_field_names(model):
+    return {f[:-3] if f.endswith('_id') else f for f in stats.tracked_fields(model)}
+
+def pre_save_counters(sender, instance, update_fields=None, **kwargs):
+    instance._counter_keys = None
+    if instance.pk is None or instance._state.adding:
+        return
+    if update_fields is not None and not _counted_field_names(sender) & set(update_fields):
+        instance._counter_keys = stats.instance_keys(instance)
+        return
+    instance._counter_keys = stats.stored_keys(sender, instance.pk)
+
+def post_save_counters(sender, instance, created, **kwargs):
+    old_keys = [] if created else (getattr(instance, '_counter_keys', None) or [])
+    stats.apply_deltas(stats.key_deltas(old_keys, stats.instance_keys(instance)))
+
+def post_delete_counters(sender, instance, **kwargs):
+    stats.apply_deltas(stats.key_deltas(stats.instance_keys(instance), []))
+
+for _model in stats.COUNTED_MODELS:
+    pre_save.connect(pre_save_counters, sender=_model, dispatch_uid=f'counters_pre_save_{_model.__name__}')
+    post_save.connect(post_save_counters, sender=_model, dispatch_uid=f'counters_post_save_{_model.__name__}')
+    post_delete.connect(post_delete_counters, sender=_model, dispatch_uid=f'counters_post_delete_{_model.__name__}')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+# Search index
+
+def index_searchable(sender, instance, **kwargs):
+    search.index_instance(instance)
+
+def unindex_searchable(sender, instance, **kwargs):
+    search.remove_instance(instance)
+
+for _model in search.KINDS:
+    post_save.connect(index_searchable, sender=_model, dispatch_uid=f'search_post_save_{_model.__name__}')
+    post_delete.connect(unindex_searchable, sender=_model, dispatch_uid=f'search_post_delete_{_model.__name__}')
+
+
+# Class schedule
+
+@receiver(pre_save, sender=Class)
+def pre_save_class_slots(sender, instance, **kwargs):
+    instance._old_timings = None
+    if instance.pk:
+        instance._old_timings = sender.objects.filter(pk=instance.pk).values_list('class_timings', flat=True).first()
+
+@receiver(post_save, sender=Class)
+def post_save_class_slots(sender, instance, created, **kwargs):
+    if created or instance.class_timings != getattr(instance, '_old_timings', None):
+        schedule.sync_slots(instance)
+
+
+# Compliance matrix
+
+def _cascaded_from(origin, *models):
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in models
+
+def _tracked(sender, instance, fields):
+    if not instance.pk:
+        return None
+    return sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+@receiver(pre_save, sender=TraineeDesignation)
+def pre_save_trainee_designation(sender, instance, **kwargs):
+    instance._old_compliance = _tracked(sender, instance, ('trainee_id', 'designation_id'))
+
+@receiver(post_save, sender=TraineeDesignation)
+def post_save_trainee_designation(sender, instance, created, **kwargs):
+    old = getattr(instance, '_old_compliance', None)
+    if created or old != (instance.trainee_id, instance.designation_id):
+        compliance.refresh_trainees({instance.trainee_id, old[0] if old else None})
+
+@receiver(pre_save, sender=DesignationProgram)
+def pre_save_designation_program(sender, instance, **kwargs):
+    instance._old_compliance = _tracked(sender, instance, ('designation_id', 'program_id', 'is_required'))
+
+@receiver(post_save, sender=DesignationProgram)
+def post_save_designation_program(sender, instance, created, **kwargs):
+    old = getattr(instance, '_old_compliance', None)
+    was_required = bool(old and old[2])
+    if old != (instance.designation_id, instance.program_id, instance.is_required) and (was_required or instance.is_required):
+        compliance.refresh_designations({instance.designation_id, old[0] if old else None})
+
+@receiver(pre_save, sender=Designation)
+def pre_save_designation(sender, instance, **kwargs):
+    instance._old_compliance = _tracked(sender, instance, ('is_active',))
+
+@receiver(post_save, sender=Designation)
+def post_save_designation(sender, instance, created, **kwargs):
+    old = getattr(instance, '_old_compliance', None)
+    if old and old != (instance.is_active,):
+        compliance.refresh_designations({instance.pk})
+
+@receiver(pre_save, sender=BatchTrainee)
+def pre_save_enrollment_compliance(sender, instance, **kwargs):
+    instance._old_compliance = _tracked(sender, instance, ('trainee_id', 'batch_id', 'status', 'completion_date'))
+
+@receiver(post_save, sender=BatchTrainee)
+def post_save_enrollment_compliance(sender, instance, created, **kwargs):
+    old = getattr(instance, '_old_compliance', None)
+    if created or old != (instance.trainee_id, instance.batch_id, instance.status, instance.completion_date):
+        compliance.refresh_trainees({instance.trainee_id, old[0] if old else None})
+
+@receiver(pre_save, sender=Batch)
+def pre_save_batch_compliance(sender, instance, **kwargs):
+    instance._old_compliance = _tracked(sender, instance, ('program_id',))
+
+@receiver(post_save, sender=Batch)
+def post_save_batch_compliance(sender, instance, created, **kwargs):
+    old = getattr(instance, '_old_compliance', None)
+    if old and old != (instance.program_id,):
+        compliance.refresh_trainees(BatchTrainee.objects.filter(batch=instance).values_list('trainee_id', flat=True))
+
+# Matrix rows of a deleted user, designation or program go with it through their
+# foreign keys; refreshing during that delete would re-insert rows pointing at it.
+
+@receiver(post_delete, sender=TraineeDesignation)
+def post_delete_trainee_designation(sender, instance, origin=None, **kwargs):
+    if not _cascaded_from(origin, User, Designation):
+        compliance.refresh_trainees({instance.trainee_id})
+
+@receiver(post_delete, sender=DesignationProgram)
+def post_delete_designation_program(sender, instance, origin=None, **kwargs):
+    if instance.is_required and not _cascaded_from(origin, Designation, Program):
+        compliance.refresh_designations({instance.designation_id})
+
+@receiver(post_delete, sender=BatchTrainee)
+def post_delete_enrollment_compliance(sender, instance, origin=None, **kwargs):
+    if not _cascaded_from(origin, User, Program):
+        compliance.refresh_trainees({instance.trainee_id})
+
+
+# Batch enrolled counts
+
+@receiver(pre_save, sender=BatchTrainee)
+def pre_save_enrollment_seat(sender, instance, **kwargs):
+    instance._old_seat = _tracked(sender, instance, ('batch_id', 'status'))
+
+@receiver(post_save, sender=BatchTrainee)
+def post_save_enrollment_seat(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, '_old_seat', None)
+    enrollment.apply_seat_deltas(enrollment.seat_deltas([old], [(instance.batch_id, instance.status)]))
+
+@receiver(post_delete, sender=BatchTrainee)
+def post_delete_enrollment_seat(sender, instance, origin=None, **kwargs):
+    if not _cascaded_from(origin, Batch, Program):
+        enrollment.apply_seat_deltas(enrollment.seat_deltas([(instance.batch_id, instance.status)], []))
+
+
+# Table versions (list/detail ETags)
+# AuditLog is bumped by its writers instead: a delete receiver would turn the
+# archiver's bulk deletes into row-by-row ones.
+
+def bump_version_on_save(sender, instance, **kwargs):
+    caching.bump_table_versions(sender)
+
+def bump_version_on_delete(sender, instance, **kwargs):
+    caching.bump_table_versions(sender, *caching.nulled_by_delete(sender))
+
+for _model in caching.VERSIONED_MODELS:
+    post_save.connect(bump_version_on_save, sender=_model, dispatch_uid=f'versions_post_save_{_model.__name__}')
+    post_delete.connect(bump_version_on_delete, sender=_model, dispatch_uid=f'versions_post_delete_{_model.__name__}')
+
+
+# Live event streams
+
+@receiver(post_save, sender=ProgressRecord)
+def publish_progress(sender, instance, **kwargs):
+    events.publish([events.progress_event(instance)])
+
+@receiver(post_delete, sender=ProgressRecord)
+def publish_progress_deleted(sender, instance, **kwargs):
+    events.publish([events.progress_event(instance, deleted=True)])
+
+@receiver(post_save, sender=BatchTrainee)
+def publish_enrollment(sender, instance, **kwargs):
+    events.publish([events.enrollment_event(instance)])
+
+@receiver(post_delete, sender=BatchTrainee)
+def publish_enrollment_deleted(sender, instance, **kwargs):
+    events.publish([events.enrollment_event(instance, deleted=True)])
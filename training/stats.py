@@ -0,0 +1,175 @@
+"""Incrementally maintained dashboard counters.
+
+Every counted model contributes to one or more ``DashboardCounter`` rows keyed
+by ``(metric, bucket, trainee)``.  The signals in ``training.signals`` turn each
+save/delete into a handful of ``UPDATE ... SET value = value + n`` statements,
+and :func:`rebuild_counters` recomputes the whole table with GROUP BY queries.
+"""
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from .models import User, Program, Batch, BatchTrainee, ProgressRecord, Class, DashboardCounter
+
+# model -> (metric, bucket field, also counted per trainee)
+COUNTED_MODELS = {
+    Program: ('programs', None, False),
+    Batch: ('batches', 'status', False),
+    BatchTrainee: ('batch_trainees', 'status', True),
+    ProgressRecord: ('progress_records', 'status', True),
+    Class: ('classes', None, False),
+    User: ('users', 'role', False),
+}
+
+# metric -> choices used to fill in empty buckets in the summary
+BUCKET_CHOICES = {
+    'batches': Batch.STATUS_CHOICES,
+    'batch_trainees': BatchTrainee.STATUS_CHOICES,
+    'progress_records': ProgressRecord.STATUS_CHOICES,
+    'users': User.ROLE_CHOICES,
+}
+
+
+def tracked_fields(model):
+    """Model fields whose value decides which counters a row belongs to."""
+    metric, bucket_field, per_trainee = COUNTED_MODELS[model]
+    fields = []
+    if bucket_field:
+        fields.append(bucket_field)
+    if per_trainee:
+        fields.append('trainee_id')
+    return fields
+
+
+def counter_keys(model, values):
+    """Return the ``(metric, bucket, trainee_id)`` keys a row with ``values`` counts towards."""
+    metric, bucket_field, per_trainee = COUNTED_MODELS[model]
+    bucket = (values.get(bucket_field) or '') if bucket_field else ''
+    keys = [(metric, bucket, None)]
+    if per_trainee and values.get('trainee_id'):
+        keys.append((metric, bucket, values['trainee_id']))
+    return keys
+
+
+def instance_keys(instance):
+    model = type(instance)
+    return counter_keys(model, {f: getattr(instance, f) for f in tracked_fields(model)})
+
+
+def stored_keys(model, pk):
+    """Counter keys for the row as currently stored, or ``[]`` if it does not exist."""
+    fields = tracked_fields(model)
+    if not fields:
+        return counter_keys(model, {})
+    values = model.objects.filter(pk=pk).values(*fields).first()
+    if values is None:
+        return []
+    return counter_keys(model, values)
+
+
+def apply_deltas(deltas):
+    """Add each ``{key: delta}`` to its counter row.
+
+    Per-trainee counters that change by the same amount share one UPDATE, so a
+    bulk write touching hundreds of trainees costs a handful of queries.
+    Increments create missing rows; decrements only ever update existing rows so
+    that cascading deletes never resurrect counters for a deleted trainee.
+    """
+    per_trainee = defaultdict(list)
+    for (metric, bucket, trainee_id), delta in deltas.items():
+        if not delta:
+            continue
+        if trainee_id is not None:
+            per_trainee[(metric, bucket, delta)].append(trainee_id)
+            continue
+        rows = DashboardCounter.objects.filter(metric=metric, bucket=bucket, trainee__isnull=True)
+        if rows.update(value=F('value') + delta) or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                DashboardCounter.objects.create(metric=metric, bucket=bucket, trainee=None, value=delta)
+        except IntegrityError:
+            # A concurrent transaction created the row first.
+            rows.update(value=F('value') + delta)
+
+    for (metric, bucket, delta), trainee_ids in per_trainee.items():
+        if delta > 0:
+            # (metric, bucket, trainee) is unique, so this only adds the missing rows.
+            DashboardCounter.objects.bulk_create(
+                [DashboardCounter(metric=metric, bucket=bucket, trainee_id=t, value=0) for t in trainee_ids],
+                ignore_conflicts=True, batch_size=500,
+            )
+        DashboardCounter.objects.filter(metric=metric, bucket=bucket, trainee_id__in=trainee_ids).update(
+            value=F('value') + delta
+        )
+
+
+def key_deltas(old_keys, new_keys):
+    deltas = Counter(new_keys)
+    deltas.subtract(Counter(old_keys))
+    return deltas
+
+
+def rebuild_counters():
+    """Recompute every counter from the source tables and replace the stats table."""
+    rows = []
+    for model, (metric, bucket_field, per_trainee) in COUNTED_MODELS.items():
+        group_by = [f for f in (bucket_field, 'trainee_id' if per_trainee else None) if f]
+        if not group_by:
+            rows.append(DashboardCounter(metric=metric, value=model.objects.count()))
+            continue
+        totals = Counter()
+        for values in model.objects.values(*group_by).annotate(n=Count('pk')).order_by():
+            for key in counter_keys(model, values):
+                totals[key] += values['n']
+        rows.extend(
+            DashboardCounter(metric=m, bucket=b, trainee_id=t, value=n)
+            for (m, b, t), n in totals.items()
+        )
+    with transaction.atomic():
+        DashboardCounter.objects.all().delete()
+        DashboardCounter.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def _section(metric, counters):
+    buckets = {value: 0 for value, _ in BUCKET_CHOICES.get(metric, ())}
+    for bucket, value in counters.get(metric, {}).items():
+        if bucket:
+            buckets[bucket] = buckets.get(bucket, 0) + value
+    section = {'total': sum(counters.get(metric, {}).values())}
+    if metric in BUCKET_CHOICES:
+        section['by_role' if metric == 'users' else 'by_status'] = buckets
+    return section
+
+
+def dashboard_summary(user):
+    """Counts visible to ``user``, read from the stats table in a single query.
+
+    Scoping mirrors the list endpoints: trainees only see their own enrollments,
+    and non-staff users only see their own progress records.
+    """
+    role = getattr(user, 'role', '')
+    own_enrollments = role == 'trainee' and not user.is_staff
+    own_progress = not user.is_staff
+
+    global_counters, own_counters = {}, {}
+    rows = DashboardCounter.objects.filter(Q(trainee__isnull=True) | Q(trainee=user)).values_list(
+        'metric', 'bucket', 'trainee_id', 'value'
+    )
+    for metric, bucket, trainee_id, value in rows:
+        target = own_counters if trainee_id else global_counters
+        target.setdefault(metric, {})[bucket] = value
+
+    summary = {
+        'role': 'admin' if user.is_staff else role,
+        'programs': _section('programs', global_counters),
+        'batches': _section('batches', global_counters),
+        'batch_trainees': _section('batch_trainees', own_counters if own_enrollments else global_counters),
+        'progress_records': _section('progress_records', own_counters if own_progress else global_counters),
+        'classes': _section('classes', global_counters),
+    }
+    if user.is_staff:
+        summary['users'] = _section('users', global_counters)
+    return summary
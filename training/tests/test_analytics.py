@@ -0,0 +1,186 @@
+"""Vectorized cohort analytics checked against a naive per-row computation."""
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from training.analytics import ENROLLMENT_DTYPE, RECORD_DTYPE, compute_cohorts, load_columns
+from training.models import Batch, BatchTrainee, Program, ProgramTopic, ProgressRecord, User
+
+
+def naive_cohorts(data, threshold):
+    """The same statistics as ``compute_cohorts``, one row at a time."""
+    batch_program = dict(zip(data['batch_ids'].tolist(), data['batch_programs'].tolist()))
+    topics = list(zip(data['topic_ids'].tolist(), data['topic_programs'].tolist(), data['topic_hours'].tolist()))
+    weights = {}
+    for program in {p for _, p, _ in topics}:
+        own = [(topic, max(hours, 0)) for topic, p, hours in topics if p == program]
+        total = sum(hours for _, hours in own)
+        for topic, hours in own:
+            weights[topic] = hours / total if total > 0 else 1 / len(own)
+    topic_program = {topic: p for topic, p, _ in topics}
+
+    latest = {}
+    for batch, trainee, topic, pct in data['records'].tolist():
+        if batch in batch_program and topic_program.get(topic) == batch_program[batch]:
+            latest[batch, trainee, topic] = min(max(pct, 0), 100)
+    enrolled = sorted({(b, t) for b, t in data['enrollments'].tolist() if b in batch_program})
+    completion = {
+        (b, t): min(sum(weights[topic] * pct for (rb, rt, topic), pct in latest.items() if (rb, rt) == (b, t)), 100.0)
+        for b, t in enrolled
+    }
+
+    def stats(values):
+        return {
+            'trainees': len(values),
+            'mean': round(float(np.mean(values)), 2) if values else 0.0,
+            'p50': round(float(np.percentile(values, 50)), 2) if values else 0.0,
+            'p90': round(float(np.percentile(values, 90)), 2) if values else 0.0,
+            'completed': sum(v >= 100 for v in values),
+            'stragglers': sum(v < threshold for v in values),
+        }
+
+    batches = {}
+    for batch, program in batch_program.items():
+        members = sorted((c, t) for (b, t), c in completion.items() if b == batch)
+        batches[batch] = {**stats([c for c, _ in members]), 'program': program,
+                          'straggler_ids': [t for c, t in members if c < threshold]}
+    programs = {}
+    for program in set(batch_program.values()):
+        values = [c for (b, _), c in completion.items() if batch_program[b] == program]
+        programs[program] = {**stats(values), 'batches': sum(p == program for p in batch_program.values())}
+    topics_out = {}
+    for topic, program, _ in topics:
+        population = programs.get(program, {}).get('trainees', 0)
+        pcts = [pct for (b, t, rt), pct in latest.items() if rt == topic and (b, t) in completion]
+        topics_out[topic] = {
+            'trainees': population,
+            'completed': sum(p >= 100 for p in pcts),
+            'mean_completion': round(sum(pcts) / population, 2) if population else 0.0,
+        }
+    return batches, programs, topics_out
+
+
+class NaiveComparisonMixin:
+    def assertMatchesNaive(self, data, threshold=50):
+        result = compute_cohorts(data, threshold)
+        batches, programs, topics = naive_cohorts(data, threshold)
+        self.assertEqual({row['batch'] for row in result['batches']}, set(batches))
+        for row in result['batches']:
+            self.assertRowEqual(row, batches[row['batch']], row['batch'])
+        self.assertEqual({row['program'] for row in result['programs']}, set(programs))
+        for row in result['programs']:
+            self.assertRowEqual(row, programs[row['program']], row['program'])
+        self.assertEqual({row['topic'] for row in result['topics']}, set(topics))
+        for row in result['topics']:
+            self.assertRowEqual(row, topics[row['topic']], row['topic'])
+        # Best cohorts first.
+        for rows, key in ((result['batches'], 'batch'), (result['programs'], 'program')):
+            self.assertEqual(rows, sorted(rows, key=lambda row: (-row['mean'], row[key])))
+        return result
+
+    def assertRowEqual(self, row, expected, msg):
+        for key, value in expected.items():
+            if isinstance(value, float):
+                self.assertAlmostEqual(row[key], value, delta=0.011, msg=(msg, key))
+            else:
+                self.assertEqual(row[key], value, (msg, key))
+
+
+class CohortAnalyticsTests(NaiveComparisonMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.python = Program.objects.create(name='Python')
+        self.basics = ProgramTopic.objects.create(program=self.python, topic_name='Basics', estimated_hours=1)
+        self.django = ProgramTopic.objects.create(program=self.python, topic_name='Django', estimated_hours=3)
+        self.batch = Batch.objects.create(name='Python 1', program=self.python)
+        self.ann, self.bob, self.cat, self.dan = (
+            User.objects.create_user(f'cohort-{name}', f'{name}@example.com', 'pw', role='trainee')
+            for name in ('ann', 'bob', 'cat', 'dan')
+        )
+        for trainee, status in ((self.ann, 'enrolled'), (self.bob, 'enrolled'), (self.cat, 'waitlisted'), (self.dan, 'dropped')):
+            BatchTrainee.objects.create(batch=self.batch, trainee=trainee, status=status)
+
+    def record(self, trainee, topic, pct):
+        return ProgressRecord.objects.create(trainee=trainee, batch=self.batch, topic=topic, completion_percentage=pct)
+
+    def test_population_superseded_records_and_percentiles(self):
+        self.record(self.ann, self.basics, 40)
+        self.record(self.ann, self.django, 50)
+        self.record(self.ann, self.basics, 100)  # supersedes the 40
+        self.record(self.cat, self.basics, 100)
+        self.record(self.dan, self.django, 100)
+        result = self.assertMatchesNaive(load_columns())
+
+        batch, = result['batches']
+        # Ann: 1/4 * 100 + 3/4 * 50; Bob is enrolled with no records and counts as 0%.
+        self.assertEqual(batch['trainees'], 2)
+        self.assertEqual(batch['mean'], 31.25)
+        self.assertEqual(batch['p50'], round(float(np.percentile([0, 62.5], 50)), 2))
+        self.assertEqual(batch['p90'], round(float(np.percentile([0, 62.5], 90)), 2))
+        self.assertEqual((batch['completed'], batch['stragglers'], batch['straggler_ids']), (0, 1, [self.bob.pk]))
+        topics = {row['topic']: row for row in result['topics']}
+        self.assertEqual((topics[self.basics.pk]['completed'], topics[self.basics.pk]['completion_rate']), (1, 50.0))
+        self.assertEqual(topics[self.django.pk]['mean_completion'], 25.0)
+
+    def test_program_scope_and_foreign_topics(self):
+        java = Program.objects.create(name='Java')
+        streams = ProgramTopic.objects.create(program=java, topic_name='Streams', estimated_hours=2)
+        other = Batch.objects.create(name='Java 1', program=java)
+        BatchTrainee.objects.create(batch=other, trainee=self.ann)
+        ProgressRecord.objects.create(trainee=self.ann, batch=other, topic=streams, completion_percentage=100)
+        self.record(self.ann, streams, 100)  # a topic from another program does not count in this batch
+
+        result = self.assertMatchesNaive(load_columns())
+        self.assertEqual([row['program'] for row in result['programs']], [java.pk, self.python.pk])
+        scoped = self.assertMatchesNaive(load_columns(self.python.pk))
+        self.assertEqual([row['batch'] for row in scoped['batches']], [self.batch.pk])
+        self.assertEqual(scoped['batches'][0]['mean'], 0.0)
+
+    def test_endpoint(self):
+        admin = User.objects.create_superuser('cohort-admin', 'c@example.com', 'pw', role='admin')
+        self.client.force_login(admin)
+        self.record(self.ann, self.django, 100)
+        response = self.client.get('/api/analytics/cohorts/', {'program': self.python.pk, 'threshold': 80})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['batches'][0]['stragglers'], 2)
+
+
+class RandomCohortTests(NaiveComparisonMixin, SimpleTestCase):
+    def random_data(self, rng, programs=3, batches=6, topics=9, trainees=30, records=400):
+        program_ids = np.arange(1, programs + 1)
+        batch_ids = rng.permutation(np.arange(10, 10 + batches * 3, 3))
+        topic_ids = rng.permutation(np.arange(100, 100 + topics))
+        topic_hours = rng.integers(-1, 6, topics).astype('f8')
+        topic_programs = rng.choice(program_ids, topics)
+        topic_hours[topic_programs == program_ids[0]] = 0  # weighs its topics equally
+        enrollments = np.zeros(trainees * 2, dtype=ENROLLMENT_DTYPE)
+        enrollments['batch'] = rng.choice(batch_ids, len(enrollments))  # repeats are collapsed
+        enrollments['trainee'] = rng.integers(1, trainees + 1, len(enrollments))
+        rows = np.zeros(records, dtype=RECORD_DTYPE)
+        rows['batch'] = rng.choice(np.append(batch_ids, 999), records)
+        rows['trainee'] = rng.integers(1, trainees + 5, records)
+        rows['topic'] = rng.choice(np.append(topic_ids, 998), records)
+        rows['pct'] = rng.integers(-10, 111, records)
+        return {
+            'records': rows,
+            'enrollments': enrollments,
+            'batch_ids': batch_ids,
+            'batch_programs': rng.choice(program_ids, batches),
+            'batch_names': [f'batch {b}' for b in batch_ids],
+            'topic_ids': topic_ids,
+            'topic_programs': topic_programs,
+            'topic_hours': topic_hours,
+            'topic_names': [f'topic {t}' for t in topic_ids],
+            'program_names': {int(p): f'program {p}' for p in program_ids},
+        }
+
+    def test_random_cohorts_match_naive_computation(self):
+        rng = np.random.default_rng(2024)
+        for threshold in (0, 50, 100):
+            self.assertMatchesNaive(self.random_data(rng), threshold)
+
+    def test_empty_data(self):
+        data = self.random_data(np.random.default_rng(1), records=0)
+        data['enrollments'] = data['enrollments'][:0]
+        result = self.assertMatchesNaive(data)
+        self.assertTrue(all(row['trainees'] == 0 and row['p90'] == 0 for row in result['batches']))
@@ -0,0 +1,99 @@
+"""Audit log writer modes and the per-request buffer."""
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from training.audit import AuditSink
+from training.middleware import AuditBufferMiddleware
+from training.models import AuditLog
+
+
+def record(sink, n, action='test'):
+    for i in range(n):
+        sink.record(action=action, table_name='training_program', record_id=i)
+
+
+class BufferedAuditTests(TestCase):
+    def setUp(self):
+        self.sink = AuditSink(mode='buffered', max_buffer=10)
+
+    def test_committed_entries_are_written_in_one_batch_when_the_scope_ends(self):
+        with self.sink.buffered():
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    record(self.sink, 3)
+                    self.assertEqual(self.sink._local.buffer, [])
+            self.assertFalse(AuditLog.objects.exists())
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.sink.flush(), 3)
+            self.assertEqual(sum('INSERT INTO "training_auditlog"' in q['sql'] for q in queries), 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                record(self.sink, 2)
+        self.assertEqual(AuditLog.objects.count(), 5)
+
+    def test_rolled_back_entries_are_discarded(self):
+        with self.sink.buffered():
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        record(self.sink, 3, action='rolled back')
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                with transaction.atomic():
+                    record(self.sink, 1, action='kept')
+        self.assertEqual(list(AuditLog.objects.values_list('action', flat=True)), ['kept'])
+
+    def test_full_buffer_flushes_early(self):
+        with self.sink.buffered():
+            with self.captureOnCommitCallbacks(execute=True):
+                record(self.sink, 12)
+            self.assertEqual(AuditLog.objects.count(), 10)
+        self.assertEqual(AuditLog.objects.count(), 12)
+
+    def test_middleware_writes_after_the_response(self):
+        seen = []
+
+        def view(request):
+            with self.captureOnCommitCallbacks(execute=True):
+                record(self.sink, 2)
+            seen.append(AuditLog.objects.count())
+            return HttpResponse()
+
+        with mock.patch('training.middleware.audit_sink', self.sink):
+            AuditBufferMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual((seen, AuditLog.objects.count()), ([0], 2))
+
+    def test_sync_mode_writes_inside_the_transaction(self):
+        sink = AuditSink(mode='sync')
+        with transaction.atomic():
+            record(sink, 1)
+            self.assertEqual(AuditLog.objects.count(), 1)
+
+
+class BackgroundAuditTests(TransactionTestCase):
+    def test_shutdown_drains_the_queue(self):
+        # A long interval keeps the entries in the thread's hands until shutdown.
+        sink = AuditSink(mode='background', flush_interval=30, max_buffer=100)
+        record(sink, 3)
+        worker = sink._worker
+        self.assertTrue(worker.is_alive())
+        self.assertEqual(sink.shutdown(timeout=5), 0)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+        # Entries recorded after shutdown start a new thread, and a second shutdown writes them too.
+        record(sink, 2)
+        sink.shutdown(timeout=5)
+        self.assertEqual(AuditLog.objects.count(), 5)
+
+    def test_bench_audit_covers_every_mode(self):
+        out = StringIO()
+        call_command('bench_audit', entries=40, per_request=10, stdout=out)
+        self.assertIn('background, drained', out.getvalue())
+        self.assertFalse(AuditLog.objects.filter(action='bench').exists())
@@ -0,0 +1,102 @@
+"""Monthly audit log archives and the timeline that reads across them."""
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from training.audit_archive import AuditTimeline, MonthArchive, archive_older_than, months
+from training.models import AuditLog, User
+
+MARCH = datetime(2025, 3, 31, 23, 0, tzinfo=timezone.utc)
+APRIL = datetime(2025, 4, 1, 1, 0, tzinfo=timezone.utc)
+NEWEST_FIRST = ('-created_at', '-id')
+
+
+class AuditArchiveTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.root = self.directory.name
+        settings_override = override_settings(AUDIT_ARCHIVE_DIR=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        AuditLog.objects.all().delete()
+        for i in range(5):
+            for start in (MARCH, APRIL):
+                log = AuditLog.objects.create(action=f'old {i}', table_name='training_batch', record_id=i,
+                                              new_values={'name': f'Batch {i}', 'n': i})
+                # Pairs of rows share a timestamp, so the id breaks ties.
+                AuditLog.objects.filter(pk=log.pk).update(created_at=start + timedelta(microseconds=i // 2))
+        self.recent = AuditLog.objects.create(action='recent')
+        self.old = list(AuditLog.objects.exclude(pk=self.recent.pk).order_by(*NEWEST_FIRST).values_list('id', 'action', 'new_values'))
+        self.april_ids, self.march_ids = [row[0] for row in self.old[:5]], [row[0] for row in self.old[5:]]
+
+    def archive(self):
+        out = StringIO()
+        call_command('archive_audit_logs', days=30, block_rows=2, stdout=out)
+        return out.getvalue()
+
+    def test_month_round_trip(self):
+        self.assertIn('Archived 10 and deleted 10 audit rows', self.archive())
+        self.assertEqual(list(AuditLog.objects.values_list('pk', flat=True)), [self.recent.pk])
+        self.assertEqual(months(self.root), ['2025-03', '2025-04'])
+
+        march = MonthArchive(self.root, '2025-03')
+        self.assertEqual([block['rows'] for block in march.index['blocks']], [2, 2, 1])
+        self.assertEqual(march.last_key, (MARCH + timedelta(microseconds=2), self.march_ids[0]))
+        # The concatenated gzip members read back as one NDJSON file, oldest first.
+        with gzip.open(march.data_path, 'rt', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([row['id'] for row in rows], self.march_ids[::-1])
+        self.assertEqual(rows[0]['new_values'], {'name': 'Batch 0', 'n': 0})
+
+        timeline = AuditTimeline(AuditLog.objects.order_by(*NEWEST_FIRST), root=self.root)
+        self.assertEqual(len(timeline), 11)
+        rows = timeline[0:11]
+        self.assertEqual(rows[0].pk, self.recent.pk)
+        self.assertEqual([(row.id, row.action, row.new_values) for row in rows[1:]], self.old)
+        self.assertEqual([row.id for row in timeline[3:8]], [row.id for row in rows[3:8]])
+        self.assertEqual(timeline[10].id, self.old[-1][0])
+
+        # A range inside one month only reads the blocks it overlaps.
+        start, end = APRIL, APRIL + timedelta(microseconds=2)
+        live = AuditLog.objects.filter(created_at__gte=start, created_at__lt=end).order_by(*NEWEST_FIRST)
+        april = AuditTimeline(live, start, end, root=self.root)
+        self.assertEqual([row.id for row in april[0:10]], self.april_ids[1:])
+        self.assertEqual(len(april._decoded), 2)  # not the newest April block nor any March one
+
+    def test_failed_archive_write_deletes_nothing(self):
+        with mock.patch.object(MonthArchive, 'append', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.archive()
+        self.assertEqual(AuditLog.objects.count(), 11)
+
+    def test_rows_archived_by_an_interrupted_run_are_not_archived_twice(self):
+        # The first month was written, but the run died before deleting its rows.
+        march_rows = list(AuditLog.objects.filter(created_at__lt=APRIL).order_by('created_at', 'id').values(
+            'id', 'created_at', 'user_id', 'action', 'table_name', 'record_id', 'old_values', 'new_values', 'ip_address', 'user_agent'))
+        MonthArchive(self.root, '2025-03').append(march_rows)
+        result = archive_older_than(APRIL + timedelta(days=1), root=self.root)
+        self.assertEqual((result['archived'], result['deleted']), (5, 10))
+        timeline = AuditTimeline(AuditLog.objects.order_by(*NEWEST_FIRST), root=self.root)
+        self.assertEqual([row.id for row in timeline[0:20]], [self.recent.pk] + self.april_ids + self.march_ids)
+
+    def test_endpoint_serves_archived_rows_in_a_time_range(self):
+        self.archive()
+        admin = User.objects.create_superuser('archive-admin', 'a@example.com', 'pw', role='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get('/api/audit-logs/', {'created_after': '2025-01-01', 'ordering': 'id'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 11)
+        # ?ordering= cannot put the live rows out of step with the archives.
+        self.assertEqual([row['id'] for row in response.data['results']], [self.recent.pk] + self.april_ids + self.march_ids)
+        response = client.get('/api/audit-logs/', {'created_after': '2025-04-01', 'created_before': '2025-05-01'})
+        self.assertEqual([row['id'] for row in response.data['results']], self.april_ids)
@@ -0,0 +1,97 @@
+"""The in-process cache of JWT-authenticated users."""
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from training.authentication import UserCache, user_cache
+from training.models import User
+
+URL = '/api/dashboard/summary/'
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create_user('jwt-user', 'j@example.com', 'old-secret', role='trainee')
+        self.client = self.client_with(AccessToken.for_user(self.user))
+
+    def client_with(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def test_repeat_requests_hit_the_cache(self):
+        self.assertEqual(self.client.get(URL).status_code, 200)
+        hits = user_cache.hits
+        with self.assertNumQueries(1):  # the counters, not the user row
+            self.assertEqual(self.client.get(URL).status_code, 200)
+        self.assertEqual(user_cache.hits, hits + 1)
+
+    def test_edits_invalidate_the_cached_user(self):
+        self.assertEqual(self.client.get(URL).data['role'], 'trainee')
+        self.user.role = 'trainer'
+        self.user.save()
+        self.assertEqual(self.client.get(URL).data['role'], 'trainer')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(URL).status_code, 401)
+
+    def test_a_request_cannot_change_the_cached_copy(self):
+        self.client.get(URL)
+        cached = user_cache.get(self.user.pk, None)
+        cached.role = 'admin'
+        self.assertEqual(self.client.get(URL).data['role'], 'trainee')
+
+    def test_password_change_invalidates_the_cached_user(self):
+        # simplejwt modules keep their own reference to api_settings, so patch it rather than override SIMPLE_JWT.
+        with mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True):
+            client = self.client_with(AccessToken.for_user(self.user))
+            self.assertEqual(client.get(URL).status_code, 200)
+            invalidations = user_cache.invalidations
+            self.user.set_password('new-secret')
+            self.user.save()
+            self.assertEqual(user_cache.invalidations, invalidations + 1)
+            self.assertEqual(client.get(URL).status_code, 401)
+            fresh = self.client_with(AccessToken.for_user(self.user))
+            self.assertEqual(fresh.get(URL).status_code, 200)
+
+    def test_without_revoke_claim_setting(self):
+        # Older simplejwt releases have no REVOKE_TOKEN_CLAIM setting.
+        with mock.patch.object(api_settings, 'REVOKE_TOKEN_CLAIM', None):
+            self.assertEqual(self.client.get(URL).status_code, 200)
+            hits = user_cache.hits
+            self.assertEqual(self.client.get(URL).status_code, 200)
+            self.assertEqual(user_cache.hits, hits + 1)
+
+
+class UserCacheTests(SimpleTestCase):
+    def test_lru_bound(self):
+        users = UserCache(max_size=2, ttl=60)
+        for user_id in (1, 2):
+            users.set(user_id, None, f'user {user_id}')
+        users.get(1, None)  # 1 is now the most recently used
+        users.set(3, None, 'user 3')
+        self.assertEqual(users.stats()['size'], 2)
+        self.assertIsNone(users.get(2, None))
+        self.assertEqual((users.get(1, None), users.get('3', None)), ('user 1', 'user 3'))
+        for user_id in range(10, 20):
+            users.set(user_id, None, user_id)
+        self.assertEqual(users.stats()['size'], 2)
+
+    def test_versions_expiry_and_epoch(self):
+        users = UserCache(max_size=10, ttl=60)
+        users.set(1, 'v1', 'user')
+        self.assertIsNone(users.get(1, 'v2'))
+        with mock.patch('training.authentication.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(users.get(1, 'v1'))
+
+        # A row read before an invalidation is not cached after it.
+        epoch = users.epoch
+        users.invalidate(2)
+        users.set(2, None, 'stale', epoch)
+        self.assertIsNone(users.get(2, None))
@@ -0,0 +1,53 @@
+"""The seed_scale data generator and the bench_api report."""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from training import search
+from training.models import (
+    AuditLog, BatchTrainee, ClassSlot, ComplianceStatus, Program, ProgressRecord, TraineeProgressRollup, User,
+)
+
+
+class SeedAndBenchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command(
+            'seed_scale', trainees=30, trainers=3, designations=2, programs=4, topics=3, batches=2, batch_size=5,
+            classes=6, audit_rows=48, prefix='t', stdout=StringIO(),
+        )
+
+    def test_seed_scale_fills_source_and_derived_tables(self):
+        self.assertEqual(User.objects.filter(username__startswith='t-').count(), 33)
+        self.assertEqual(BatchTrainee.objects.count(), 40)
+        self.assertTrue(ProgressRecord.objects.exists())
+        self.assertEqual(AuditLog.objects.dates('created_at', 'month').count(), 12)
+        self.assertEqual(ClassSlot.objects.values('klass').distinct().count(), 6)
+        self.assertEqual(TraineeProgressRollup.objects.count(), ProgressRecord.objects.values('batch', 'trainee').distinct().count())
+        self.assertTrue(ComplianceStatus.objects.exists())
+        program = Program.objects.first()
+        self.assertIn(program.pk, search.search(Program, program.name.split()[0]))
+
+    def test_bench_api_writes_a_report(self):
+        User.objects.create_superuser('bench-admin', 'b@example.com', 'pw', role='admin')
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command('bench_api', requests=3, concurrency=1, warmup=0, only=['programtopic'], output=output, stdout=StringIO())
+            with open(output, encoding='utf-8') as handle:
+                report = json.load(handle)
+            stdout = StringIO()
+            call_command('bench_api', requests=3, concurrency=1, warmup=0, only=['programtopic'], output=output, compare=output, stdout=stdout)
+        self.assertEqual({(e['basename'], e['action']) for e in report['endpoints']},
+                         {('programtopic', 'list'), ('programtopic', 'retrieve')})
+        self.assertEqual(report['summary']['requests'], 6)
+        self.assertEqual(report['summary']['errors'], 0)
+        for endpoint in report['endpoints']:
+            self.assertLessEqual(endpoint['p50_ms'], endpoint['p95_ms'])
+            self.assertLessEqual(endpoint['p95_ms'], endpoint['p99_ms'])
+            self.assertGreater(endpoint['queries'], 0)
+        self.assertIn('Compared with', stdout.getvalue())
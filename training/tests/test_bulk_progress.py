@@ -0,0 +1,125 @@
+"""Bulk progress upsert at /api/progress-records/bulk/."""
+import threading
+
+from django.core.cache import cache
+from django.db import OperationalError, close_old_connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from training import bulk
+from training.models import (
+    AuditLog, Batch, DashboardCounter, Program, ProgramTopic, ProgressRecord, TraineeProgressRollup, User,
+)
+
+URL = '/api/progress-records/bulk/'
+
+
+class BulkProgressTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('bulk-admin', 'b@example.com', 'pw', role='admin')
+        self.ann = User.objects.create_user('bulk-ann', 'ann@example.com', 'pw', role='trainee')
+        self.bob = User.objects.create_user('bulk-bob', 'bob@example.com', 'pw', role='trainee')
+        program = Program.objects.create(name='Python')
+        self.basics = ProgramTopic.objects.create(program=program, topic_name='Basics', estimated_hours=1)
+        self.django = ProgramTopic.objects.create(program=program, topic_name='Django', estimated_hours=3)
+        self.batch = Batch.objects.create(name='Python 1', program=program)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def row(self, trainee, topic, pct, **extra):
+        return {'trainee': trainee.pk, 'batch': self.batch.pk, 'topic': topic.pk, 'status': 'in_progress',
+                'completion_percentage': pct, **extra}
+
+    def test_inserts_then_updates_by_key(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(URL, [self.row(self.ann, self.basics, 100), self.row(self.ann, self.django, 0)], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((len(response.data['created']), response.data['updated']), (2, []))
+        self.assertEqual(TraineeProgressRollup.objects.get(trainee=self.ann).completion, 25)
+
+        existing = ProgressRecord.objects.get(topic=self.django).pk
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(URL, {'records': [self.row(self.ann, self.django, 100, status='completed', notes='done')]}, format='json')
+        self.assertEqual((response.data['created'], response.data['updated']), ([], [existing]))
+        record = ProgressRecord.objects.get(pk=existing)
+        self.assertEqual((record.status, record.notes, record.updated_by), ('completed', 'done', self.admin))
+        self.assertEqual(ProgressRecord.objects.count(), 2)
+        self.assertEqual(TraineeProgressRollup.objects.get(trainee=self.ann).completion, 100)
+        counters = dict(DashboardCounter.objects.filter(metric='progress_records', trainee=None).values_list('bucket', 'value'))
+        self.assertEqual((counters['in_progress'], counters['completed']), (1, 1))
+        self.assertEqual(AuditLog.objects.filter(action='update_progress', record_id=existing).count(), 1)
+
+    def test_invalid_rows_write_nothing(self):
+        response = self.client.post(URL, [
+            self.row(self.ann, self.basics, 10),
+            self.row(self.ann, self.basics, 20),
+            {**self.row(self.ann, self.django, 10), 'batch': 999999},
+            {**self.row(self.bob, self.django, 10), 'completion_percentage': 101},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProgressRecord.objects.exists())
+
+        response = self.client.post(URL, [
+            self.row(self.ann, self.basics, 10), self.row(self.ann, self.basics, 20),
+            {**self.row(self.ann, self.django, 10), 'batch': 999999},
+        ], format='json')
+        self.assertEqual([sorted(e) for e in response.data['errors']], [[], ['non_field_errors'], ['batch']])
+        self.assertFalse(ProgressRecord.objects.exists())
+
+        self.assertEqual(self.client.post(URL, [], format='json').status_code, 400)
+        self.assertEqual(self.client.post(URL, {'records': 'x'}, format='json').status_code, 400)
+
+    def test_trainees_only_write_their_own_rows(self):
+        client = APIClient()
+        client.force_authenticate(self.ann)
+        response = client.post(URL, [self.row(self.bob, self.basics, 50)], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ProgressRecord.objects.get().trainee, self.ann)
+
+        # Non-staff trainers cannot update another trainee's record either.
+        trainer = User.objects.create_user('bulk-trainer', 't@example.com', 'pw', role='trainer')
+        client.force_authenticate(trainer)
+        response = client.post(URL, [self.row(self.ann, self.basics, 60)], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('permission', str(response.data['errors'][0]))
+        self.assertEqual(ProgressRecord.objects.get().completion_percentage, 50)
+
+
+# Audit rows are written inside the upserting transaction, so the retry below covers them.
+@override_settings(AUDIT_LOG_MODE='sync')
+class ConcurrentUpsertTests(TransactionTestCase):
+    def test_parallel_upserts_of_one_key_insert_it_once(self):
+        admin = User.objects.create_superuser('race-admin', 'r@example.com', 'pw', role='admin')
+        trainee = User.objects.create_user('race-trainee', 't@example.com', 'pw', role='trainee')
+        program = Program.objects.create(name='Race')
+        topic = ProgramTopic.objects.create(program=program, topic_name='Basics')
+        batch = Batch.objects.create(name='Race 1', program=program)
+        rows = [{'trainee': trainee.pk, 'batch': batch.pk, 'topic': topic.pk, 'status': 'in_progress', 'completion_percentage': pct}
+                for pct in range(0, 80, 10)]
+        results, barrier = [], threading.Barrier(len(rows))
+
+        def upsert(row):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        results.append(bulk.upsert_progress([dict(row)], admin))
+                        return
+                    except OperationalError as exc:
+                        # The in-memory test database fails a locked table at once.
+                        if 'locked' not in str(exc):
+                            raise
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=upsert, args=(row,)) for row in rows]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), len(rows))
+        self.assertEqual(sum(len(created) for _, created, _ in results), 1)
+        self.assertEqual(ProgressRecord.objects.filter(trainee=trainee, batch=batch, topic=topic).count(), 1)
+        self.assertEqual(DashboardCounter.objects.get(metric='progress_records', bucket='in_progress', trainee=None).value, 1)
@@ -0,0 +1,160 @@
+"""Table version counters and conditional GET on list/detail endpoints."""
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from training.caching import table_versions
+from training.models import AuditLog, Batch, BatchTrainee, Program, ProgramTopic, ProgressRecord, User
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('etag-admin', 'e@example.com', 'pw', role='admin')
+        self.trainee = User.objects.create_user('etag-trainee', 't@example.com', 'pw', role='trainee')
+        self.program = Program.objects.create(name='Python')
+        self.batch = Batch.objects.create(name='Python 1', program=self.program)
+        BatchTrainee.objects.create(batch=self.batch, trainee=self.trainee)
+        self.client = self.client_for(self.admin)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def get(self, url, etag=None, client=None):
+        headers = {'HTTP_ACCEPT': 'application/json'}
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        with CaptureQueriesContext(connection) as queries:
+            response = (client or self.client).get(url, **headers)
+        return response, len(queries)
+
+    def test_unchanged_list_and_detail_answer_304_after_one_query(self):
+        for url in ('/api/batch-trainees/', f'/api/batches/{self.batch.pk}/'):
+            response, _ = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['ETag'].startswith('W/"'))
+            self.assertEqual(response['Cache-Control'], 'private, no-cache')
+            cached, queries = self.get(url, response['ETag'])
+            self.assertEqual(cached.status_code, 304)
+            self.assertEqual(cached.content, b'')
+            self.assertEqual(cached['ETag'], response['ETag'])
+            self.assertEqual(queries, 1)
+
+    def test_writes_change_the_etag(self):
+        etag = self.get('/api/batch-trainees/')[0]['ETag']
+        BatchTrainee.objects.update(status='in_progress')  # no signals: the ETag is unchanged
+        self.assertEqual(self.get('/api/batch-trainees/', etag)[0].status_code, 304)
+        enrollment = BatchTrainee.objects.get()
+        enrollment.save()
+        response, _ = self.get('/api/batch-trainees/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['status'], 'in_progress')
+
+    def test_expanded_tables_are_part_of_the_etag(self):
+        plain = self.get('/api/batch-trainees/')[0]['ETag']
+        expanded = self.get('/api/batch-trainees/?expand=batch')[0]['ETag']
+        self.batch.name = 'Python 1b'
+        self.batch.save()
+        self.assertEqual(self.get('/api/batch-trainees/', plain)[0].status_code, 304)
+        self.assertEqual(self.get('/api/batch-trainees/?expand=batch', expanded)[0].status_code, 200)
+
+    def test_etag_is_scoped_to_the_user(self):
+        admin = self.get('/api/batch-trainees/')[0]['ETag']
+        trainee = self.client_for(self.trainee)
+        response, _ = self.get('/api/batch-trainees/', admin, client=trainee)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], admin)
+        # Permissions are checked before the ETag.
+        self.assertEqual(self.get('/api/batches/', admin, client=trainee)[0].status_code, 403)
+
+    def test_role_changes_change_the_etag(self):
+        etag = self.get('/api/batch-trainees/', client=self.client_for(self.trainee))[0]['ETag']
+        self.trainee.role = 'trainer'
+        self.trainee.save()
+        # The enrollment table did not change, but a trainer sees every enrollment.
+        response, _ = self.get('/api/batch-trainees/', etag, client=self.client_for(User.objects.get(pk=self.trainee.pk)))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.trainee.is_staff = True
+        self.trainee.save()
+        self.assertNotEqual(self.get('/api/batch-trainees/', response['ETag'], client=self.client_for(self.trainee))[0].status_code, 304)
+
+    def test_bulk_writes_and_set_null_bump_versions(self):
+        record = ProgressRecord.objects.create(trainee=self.trainee, batch=self.batch, updated_by=self.admin)
+        before = table_versions(ProgressRecord)
+        response = self.client.post('/api/progress-records/bulk/', [
+            {'trainee': self.trainee.pk, 'batch': self.batch.pk, 'status': 'completed', 'completion_percentage': 100},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(table_versions(ProgressRecord), before)
+
+        editor = User.objects.create_user('etag-editor', 'x@example.com', 'pw', role='trainer')
+        ProgressRecord.objects.filter(pk=record.pk).update(updated_by=editor)
+        before = table_versions(ProgressRecord)
+        editor.delete()  # SET_NULL on updated_by rewrites progress rows without signals
+        self.assertNotEqual(table_versions(ProgressRecord), before)
+
+    def test_audit_writes_bump_audit_log(self):
+        etag = self.get('/api/audit-logs/')[0]['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/programs/', {'name': 'Go'}, format='json')
+        self.assertTrue(AuditLog.objects.exists())
+        self.assertEqual(self.get('/api/audit-logs/', etag)[0].status_code, 200)
+
+    def test_program_catalog_is_shared_between_admins(self):
+        etag = self.get('/api/programs/')[0]['ETag']
+        other = User.objects.create_superuser('etag-admin2', 'a2@example.com', 'pw', role='admin')
+        self.assertEqual(self.get('/api/programs/', etag, client=self.client_for(other))[0].status_code, 304)
+        self.program.topics.create(topic_name='Basics', topic_order=1)
+        response, _ = self.get('/api/programs/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results'][0]['topics']), 1)
+
+
+class ProgramTreeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('tree-admin', 't@example.com', 'pw', role='admin')
+        self.program = Program.objects.create(name='Python')
+        self.other = Program.objects.create(name='Java')
+        self.topic = self.program.topics.create(topic_name='Basics', topic_order=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def topics(self, program=None):
+        """Topic names of ``program`` in the list and the detail response."""
+        program = program or self.program
+        listed = next(p for p in self.client.get('/api/programs/').data['results'] if p['id'] == program.pk)
+        detail = self.client.get(f'/api/programs/{program.pk}/').data
+        self.assertEqual(listed['topics'], detail['topics'])
+        return [topic['topic_name'] for topic in detail['topics']]
+
+    def test_cached_trees_are_served_without_reading_topics(self):
+        self.topics()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.topics(), ['Basics'])
+        self.assertFalse(any('FROM "training_programtopic"' in q['sql'] for q in queries))
+
+    def test_topic_changes_invalidate_the_tree(self):
+        self.assertEqual(self.topics(), ['Basics'])
+        self.topic.topic_name = 'Syntax'
+        self.topic.save()
+        self.assertEqual(self.topics(), ['Syntax'])
+
+        response = self.client.post('/api/program-topics/', {'program': self.program.pk, 'topic_name': 'Django', 'topic_order': 2})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.topics(), ['Syntax', 'Django'])
+
+        self.topic.delete()
+        self.assertEqual(self.topics(), ['Django'])
+
+        # Moving a topic changes both trees.
+        self.assertEqual(self.topics(self.other), [])
+        moved = ProgramTopic.objects.get(topic_name='Django')
+        moved.program = self.other
+        moved.save()
+        self.assertEqual((self.topics(), self.topics(self.other)), ([], ['Django']))
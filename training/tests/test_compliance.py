@@ -0,0 +1,121 @@
+"""Designation compliance matrix kept current by signals."""
+from datetime import date
+from importlib import import_module
+
+from django.apps import apps
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from training import compliance
+from training.models import (
+    Batch, BatchTrainee, ComplianceStatus, Designation, DesignationProgram, Program, TraineeDesignation, User,
+)
+
+
+class ComplianceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('compliance-admin', 'c@example.com', 'pw', role='admin')
+        self.ann = User.objects.create_user('ann', 'ann@example.com', 'pw', role='trainee')
+        self.bob = User.objects.create_user('bob', 'bob@example.com', 'pw', role='trainee')
+        self.safety = Program.objects.create(name='Safety')
+        self.python = Program.objects.create(name='Python')
+        self.elective = Program.objects.create(name='Elective')
+        self.engineer = Designation.objects.create(name='Engineer')
+        DesignationProgram.objects.create(designation=self.engineer, program=self.safety, is_required=True)
+        DesignationProgram.objects.create(designation=self.engineer, program=self.python, is_required=True)
+        DesignationProgram.objects.create(designation=self.engineer, program=self.elective, is_required=False)
+        self.safety_batch = Batch.objects.create(name='Safety 1', program=self.safety)
+        self.python_batch = Batch.objects.create(name='Python 1', program=self.python)
+        for trainee in (self.ann, self.bob):
+            TraineeDesignation.objects.create(trainee=trainee, designation=self.engineer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def statuses(self, trainee):
+        return dict(ComplianceStatus.objects.filter(trainee=trainee).values_list('program__name', 'status'))
+
+    def test_matrix_follows_enrollments(self):
+        self.assertEqual(self.statuses(self.ann), {'Safety': 'missing', 'Python': 'missing'})
+        enrollment = BatchTrainee.objects.create(batch=self.safety_batch, trainee=self.ann)
+        self.assertEqual(self.statuses(self.ann)['Safety'], 'in_progress')
+        enrollment.status = 'completed'
+        enrollment.completion_date = date(2026, 1, 5)
+        enrollment.save()
+        self.assertEqual(self.statuses(self.ann)['Safety'], 'completed')
+        enrollment.status = 'dropped'
+        enrollment.save()
+        self.assertEqual(self.statuses(self.ann)['Safety'], 'missing')
+        enrollment.delete()
+        self.assertEqual(self.statuses(self.ann)['Safety'], 'missing')
+
+    def test_matrix_follows_requirements_and_designations(self):
+        requirement = DesignationProgram.objects.get(program=self.python)
+        requirement.is_required = False
+        requirement.save()
+        self.assertEqual(self.statuses(self.bob), {'Safety': 'missing'})
+        self.engineer.is_active = False
+        self.engineer.save()
+        self.assertEqual(self.statuses(self.bob), {})
+        self.engineer.is_active = True
+        self.engineer.save()
+        TraineeDesignation.objects.filter(trainee=self.bob).get().delete()
+        self.assertEqual(self.statuses(self.bob), {})
+        self.assertEqual(self.statuses(self.ann), {'Safety': 'missing'})
+
+    def test_deletes_cascade_cleanly(self):
+        BatchTrainee.objects.create(batch=self.safety_batch, trainee=self.ann)
+        self.ann.delete()
+        self.safety.delete()
+        self.assertEqual(self.statuses(self.bob), {'Python': 'missing'})
+        self.engineer.delete()
+        self.assertFalse(ComplianceStatus.objects.exists())
+
+    def test_rebuild_matches_incremental_rows(self):
+        BatchTrainee.objects.create(batch=self.safety_batch, trainee=self.ann, status='completed')
+        BatchTrainee.objects.create(batch=self.python_batch, trainee=self.bob)
+        incremental = set(ComplianceStatus.objects.values_list('trainee_id', 'designation_id', 'program_id', 'status'))
+        self.assertEqual(compliance.rebuild_compliance(), 4)
+        self.assertEqual(set(ComplianceStatus.objects.values_list('trainee_id', 'designation_id', 'program_id', 'status')), incremental)
+
+    def test_migration_backfills_existing_rows(self):
+        BatchTrainee.objects.create(batch=self.safety_batch, trainee=self.ann, status='completed', completion_date=date(2026, 1, 5))
+        BatchTrainee.objects.create(batch=self.python_batch, trainee=self.bob)
+        maintained = set(ComplianceStatus.objects.values_list('trainee_id', 'designation_id', 'program_id', 'status', 'completed_on'))
+        ComplianceStatus.objects.all().delete()
+        import_module('training.migrations.0012_compliancestatus').compute_existing_statuses(apps, None)
+        self.assertEqual(set(ComplianceStatus.objects.values_list('trainee_id', 'designation_id', 'program_id', 'status', 'completed_on')), maintained)
+
+    def test_endpoints(self):
+        BatchTrainee.objects.create(batch=self.safety_batch, trainee=self.ann, status='completed')
+        BatchTrainee.objects.create(batch=self.python_batch, trainee=self.ann, status='completed')
+        BatchTrainee.objects.create(batch=self.python_batch, trainee=self.bob)
+
+        summary = self.client.get('/api/compliance/').data['designations']
+        self.assertEqual(len(summary), 1)
+        self.assertEqual((summary[0]['trainees'], summary[0]['compliant_trainees'], summary[0]['compliance_rate']), (2, 1, 50.0))
+        self.assertEqual(
+            [(p['name'], p['completed'], p['in_progress'], p['missing']) for p in summary[0]['programs']],
+            [('Safety', 1, 0, 1), ('Python', 1, 1, 0)],
+        )
+        # Served from the cache until the matrix changes.
+        with self.assertNumQueries(1):
+            self.client.get('/api/compliance/')
+
+        matrix = self.client.get(f'/api/compliance/?designation={self.engineer.pk}').data
+        self.assertEqual([p['name'] for p in matrix['programs']], ['Safety', 'Python'])
+        self.assertEqual(
+            [(t['username'], t['compliant'], t['statuses']) for t in matrix['trainees']],
+            [('ann', True, ['completed', 'completed']), ('bob', False, ['missing', 'in_progress'])],
+        )
+
+        detail = self.client.get(f'/api/compliance/trainees/{self.bob.pk}/').data
+        self.assertEqual((detail['required'], detail['completed'], detail['compliant']), (2, 0, False))
+        self.assertEqual(detail['programs'][0]['required_by'], [{'designation': self.engineer.pk, 'name': 'Engineer'}])
+
+        trainee_client = APIClient()
+        trainee_client.force_authenticate(self.bob)
+        self.assertEqual(trainee_client.get(f'/api/compliance/trainees/{self.bob.pk}/').status_code, 200)
+        self.assertEqual(trainee_client.get(f'/api/compliance/trainees/{self.ann.pk}/').status_code, 403)
+        self.assertEqual(trainee_client.get('/api/compliance/').status_code, 403)
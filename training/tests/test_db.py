@@ -0,0 +1,72 @@
+"""Primary/replica routing decisions and connection tuning."""
+from django.core.cache import cache
+from django.db import connection, router, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+
+from training import db
+from training.middleware import ReplicaRoutingMiddleware
+from training.models import Program
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def routed(self, method, path, token='Bearer a'):
+        """Where the request's reads are routed before and after its (POST-only) write."""
+        request = self.factory.generic(method, path, HTTP_AUTHORIZATION=token)
+        seen = {}
+
+        def view(request):
+            middleware.process_view(request, resolve(path).func, (), {})
+            seen['before'] = router.db_for_read(Program)
+            if method == 'POST':
+                router.db_for_write(Program)
+            seen['after'] = router.db_for_read(Program)
+
+        middleware = ReplicaRoutingMiddleware(view)
+        middleware(request)
+        return seen['before'], seen['after']
+
+    def test_only_list_and_retrieve_reads_use_the_replica(self):
+        self.assertEqual(self.routed('GET', '/api/programs/'), ('replica', 'replica'))
+        self.assertEqual(self.routed('GET', '/api/programs/1/'), ('replica', 'replica'))
+        self.assertEqual(self.routed('GET', '/api/classes/conflicts/'), ('default', 'default'))
+        self.assertEqual(self.routed('GET', '/api/dashboard/summary/'), ('default', 'default'))
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        self.assertEqual(self.routed('POST', '/api/programs/'), ('default', 'default'))
+        self.assertEqual(self.routed('GET', '/api/programs/'), ('default', 'default'))
+        self.assertEqual(self.routed('GET', '/api/programs/', token='Bearer b'), ('replica', 'replica'))
+        with override_settings(DATABASE_REPLICA_PIN_SECONDS=0):
+            self.assertEqual(self.routed('GET', '/api/programs/'), ('replica', 'replica'))
+
+    def test_router_outside_requests(self):
+        self.assertEqual(router.db_for_read(Program), 'default')
+        with db.routing(use_replica=True) as state:
+            self.assertEqual(router.db_for_read(Program), 'replica')
+            self.assertEqual(router.db_for_write(Program), 'default')
+            self.assertTrue(state.wrote)
+            self.assertEqual(router.db_for_read(Program), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'training'))
+
+
+class PrimaryTransactionTests(TestCase):
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_reads_inside_a_transaction_stay_on_the_primary(self):
+        with db.routing(use_replica=True), transaction.atomic():
+            self.assertEqual(router.db_for_read(Program), 'default')
+
+
+class ConnectionTuningTests(TestCase):
+    def test_sqlite_pragmas(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
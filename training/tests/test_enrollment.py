@@ -0,0 +1,172 @@
+"""Batch capacity: enrolled counts, seat checks and bulk enrollment."""
+import threading
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, close_old_connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from training import bulk
+from training.caching import table_versions
+from training.models import AuditLog, Batch, BatchTrainee, ComplianceStatus, DashboardCounter, Designation, \
+    DesignationProgram, Program, TraineeDesignation, User
+
+
+def enrolled_count(batch):
+    return Batch.objects.values_list('enrolled_count', flat=True).get(pk=batch.pk)
+
+
+class EnrolledCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('seat-admin', 's@example.com', 'pw', role='admin')
+        self.trainees = [User.objects.create_user(f'seat-{i}', f'{i}@example.com', 'pw', role='trainee') for i in range(5)]
+        program = Program.objects.create(name='Python')
+        self.batch = Batch.objects.create(name='Python 1', program=program, max_capacity=2)
+        self.other = Batch.objects.create(name='Python 2', program=program)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_signals_keep_the_count(self):
+        first = BatchTrainee.objects.create(batch=self.batch, trainee=self.trainees[0])
+        BatchTrainee.objects.create(batch=self.batch, trainee=self.trainees[1], status='waitlisted')
+        self.assertEqual(enrolled_count(self.batch), 1)
+        first.status = 'dropped'
+        first.save()
+        self.assertEqual(enrolled_count(self.batch), 0)
+        first.status = 'completed'
+        first.batch = self.other
+        first.save()
+        self.assertEqual((enrolled_count(self.batch), enrolled_count(self.other)), (0, 1))
+        first.delete()
+        self.assertEqual(enrolled_count(self.other), 0)
+
+        # Saving a stale batch instance leaves the count alone.
+        batch = Batch.objects.get(pk=self.batch.pk)
+        BatchTrainee.objects.create(batch=self.batch, trainee=self.trainees[2])
+        batch.name = 'Python 1b'
+        batch.save()
+        self.assertEqual(enrolled_count(self.batch), 1)
+
+        Batch.objects.update(enrolled_count=7)
+        out = StringIO()
+        call_command('rebuild_enrolled_counts', stdout=out)
+        self.assertIn('2 batches', out.getvalue())
+        self.assertEqual((enrolled_count(self.batch), enrolled_count(self.other)), (1, 0))
+
+    def test_single_enrollments_stop_at_capacity(self):
+        for trainee in self.trainees[:2]:
+            response = self.client.post('/api/batch-trainees/', {'batch': self.batch.pk, 'trainee': trainee.pk}, format='json')
+            self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/batch-trainees/', {'batch': self.batch.pk, 'trainee': self.trainees[2].pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('full', str(response.data['batch']))
+        response = self.client.post('/api/batch-trainees/', {'batch': self.batch.pk, 'trainee': self.trainees[0].pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        waiting = self.client.post('/api/batch-trainees/', {
+            'batch': self.batch.pk, 'trainee': self.trainees[2].pk, 'status': 'waitlisted',
+        }, format='json')
+        self.assertEqual(waiting.status_code, 201)
+        url = f'/api/batch-trainees/{waiting.data["id"]}/'
+        self.assertEqual(self.client.patch(url, {'status': 'enrolled'}, format='json').status_code, 400)
+        BatchTrainee.objects.get(batch=self.batch, trainee=self.trainees[0]).delete()
+        self.assertEqual(self.client.patch(url, {'status': 'enrolled'}, format='json').status_code, 200)
+        self.assertEqual(enrolled_count(self.batch), 2)
+
+    def bulk(self, trainees, overflow='reject'):
+        return self.client.post('/api/batch-trainees/bulk/', {
+            'batch': self.batch.pk, 'trainees': [t.pk for t in trainees], 'overflow': overflow,
+        }, format='json')
+
+    def test_bulk_reject_trim_and_waitlist(self):
+        response = self.bulk(self.trainees[:3])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['free_seats'], 2)
+        self.assertFalse(BatchTrainee.objects.exists())
+
+        response = self.bulk(self.trainees[:3], overflow='trim')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((len(response.data['enrolled']), response.data['refused']), (2, [self.trainees[2].pk]))
+        self.assertEqual(response.data['free_seats'], 0)
+
+        response = self.bulk(self.trainees[2:], overflow='waitlist')
+        self.assertEqual((response.data['enrolled'], len(response.data['waitlisted'])), ([], 3))
+        self.assertEqual(
+            list(BatchTrainee.objects.filter(status='waitlisted').order_by('id').values_list('trainee_id', flat=True)),
+            [t.pk for t in self.trainees[2:]],
+        )
+        self.assertEqual(enrolled_count(self.batch), 2)
+
+    def test_bulk_keeps_derived_tables_current(self):
+        designation = Designation.objects.create(name='Engineer')
+        DesignationProgram.objects.create(designation=designation, program=self.batch.program, is_required=True)
+        TraineeDesignation.objects.create(trainee=self.trainees[0], designation=designation)
+        versions = table_versions(Batch, BatchTrainee)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.bulk(self.trainees[:3], overflow='waitlist')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(table_versions(Batch, BatchTrainee), versions)
+        self.assertEqual(ComplianceStatus.objects.get(trainee=self.trainees[0]).status, 'in_progress')
+        counters = dict(DashboardCounter.objects.filter(metric='batch_trainees', trainee=None).values_list('bucket', 'value'))
+        self.assertEqual((counters['enrolled'], counters['waitlisted']), (2, 1))
+        self.assertEqual(AuditLog.objects.get(action='BULK_ENROLL').new_values['waitlisted'], [self.trainees[2].pk])
+
+    def test_bulk_validation(self):
+        BatchTrainee.objects.create(batch=self.batch, trainee=self.trainees[0])
+        response = self.client.post('/api/batch-trainees/bulk/', {
+            'batch': self.batch.pk, 'trainees': [self.trainees[0].pk, self.trainees[1].pk, self.trainees[1].pk, self.admin.pk, 999999],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([bool(e) for e in response.data['errors']], [True, False, True, True, True])
+        self.assertEqual(BatchTrainee.objects.count(), 1)
+        response = self.client.post('/api/batch-trainees/bulk/', {'batch': 999999, 'trainees': [self.trainees[1].pk]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        trainee = APIClient()
+        trainee.force_authenticate(self.trainees[1])
+        response = trainee.post('/api/batch-trainees/bulk/', {'batch': self.batch.pk, 'trainees': [self.trainees[1].pk]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+# Audit rows are written inside the enrolling transaction, so the retry below covers them.
+@override_settings(AUDIT_LOG_MODE='sync')
+class ConcurrentEnrollmentTests(TransactionTestCase):
+    def test_parallel_enrollers_never_overbook(self):
+        admin = User.objects.create_superuser('race-admin', 'r@example.com', 'pw', role='admin')
+        trainees = [User.objects.create_user(f'race-{i}', f'r{i}@example.com', 'pw', role='trainee') for i in range(20)]
+        batch = Batch.objects.create(name='Race', program=Program.objects.create(name='Race'), max_capacity=10)
+        # Six enrollers with three trainees each, and two racing to enroll the same pair.
+        ids = [t.pk for t in trainees]
+        requests = [ids[3 * i:3 * i + 3] for i in range(6)] + [ids[18:], ids[18:]]
+        results, barrier = [], threading.Barrier(len(requests))
+
+        def enroll(trainee_ids):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        results.append(bulk.enroll_trainees(batch.pk, trainee_ids, admin, overflow='waitlist'))
+                        return
+                    except OperationalError as exc:
+                        # The in-memory test database fails a locked table at once where a
+                        # file database would wait for SQLITE_BUSY_TIMEOUT_MS.
+                        if 'locked' not in str(exc):
+                            raise
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=enroll, args=(ids,)) for ids in requests]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), len(requests))
+        self.assertEqual(sum(1 for r in results if r['duplicates']), 1)
+        statuses = list(BatchTrainee.objects.filter(batch=batch).values_list('trainee_id', 'status'))
+        self.assertEqual(sorted(trainee_id for trainee_id, _ in statuses), ids)
+        self.assertEqual(sum(status == 'enrolled' for _, status in statuses), 10)
+        self.assertEqual(enrolled_count(batch), 10)
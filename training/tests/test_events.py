@@ -0,0 +1,119 @@
+"""Server-sent event streams, the in-process broker and the database relay."""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from training import events
+from training.models import Batch, BatchTrainee, Program, ProgressRecord, StreamEvent, User
+
+
+def parse(chunk):
+    fields = dict(line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+    return fields.get('id'), fields['event'], json.loads(fields['data'])
+
+
+@override_settings(EVENT_STREAM_KEEPALIVE_SECONDS=5)
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('events-admin', 'e@example.com', 'pw', role='admin')
+        self.trainee = User.objects.create_user('events-trainee', 't@example.com', 'pw', role='trainee')
+        self.other = User.objects.create_user('events-other', 'o@example.com', 'pw', role='trainee')
+        self.batch = Batch.objects.create(name='Python 1', program=Program.objects.create(name='Python'))
+
+    def token(self, user):
+        return str(AccessToken.for_user(user))
+
+    def auth(self, user):
+        # AsyncClient takes real headers; HTTP_* kwargs would land in the ASGI scope.
+        return {'Authorization': f'Bearer {self.token(user)}'}
+
+    async def open(self, url, user):
+        response = await self.async_client.get(url, headers=self.auth(user))
+        self.assertEqual(response.status_code, 200, getattr(response, 'content', b''))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        return chunks
+
+    async def next_event(self, chunks):
+        return parse(await asyncio.wait_for(anext(chunks), 5))
+
+    def enroll_and_progress(self, trainee):
+        with self.captureOnCommitCallbacks(execute=True):
+            BatchTrainee.objects.create(batch=self.batch, trainee=trainee)
+            ProgressRecord.objects.create(batch=self.batch, trainee=trainee, status='completed', completion_percentage=100)
+
+    async def test_batch_stream_receives_committed_changes(self):
+        chunks = await self.open(f'/api/events/batches/{self.batch.pk}/', self.admin)
+        await sync_to_async(self.enroll_and_progress)(self.trainee)
+        _, event, payload = await self.next_event(chunks)
+        self.assertEqual((event, payload['trainee'], payload['status']), ('enrollment', self.trainee.pk, 'enrolled'))
+        _, event, payload = await self.next_event(chunks)
+        self.assertEqual((event, payload['completion']), ('progress', 100))
+        await chunks.aclose()
+
+    async def test_trainee_stream_only_gets_that_trainee(self):
+        chunks = await self.open(f'/api/events/trainees/{self.trainee.pk}/?token={self.token(self.trainee)}', self.trainee)
+        await sync_to_async(self.enroll_and_progress)(self.other)
+        await sync_to_async(self.enroll_and_progress)(self.trainee)
+        _, event, payload = await self.next_event(chunks)
+        self.assertEqual((event, payload['trainee']), ('enrollment', self.trainee.pk))
+        await chunks.aclose()
+
+    async def test_permissions(self):
+        url = f'/api/events/batches/{self.batch.pk}/'
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+        self.assertEqual((await self.async_client.get(f'{url}?token=garbage')).status_code, 401)
+        # Trainees may only watch themselves.
+        headers = self.auth(self.trainee)
+        self.assertEqual((await self.async_client.get(url, headers=headers)).status_code, 403)
+        self.assertEqual((await self.async_client.get(f'/api/events/trainees/{self.other.pk}/', headers=headers)).status_code, 403)
+        response = await self.async_client.get('/api/events/batches/999999/', headers=self.auth(self.admin))
+        self.assertEqual(response.status_code, 404)
+
+    def test_wsgi_requests_are_refused(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(f'/api/events/batches/{self.batch.pk}/').status_code, 501)
+
+    @override_settings(EVENT_STREAM_QUEUE_SIZE=2)
+    async def test_slow_stream_gets_resync_and_unsubscribes(self):
+        channel = f'batch:{self.batch.pk}'
+        subscription = events.broker.subscribe([channel])
+        chunks = events.stream(subscription)
+        await anext(chunks)
+        for _ in range(5):
+            events.broker.deliver(events.broker.next_id(), [channel], events.encode(1, 'progress', {}))
+        await asyncio.sleep(0)
+        self.assertEqual(parse(await anext(chunks))[1], 'resync')
+        await chunks.aclose()
+        self.assertEqual(events.broker.subscriber_count(), 0)
+
+
+@override_settings(EVENT_RELAY='db')
+class EventRelayTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('relay-admin', 'r@example.com', 'pw', role='admin')
+        self.trainee = User.objects.create_user('relay-trainee', 't@example.com', 'pw', role='trainee')
+        self.batch = Batch.objects.create(name='Python 1', program=Program.objects.create(name='Python'))
+
+    async def test_rows_are_relayed_once_and_replayed_after_reconnect(self):
+        relay = events.Relay()
+        await sync_to_async(relay.poll)(deliver=False)
+        subscription = events.broker.subscribe([f'trainee:{self.trainee.pk}'])
+        try:
+            enrollment = await BatchTrainee.objects.acreate(batch=self.batch, trainee=self.trainee)
+            self.assertEqual(await StreamEvent.objects.acount(), 1)
+            self.assertEqual(await sync_to_async(relay.poll)(), 1)
+            self.assertEqual(await sync_to_async(relay.poll)(), 0)
+            event_id, message = await asyncio.wait_for(subscription.queue.get(), 5)
+            self.assertEqual(parse(message)[2]['id'], enrollment.pk)
+        finally:
+            events.broker.unsubscribe(subscription)
+
+        await ProgressRecord.objects.acreate(batch=self.batch, trainee=self.trainee)
+        missed = await sync_to_async(events.missed_events)(None, self.trainee.pk, event_id, 10)
+        self.assertEqual([parse(m)[1] for _, m in missed], ['progress'])
+        self.assertIsNone(await sync_to_async(events.missed_events)(None, self.trainee.pk, 0, 1))
@@ -0,0 +1,94 @@
+"""Streaming CSV/NDJSON exports."""
+import csv
+import gzip
+import io
+import json
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from training import exports
+from training.models import AuditLog, Batch, BatchTrainee, Program, ProgramTopic, ProgressRecord, User
+
+
+def body(response):
+    return b''.join(response.streaming_content)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('export-admin', 'x@example.com', 'pw', role='admin')
+        self.ann = User.objects.create_user('export-ann', 'ann@example.com', 'pw', role='trainee', first_name='Ann')
+        self.bob = User.objects.create_user('export-bob', 'bob@example.com', 'pw', role='trainee')
+        program = Program.objects.create(name='Python')
+        topic = ProgramTopic.objects.create(program=program, topic_name='Basics')
+        self.batch = Batch.objects.create(name='Python 1', program=program)
+        BatchTrainee.objects.create(batch=self.batch, trainee=self.ann)
+        self.records = [
+            ProgressRecord.objects.create(trainee=trainee, batch=self.batch, topic=topic, completion_percentage=pct,
+                                          notes='said "hi", twice\nthen left' if pct == 10 else None)
+            for trainee, pct in ((self.ann, 10), (self.bob, 60), (self.ann, 100))
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, url, client=None):
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_csv(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.export('/api/progress-records/export/')
+        self.assertEqual(AuditLog.objects.get(action='EXPORT').new_values['output'], 'csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(response['Content-Disposition'], r'attachment; filename="progress-records-\d{8}-\d{6}\.csv"')
+        rows = list(csv.DictReader(io.StringIO(body(response).decode('utf-8'))))
+        self.assertEqual([int(row['id']) for row in rows], [r.pk for r in self.records])
+        first = rows[0]
+        self.assertEqual((first['trainee_username'], first['trainee_first_name'], first['program_name'], first['topic_name']),
+                         ('export-ann', 'Ann', 'Python', 'Basics'))
+        self.assertEqual(first['notes'], 'said "hi", twice\nthen left')
+        self.assertEqual(rows[1]['notes'], '')
+
+    def test_ndjson_honours_filters_and_scoping(self):
+        response = self.export(f'/api/progress-records/export/?output=ndjson&trainee={self.ann.pk}')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body(response).decode('utf-8').splitlines()]
+        self.assertEqual([row['completion_percentage'] for row in rows], [10, 100])
+        self.assertEqual(rows[0]['notes'], 'said "hi", twice\nthen left')
+        self.assertIsNone(rows[0]['updated_by_username'])
+
+        trainee = APIClient()
+        trainee.force_authenticate(self.bob)
+        rows = body(self.export('/api/progress-records/export/?output=ndjson', trainee)).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(row)['trainee'] for row in rows], [self.bob.pk])
+
+    def test_gzip(self):
+        response = self.export('/api/batch-trainees/export/?output=ndjson&compress=gzip')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertFalse(response.is_async)  # WSGI keeps the plain generator
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson.gz"'))
+        rows = gzip.decompress(body(response)).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(row)['trainee'] for row in rows], [self.ann.pk])
+
+    def test_invalid_output(self):
+        self.assertEqual(self.client.get('/api/progress-records/export/?output=xml').status_code, 400)
+
+    async def test_asgi_requests_stream_an_async_iterator(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get('/api/progress-records/export/?output=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        rows = b''.join([chunk async for chunk in response.streaming_content]).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(row)['id'] for row in rows], [r.pk for r in self.records])
+
+    def test_small_chunks_and_flushes_give_the_same_bytes(self):
+        columns = (('id', 'id'), ('notes', 'notes'), ('trainee', 'trainee__username'))
+        queryset = ProgressRecord.objects.order_by('id')
+        whole = body(exports.stream_export(queryset, columns, 'csv'))
+        rows = exports.export_rows(queryset, [lookup for _, lookup in columns], chunk_size=1)
+        chunks = list(exports.buffered(exports.csv_lines([header for header, _ in columns], rows), flush_bytes=1))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(b''.join(chunks), whole)
+        self.assertEqual(gzip.decompress(b''.join(exports.gzipped(iter(chunks)))), whole)
@@ -0,0 +1,101 @@
+"""``?fields=`` / ``?expand=`` responses and the queries behind them."""
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from training.models import Batch, BatchTrainee, Program, ProgramTopic, ProgressRecord, User
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('fields-admin', 'f@example.com', 'pw', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.program = Program.objects.create(name='Python', description='A long description')
+        ProgramTopic.objects.create(program=self.program, topic_name='Second', topic_order=2)
+        self.topic = ProgramTopic.objects.create(program=self.program, topic_name='First', topic_order=1)
+        self.batch = Batch.objects.create(name='Python 1', program=self.program)
+        for i in range(3):
+            trainee = User.objects.create_user(f'fields-trainee{i}', f't{i}@example.com', 'pw', role='trainee')
+            BatchTrainee.objects.create(batch=self.batch, trainee=trainee, feedback='long feedback')
+            ProgressRecord.objects.create(trainee=trainee, batch=self.batch, topic=self.topic, notes='notes')
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_ACCEPT='application/json')
+        return response, [q['sql'] for q in queries.captured_queries]
+
+    def test_fields_narrow_payload_and_columns(self):
+        response, queries = self.get('/api/batch-trainees/?fields=id,status')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status'})
+        self.assertNotIn('feedback', queries[-1])
+
+        response, queries = self.get(f'/api/batches/{self.batch.pk}/?fields=name')
+        self.assertEqual(response.data, {'name': 'Python 1'})
+
+    def test_expand_joins_instead_of_follow_up_queries(self):
+        response, queries = self.get('/api/batch-trainees/?fields=id,trainee,batch.name,batch.program.name&expand=trainee,batch.program')
+        # ETag version lookup, count, page.
+        self.assertEqual(len(queries), 3)
+        row = response.data['results'][0]
+        self.assertEqual(set(row['trainee']), {'id', 'username', 'first_name', 'last_name', 'role'})
+        self.assertEqual(row['batch']['name'], 'Python 1')
+        self.assertEqual(row['batch']['program'], {'name': 'Python'})
+        self.assertNotIn('description', queries[-1])
+
+    def test_program_topics_prefetched_only_when_selected(self):
+        response, queries = self.get('/api/programs/?fields=id,name')
+        self.assertEqual(response.data['results'], [{'id': self.program.pk, 'name': 'Python'}])
+        self.assertFalse(any('training_programtopic' in sql for sql in queries))
+
+        response, queries = self.get('/api/programs/?fields=id,topics')
+        # The viewset's ordered prefetch is kept.
+        self.assertEqual([t['topic_name'] for t in response.data['results'][0]['topics']], ['First', 'Second'])
+
+    def test_keyset_pages_with_fields(self):
+        response, _ = self.get('/api/progress-records/?cursor=&page_size=2&fields=id')
+        self.assertEqual([set(row) for row in response.data['results']], [{'id'}, {'id'}])
+        response, queries = self.get(response.data['next'].replace('http://testserver', ''))
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(len(queries), 2)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.get('/api/batches/?fields=nope')[0].status_code, 400)
+        self.assertEqual(self.get('/api/batches/?expand=trainee')[0].status_code, 400)
+        self.assertEqual(self.get('/api/batches/?fields=program.name')[0].status_code, 400)
+        # Writes ignore the parameters.
+        response = self.client.post('/api/batches/?fields=id', {'name': 'Python 2', 'program': self.program.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('status', response.data)
+
+
+class ExpandPermissionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        program = Program.objects.create(name='Python')
+        topic = ProgramTopic.objects.create(program=program, topic_name='Basics')
+        batch = Batch.objects.create(name='Python 1', program=program)
+        self.trainee = User.objects.create_user('expand-trainee', 'e@example.com', 'pw', role='trainee')
+        self.trainer = User.objects.create_user('expand-trainer', 'r@example.com', 'pw', role='trainer')
+        BatchTrainee.objects.create(batch=batch, trainee=self.trainee)
+        ProgressRecord.objects.create(trainee=self.trainee, batch=batch, topic=topic)
+
+    def status(self, user, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(url, HTTP_ACCEPT='application/json').status_code
+
+    def test_expansion_needs_the_target_viewsets_permissions(self):
+        # Trainees cannot list batches or topics, so they cannot expand into them either.
+        self.assertEqual(self.status(self.trainee, '/api/progress-records/?expand=batch,topic'), 403)
+        self.assertEqual(self.status(self.trainee, '/api/batch-trainees/?expand=batch'), 403)
+        self.assertEqual(self.status(self.trainee, '/api/progress-records/?expand=trainee'), 200)
+        self.assertEqual(self.status(self.trainee, '/api/progress-records/'), 200)
+
+        self.assertEqual(self.status(self.trainer, '/api/progress-records/?expand=batch'), 200)
+        self.assertEqual(self.status(self.trainer, '/api/progress-records/?expand=topic'), 403)
+        # Nested paths are checked at every level: programs are admin-only.
+        self.assertEqual(self.status(self.trainer, '/api/batch-trainees/?expand=batch.program'), 403)
@@ -0,0 +1,119 @@
+"""Bulk user import from CSV and the shared password hashing pool."""
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.hashers import check_password
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from training import hashing
+from training.models import AuditLog, Batch, BatchTrainee, DashboardCounter, Designation, Program, TraineeDesignation, User
+
+HEADER = 'username,email,first_name,last_name,phone,role,password,designations,batches\n'
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('import-admin', 'i@example.com', 'pw', role='admin')
+        self.engineer = Designation.objects.create(name='Engineer')
+        self.batch = Batch.objects.create(name='Python 1', program=Program.objects.create(name='Python'), max_capacity=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def upload(self, csv_text, **data):
+        return self.client.post('/api/users/import/', {'file': SimpleUploadedFile('users.csv', csv_text.encode('utf-8')), **data})
+
+    def test_import_creates_users_with_designations_and_enrollments(self):
+        csv_text = HEADER + (
+            f'ann,ann@example.com,Ann,Lee,,trainee,Tr0ub4dor&3x,{self.engineer.pk},{self.batch.pk}\n'
+            f'bob,,Bob,,,trainee,,,{self.batch.pk}\n'
+            'tess,tess@example.com,Tess,,,trainer,C0rrect-Horse,,\n'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload(csv_text)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data['created']), 3)
+        self.assertEqual(response.data['timings']['waitlisted'], 1)
+
+        ann, bob, tess = (User.objects.get(username=name) for name in ('ann', 'bob', 'tess'))
+        self.assertTrue(ann.check_password('Tr0ub4dor&3x'))
+        self.assertFalse(bob.has_usable_password())
+        self.assertEqual(tess.role, 'trainer')
+        self.assertTrue(TraineeDesignation.objects.filter(trainee=ann, designation=self.engineer).exists())
+        self.assertEqual(dict(BatchTrainee.objects.values_list('trainee__username', 'status')), {'ann': 'enrolled', 'bob': 'waitlisted'})
+        self.assertEqual(DashboardCounter.objects.get(metric='users', bucket='trainee', trainee=None).value, 2)
+        self.assertEqual(AuditLog.objects.filter(action='USER_IMPORTED', user=self.admin).count(), 3)
+
+    def test_invalid_rows_import_nothing(self):
+        User.objects.create_user('taken', 'taken@example.com', 'pw')
+        csv_text = HEADER + (
+            'ok,ok@example.com,,,,trainee,,,\n'
+            'taken,,,,,trainee,,,\n'
+            'dup,TAKEN@example.com,,,,trainee,,,\n'
+            'late,,,,,trainee,,999999,\n'
+            'boss,,,,,admin,,,1\n'
+            'ok,,,,,trainee,,,\n'
+        )
+        response = self.upload(csv_text)
+        self.assertEqual(response.status_code, 400)
+        errors = {e['line']: sorted(e['errors']) for e in response.data['errors']}
+        self.assertEqual(errors, {3: ['username'], 4: ['email'], 5: ['designations'], 6: ['non_field_errors'], 7: ['username']})
+        self.assertFalse(User.objects.filter(username='ok').exists())
+
+    def test_dry_run_and_shared_ids(self):
+        csv_text = HEADER + 'ann,,,,,trainee,,,\n'
+        response = self.upload(csv_text, dry_run='true', designation=[self.engineer.pk])
+        self.assertEqual(response.data, {'valid': 1})
+        self.assertFalse(User.objects.filter(username='ann').exists())
+        self.assertEqual(self.upload(csv_text, batch=[999999]).status_code, 400)
+
+        response = self.upload(csv_text, designation=[self.engineer.pk])
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(TraineeDesignation.objects.filter(trainee__username='ann', designation=self.engineer).exists())
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.csv')
+            with open(path, 'w', encoding='utf-8') as stream:
+                stream.write(HEADER + 'ann,,,,,trainee,,,\nann,,,,,trainee,,,\n')
+            err = StringIO()
+            with self.assertRaises(CommandError):
+                call_command('import_users', path, stdout=StringIO(), stderr=err)
+            self.assertIn('line 3 (ann)', err.getvalue())
+
+            with open(path, 'w', encoding='utf-8') as stream:
+                stream.write(HEADER + 'ann,,,,,trainee,,,\n')
+            out = StringIO()
+            call_command('import_users', path, batch=[self.batch.pk], workers=1, stdout=out)
+        self.assertIn('Imported 1 users (0 designations, 1 enrollments)', out.getvalue())
+        self.assertTrue(BatchTrainee.objects.filter(trainee__username='ann', batch=self.batch).exists())
+
+
+class HashingPoolTests(SimpleTestCase):
+    def tearDown(self):
+        if hashing._pool is not None:
+            hashing._pool.shutdown()
+            hashing._pool = None
+
+    def test_pool_is_started_once_and_reused(self):
+        passwords = ['first-secret', '', 'second-secret']
+        with mock.patch.object(hashing, 'PARALLEL_MIN', 2):
+            hashed = hashing.hash_passwords(passwords, workers=2)
+            pool = hashing._pool
+            hashing.hash_passwords(passwords, workers=2)
+            self.assertIs(hashing._pool, pool)
+        self.assertTrue(check_password('first-secret', hashed[0]))
+        self.assertFalse(check_password('', hashed[1]))
+        self.assertTrue(check_password('second-secret', hashed[2]))
+
+    def test_small_imports_hash_in_process(self):
+        with mock.patch.object(hashing, 'get_pool') as get_pool:
+            hashing.hash_passwords(['only-one'], workers=4)
+        get_pool.assert_not_called()
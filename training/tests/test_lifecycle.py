@@ -0,0 +1,122 @@
+"""Date-driven batch status transitions and their cascade to enrollments."""
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from training import lifecycle, stats
+from training.caching import table_versions
+from training.models import (
+    AuditLog, Batch, BatchTrainee, ComplianceStatus, DashboardCounter, Designation, DesignationProgram, Program,
+    TraineeDesignation, User,
+)
+
+TODAY = date(2026, 6, 15)
+
+
+def counters():
+    return set(DashboardCounter.objects.filter(value__gt=0).values_list('metric', 'bucket', 'trainee_id', 'value'))
+
+
+class LifecycleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.program = Program.objects.create(name='Python')
+        self.trainees = [User.objects.create_user(f'life-{i}', f'{i}@example.com', 'pw', role='trainee') for i in range(4)]
+
+    def batch(self, status, start, end, **kwargs):
+        days = lambda n: None if n is None else TODAY + timedelta(days=n)
+        return Batch.objects.create(name=f'{status} {start} {end}', program=self.program, status=status,
+                                    start_date=days(start), end_date=days(end), **kwargs)
+
+    def statuses(self):
+        return dict(Batch.objects.values_list('name', 'status'))
+
+    def test_batches_follow_their_dates(self):
+        self.batch('scheduled', -1, 30)
+        self.batch('scheduled', 0, None)
+        self.batch('scheduled', -60, -1)
+        self.batch('running', -60, -1)
+        self.batch('scheduled', 1, 30)
+        self.batch('running', -10, 0)
+        self.batch('cancelled', -60, -1)
+        self.batch('completed', -10, 30)
+        self.batch('scheduled', None, None)
+        moved = lifecycle.advance(TODAY)
+        self.assertEqual(moved['batches'], {'completed': 2, 'running': 2})
+        self.assertEqual(self.statuses(), {
+            'scheduled -1 30': 'running', 'scheduled 0 None': 'running', 'scheduled -60 -1': 'completed',
+            'running -60 -1': 'completed', 'scheduled 1 30': 'scheduled', 'running -10 0': 'running',
+            'cancelled -60 -1': 'cancelled', 'completed -10 30': 'completed', 'scheduled None None': 'scheduled',
+        })
+
+    def test_enrollments_cascade_and_derived_tables_follow(self):
+        designation = Designation.objects.create(name='Engineer')
+        DesignationProgram.objects.create(designation=designation, program=self.program, is_required=True)
+        TraineeDesignation.objects.create(trainee=self.trainees[0], designation=designation)
+        starting, ending = self.batch('scheduled', -1, 30), self.batch('running', -60, -1)
+        ann, bob, cat, dan = self.trainees
+        BatchTrainee.objects.create(batch=starting, trainee=ann)
+        BatchTrainee.objects.create(batch=starting, trainee=bob, status='waitlisted')
+        BatchTrainee.objects.create(batch=ending, trainee=ann, status='in_progress')
+        BatchTrainee.objects.create(batch=ending, trainee=bob, status='completed', completion_date=date(2026, 6, 1))
+        BatchTrainee.objects.create(batch=ending, trainee=cat, status='dropped')
+        BatchTrainee.objects.create(batch=ending, trainee=dan)
+        versions = table_versions(Batch, BatchTrainee)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = lifecycle.advance(TODAY)
+        self.assertEqual(moved['enrollments'], {'in_progress': 1, 'completed': 2})
+        rows = {(e.batch_id, e.trainee_id): (e.status, e.completion_date) for e in BatchTrainee.objects.all()}
+        self.assertEqual(rows[(starting.pk, ann.pk)], ('in_progress', None))
+        self.assertEqual(rows[(starting.pk, bob.pk)], ('waitlisted', None))
+        self.assertEqual(rows[(ending.pk, ann.pk)], ('completed', TODAY - timedelta(days=1)))
+        self.assertEqual(rows[(ending.pk, bob.pk)], ('completed', date(2026, 6, 1)))
+        self.assertEqual(rows[(ending.pk, cat.pk)], ('dropped', None))
+        self.assertEqual(rows[(ending.pk, dan.pk)], ('completed', TODAY - timedelta(days=1)))
+
+        self.assertNotEqual(table_versions(Batch, BatchTrainee), versions)
+        self.assertEqual(ComplianceStatus.objects.get(trainee=ann).status, 'completed')
+        maintained = counters()
+        stats.rebuild_counters()
+        self.assertEqual(maintained, counters())
+        audit = AuditLog.objects.get(action='BATCH_LIFECYCLE')
+        # Counts only: the batch ids of a large tick would bloat the entry and the archives.
+        self.assertEqual(audit.new_values['batches'], {'running': 1, 'completed': 1})
+        self.assertNotIn('running', audit.new_values)
+
+    def test_ticks_are_idempotent(self):
+        self.batch('scheduled', -60, -1)
+        BatchTrainee.objects.create(batch=Batch.objects.get(), trainee=self.trainees[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            lifecycle.advance(TODAY)
+        versions, audits = table_versions(Batch, BatchTrainee), AuditLog.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = lifecycle.advance(TODAY)
+        self.assertEqual(moved, {'batches': {'completed': 0, 'running': 0}, 'enrollments': {'in_progress': 0, 'completed': 0}})
+        self.assertEqual((table_versions(Batch, BatchTrainee), AuditLog.objects.count()), (versions, audits))
+
+    def test_queries_do_not_grow_with_batches(self):
+        def ticks(n):
+            Batch.objects.all().delete()
+            for i in range(n):
+                BatchTrainee.objects.create(batch=self.batch('scheduled', -1 - i, 30), trainee=self.trainees[i % 4])
+            with CaptureQueriesContext(connection) as queries:
+                lifecycle.advance(TODAY, chunk_size=50)
+            return len(queries)
+
+        ticks(3)  # creates the dashboard counter rows
+        self.assertEqual(ticks(3), ticks(40))
+        self.assertEqual(BatchTrainee.objects.filter(status='in_progress').count(), 40)
+
+    def test_command(self):
+        self.batch('scheduled', -1, 30)
+        out = StringIO()
+        call_command('advance_batches', date=TODAY.isoformat(), chunk_size=1, stdout=out)
+        self.assertIn('started 1 and completed 0 batches', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('advance_batches', date='tomorrow', stdout=StringIO())
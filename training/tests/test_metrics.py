@@ -0,0 +1,61 @@
+"""Server-Timing header, request histograms and the Prometheus endpoint."""
+import re
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from training import metrics
+from training.models import Program, User
+
+
+class HistogramTests(SimpleTestCase):
+    def test_render(self):
+        histogram = metrics.Histogram('demo_seconds', 'Demo.', ('view',), buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 3):
+            histogram.observe(value, 'a"b')
+        self.assertEqual(histogram.render(), [
+            '# HELP demo_seconds Demo.',
+            '# TYPE demo_seconds histogram',
+            'demo_seconds_bucket{view="a\\"b",le="0.1"} 1',
+            'demo_seconds_bucket{view="a\\"b",le="1"} 3',
+            'demo_seconds_bucket{view="a\\"b",le="+Inf"} 4',
+            'demo_seconds_sum{view="a\\"b"} 4.05',
+            'demo_seconds_count{view="a\\"b"} 4',
+        ])
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.admin = User.objects.create_superuser('metrics-admin', 'm@example.com', 'pw', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_server_timing_and_histograms(self):
+        Program.objects.create(name='Python')
+        response = self.client.get('/api/programs/', HTTP_ACCEPT='application/json')
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+, render;dur=[\d.]+, total;dur=[\d.]+$')
+        queries = int(re.search(r'"(\d+) queries"', timing).group(1))
+        self.assertGreater(queries, 0)
+        self.assertEqual(metrics.request_queries.count('ProgramViewSet', 'list'), 1)
+        self.assertEqual(metrics.request_duration.count('ProgramViewSet', 'list', 'GET', '200'), 1)
+
+        self.client.get('/api/compliance/')
+        self.assertEqual(metrics.request_render_duration.count('compliance_summary', 'get'), 1)
+        self.assertEqual(metrics.audit_records.value('create'), 1)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint(self):
+        self.client.get('/api/programs/')
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode('utf-8')
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_count{view="ProgramViewSet",action="list",method="GET",status="200"} 1', body)
+        self.assertIn('http_request_db_queries_bucket{view="ProgramViewSet",action="list",le="+Inf"} 1', body)
+        self.assertIn('auth_user_lookups_total{result="miss"}', body)
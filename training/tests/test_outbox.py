@@ -0,0 +1,97 @@
+"""Password reset email outbox, run against Django's locmem email backend."""
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from training import outbox
+from training.models import OutboxEmail, PasswordResetToken, User
+
+
+class FlakyBackend(EmailBackend):
+    """Locmem backend that fails the first ``failures`` sends and counts opened sessions."""
+    failures = 0
+    opened = 0
+
+    def open(self):
+        # Like the SMTP backend: only a closed connection starts a new session.
+        if getattr(self, 'session', None) is None:
+            self.session = object()
+            FlakyBackend.opened += 1
+            return True
+        return False
+
+    def close(self):
+        self.session = None
+
+    def send_messages(self, messages):
+        if FlakyBackend.failures:
+            FlakyBackend.failures -= 1
+            raise ConnectionError('server went away')
+        return super().send_messages(messages)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reset-me', 'reset@example.com', 'old-password')
+        FlakyBackend.failures = FlakyBackend.opened = 0
+
+    def test_reset_request_only_queues_the_email(self):
+        response = APIClient().post('/api/password-reset/', {'email': 'reset@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        message = OutboxEmail.objects.get()
+        self.assertEqual(message.to, ['reset@example.com'])
+        token = PasswordResetToken.objects.get(user=self.user).token
+        self.assertIn(token, message.body)
+
+        totals = outbox.process_outbox()
+        self.assertEqual(totals, {'sent': 1, 'failed': 0, 'retrying': 0})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(token, mail.outbox[0].body)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('sent', 1))
+
+    @override_settings(EMAIL_BACKEND='training.tests.test_outbox.FlakyBackend',
+                       EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_OUTBOX_BACKOFF_SECONDS=10)
+    def test_failures_back_off_then_give_up(self):
+        for i in range(3):
+            outbox.enqueue(f'Message {i}', 'body', [f'user{i}@example.com'])
+        FlakyBackend.failures = 1
+        totals = outbox.process_outbox(batch_size=10)
+        self.assertEqual(totals, {'sent': 2, 'failed': 0, 'retrying': 1})
+        retry = OutboxEmail.objects.get(status='pending')
+        self.assertEqual(retry.attempts, 1)
+        self.assertIn('server went away', retry.last_error)
+        self.assertGreater(retry.next_attempt_at, timezone.now() + timedelta(seconds=5))
+        # One session for the batch, plus a fresh one after the failure.
+        self.assertEqual(FlakyBackend.opened, 2)
+
+        # Not due yet: nothing is retried early.
+        self.assertEqual(outbox.process_outbox(), {'sent': 0, 'failed': 0, 'retrying': 0})
+
+        FlakyBackend.failures = 10
+        for attempt in (2, 3):
+            OutboxEmail.objects.filter(pk=retry.pk).update(next_attempt_at=timezone.now())
+            outbox.process_outbox()
+        retry.refresh_from_db()
+        self.assertEqual((retry.status, retry.attempts), ('failed', 3))
+        self.assertEqual(outbox.backoff(1), timedelta(seconds=10))
+        self.assertEqual(outbox.backoff(3), timedelta(seconds=40))
+
+    def test_sweep_deletes_expired_and_used_tokens(self):
+        now = timezone.now()
+        PasswordResetToken.objects.create(user=self.user, token='expired', expires_at=now - timedelta(minutes=1))
+        PasswordResetToken.objects.create(user=self.user, token='used', expires_at=now + timedelta(hours=1), is_used=True)
+        PasswordResetToken.objects.create(user=self.user, token='live', expires_at=now + timedelta(hours=1))
+        old = outbox.enqueue('old', 'body', ['a@example.com'])
+        OutboxEmail.objects.filter(pk=old.pk).update(status='sent', sent_at=now - timedelta(days=30))
+        outbox.enqueue('pending', 'body', ['b@example.com'])
+
+        with self.assertNumQueries(2):
+            self.assertEqual(outbox.sweep(now), (2, 1))
+        self.assertEqual(list(PasswordResetToken.objects.values_list('token', flat=True)), ['live'])
+        self.assertEqual(list(OutboxEmail.objects.values_list('subject', flat=True)), ['pending'])
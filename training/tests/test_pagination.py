@@ -0,0 +1,77 @@
+"""Keyset cursor pagination and its page-number fallback."""
+from base64 import b64encode
+from datetime import datetime, timezone
+from io import StringIO
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from training.models import AuditLog, User
+
+URL = '/api/audit-logs/'
+
+
+def cursor_param(link):
+    return parse_qs(urlparse(link).query)['cursor'][0]
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('page-admin', 'p@example.com', 'pw', role='admin')
+        AuditLog.objects.all().delete()
+        AuditLog.objects.bulk_create([AuditLog(action='page', record_id=i) for i in range(25)])
+        # Most rows share one timestamp, as after a bulk write.
+        AuditLog.objects.update(created_at=datetime(2026, 5, 1, tzinfo=timezone.utc))
+        AuditLog.objects.filter(record_id__lt=3).update(created_at=datetime(2026, 5, 2, tzinfo=timezone.utc))
+        self.expected = list(AuditLog.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['id'] for row in response.data['results']]
+
+    def test_pages_are_stable_under_ties(self):
+        seen, pages = [], []
+        response = self.client.get(URL, {'cursor': '', 'page_size': 4})
+        self.assertIsNone(response.data['previous'])
+        while True:
+            pages.append(self.ids(response))
+            seen.extend(pages[-1])
+            if not response.data['next']:
+                break
+            # A row written between pages does not shift the ones after the cursor.
+            AuditLog.objects.create(action='late')
+            response = self.client.get(URL, {'cursor': cursor_param(response.data['next']), 'page_size': 4})
+        self.assertEqual(seen, self.expected)
+
+        # Walking back from the last page gives the same pages.
+        previous = response.data['previous']
+        response = self.client.get(URL, {'cursor': cursor_param(previous), 'page_size': 4})
+        self.assertEqual(self.ids(response), pages[-2])
+        response = self.client.get(URL, {'cursor': cursor_param(response.data['next']), 'page_size': 4})
+        self.assertEqual(self.ids(response), pages[-1])
+
+    def test_requests_without_a_cursor_use_page_numbers(self):
+        response = self.client.get(URL, {'page': 2})
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(self.ids(response), self.expected[20:])
+        self.assertNotIn('count', self.client.get(URL, {'cursor': ''}).data)
+
+    def test_tampered_cursors_are_rejected(self):
+        def encode(position):
+            return b64encode(urlencode({'p': position}).encode('ascii')).decode('ascii')
+
+        for cursor in ('garbage', encode('not-a-date|1'), encode('2026-05-01T00:00:00+00:00|x'), encode('2026-05-01T00:00:00+00:00')):
+            self.assertEqual(self.client.get(URL, {'cursor': cursor}).status_code, 404, cursor)
+        # ?ordering= cannot reorder a keyset page.
+        self.assertEqual(self.ids(self.client.get(URL, {'cursor': '', 'ordering': 'id', 'page_size': 3})), self.expected[:3])
+
+    def test_bench_pagination_leaves_nothing_behind(self):
+        users, rows = User.objects.count(), AuditLog.objects.count()
+        out = StringIO()
+        call_command('bench_pagination', sizes='40,60', repeat=1, stdout=out)
+        self.assertIn('60', out.getvalue())
+        self.assertEqual((User.objects.count(), AuditLog.objects.count()), (users, rows))
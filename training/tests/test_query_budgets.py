@@ -0,0 +1,170 @@
+"""Query-count and latency budgets for every router endpoint.
+
+The data set is seeded with bulk inserts at realistic proportions, so an N+1
+query shows up as a blown query budget rather than a slightly slower page.
+Every GET route registered on ``training.urls.router`` must have a budget;
+adding an endpoint without one fails ``test_every_endpoint_has_a_budget``.
+"""
+import os
+import time
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from training.models import (
+    User, Program, ProgramTopic, Batch, BatchTrainer, BatchTrainee, Designation, DesignationProgram,
+    TraineeDesignation, ProgressRecord, AuditLog, Class,
+)
+from training.bench import get_routes
+
+LATENCY_BUDGET = float(os.getenv('API_LATENCY_BUDGET_MS', '750')) / 1000
+
+# (basename, action) -> maximum number of queries for one request as an admin;
+# list and retrieve include the table version lookup behind their ETag
+QUERY_BUDGETS = {
+    ('user', 'list'): 3,
+    ('user', 'retrieve'): 2,
+    ('program', 'list'): 4,
+    ('program', 'retrieve'): 3,
+    ('programtopic', 'list'): 3,
+    ('programtopic', 'retrieve'): 2,
+    ('batch', 'list'): 3,
+    ('batch', 'retrieve'): 2,
+    ('batch', 'progress_summary'): 3,
+    ('batch', 'bulk_progress_summary'): 2,
+    ('batchtrainer', 'list'): 3,
+    ('batchtrainer', 'retrieve'): 2,
+    ('batchtrainee', 'list'): 3,
+    ('batchtrainee', 'retrieve'): 2,
+    ('batchtrainee', 'export'): 1,
+    ('designation', 'list'): 3,
+    ('designation', 'retrieve'): 2,
+    ('designationprogram', 'list'): 3,
+    ('designationprogram', 'retrieve'): 2,
+    ('traineedesignation', 'list'): 3,
+    ('traineedesignation', 'retrieve'): 2,
+    ('progressrecord', 'list'): 3,
+    ('progressrecord', 'retrieve'): 2,
+    ('progressrecord', 'export'): 1,
+    ('auditlog', 'list'): 3,
+    ('auditlog', 'retrieve'): 2,
+    ('auditlog', 'export'): 1,
+    ('class', 'list'): 3,
+    ('class', 'retrieve'): 2,
+    ('class', 'upcoming'): 2,
+    ('class', 'conflicts'): 2,
+    ('class', 'free_slots'): 2,
+    ('class', 'calendar'): 2,
+}
+
+# Trainee-scoped endpoints are also checked as a trainee.
+TRAINEE_BUDGETS = {
+    ('batchtrainee', 'list'): 3,
+    ('batchtrainee', 'export'): 1,
+    ('progressrecord', 'list'): 3,
+    ('progressrecord', 'export'): 1,
+}
+
+
+class QueryBudgetTests(TestCase):
+    TRAINEES = 200
+    PROGRAMS = 10
+    TOPICS_PER_PROGRAM = 10
+    BATCHES_PER_PROGRAM = 3
+    TRAINEES_PER_BATCH = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', role='admin', is_staff=True, is_superuser=True)
+        trainer = User.objects.create(username='trainer', role='trainer')
+        User.objects.bulk_create([User(username=f'trainee{i}', role='trainee') for i in range(cls.TRAINEES)])
+        trainees = list(User.objects.filter(role='trainee').order_by('id'))
+        cls.trainee = trainees[0]
+
+        Program.objects.bulk_create([Program(name=f'Program {i}', description='x' * 200) for i in range(cls.PROGRAMS)])
+        programs = list(Program.objects.order_by('id'))
+        ProgramTopic.objects.bulk_create([
+            ProgramTopic(program=p, topic_name=f'Topic {j}', topic_order=j, estimated_hours=j + 1)
+            for p in programs for j in range(cls.TOPICS_PER_PROGRAM)
+        ])
+        today = date.today()
+        Batch.objects.bulk_create([
+            Batch(name=f'{p.name} / {k}', program=p, status='running', max_capacity=50,
+                  start_date=today - timedelta(days=10), end_date=today + timedelta(days=30))
+            for p in programs for k in range(cls.BATCHES_PER_PROGRAM)
+        ])
+        batches = list(Batch.objects.order_by('id'))
+        BatchTrainer.objects.bulk_create([BatchTrainer(batch=b, trainer=trainer) for b in batches])
+
+        enrollments = []
+        for n, batch in enumerate(batches):
+            for i in range(cls.TRAINEES_PER_BATCH):
+                enrollments.append(BatchTrainee(batch=batch, trainee=trainees[(n * 7 + i) % len(trainees)]))
+        BatchTrainee.objects.bulk_create(enrollments)
+
+        topics_by_program = {}
+        for topic in ProgramTopic.objects.order_by('id'):
+            topics_by_program.setdefault(topic.program_id, []).append(topic)
+        ProgressRecord.objects.bulk_create([
+            ProgressRecord(trainee=e.trainee, batch=e.batch, topic=t, status='in_progress',
+                           completion_percentage=(e.trainee.id * 13 + t.id) % 101, notes='notes')
+            for e in enrollments for t in topics_by_program[e.batch.program_id]
+        ], batch_size=1000)
+
+        designations = Designation.objects.bulk_create([Designation(name=f'Designation {i}') for i in range(5)])
+        DesignationProgram.objects.bulk_create([
+            DesignationProgram(designation=d, program=programs[i % len(programs)], is_required=True)
+            for i, d in enumerate(designations)
+        ])
+        TraineeDesignation.objects.bulk_create([
+            TraineeDesignation(trainee=t, designation=designations[i % len(designations)])
+            for i, t in enumerate(trainees)
+        ])
+        AuditLog.objects.bulk_create([
+            AuditLog(action='update_progress', table_name='training_progressrecord', record_id=i,
+                     new_values={'status': 'in_progress', 'completion': i % 100})
+            for i in range(1000)
+        ])
+        Class.objects.bulk_create([
+            Class(name=f'Class {i}', trainer_name='Trainer', class_timings='Mon, Wed 10:00 AM - 12:00 PM')
+            for i in range(20)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def assertWithinBudget(self, user, url, max_queries):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(url, HTTP_ACCEPT='application/json')
+            # Streaming responses only query the database while being consumed.
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            elapsed = time.perf_counter() - started
+        self.assertEqual(response.status_code, 200, f'{url}: {body[:200]}')
+        self.assertLessEqual(
+            len(queries), max_queries,
+            f'{url} ran {len(queries)} queries (budget {max_queries}):\n'
+            + '\n'.join(q['sql'] for q in queries.captured_queries),
+        )
+        self.assertLess(elapsed, LATENCY_BUDGET, f'{url} took {elapsed * 1000:.0f} ms')
+
+    def test_every_endpoint_has_a_budget(self):
+        missing = {(basename, action) for basename, action, _ in get_routes()} - set(QUERY_BUDGETS)
+        self.assertFalse(missing, f'Add query budgets for {sorted(missing)}')
+
+    def test_admin_endpoints_within_budget(self):
+        for basename, action, url in get_routes():
+            with self.subTest(url=url):
+                self.assertWithinBudget(self.admin, url, QUERY_BUDGETS[(basename, action)])
+
+    def test_trainee_scoped_endpoints_within_budget(self):
+        for basename, action, url in get_routes():
+            if (basename, action) in TRAINEE_BUDGETS:
+                with self.subTest(url=url):
+                    self.assertWithinBudget(self.trainee, url, TRAINEE_BUDGETS[(basename, action)])
@@ -0,0 +1,99 @@
+"""orjson renderer/parser parity with DRF's and gzip negotiation."""
+import gzip
+import json
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from uuid import UUID
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from training.models import AuditLog, User
+from training.renderers import ORJSONParser, ORJSONRenderer
+
+
+class ORJSONRendererTests(TestCase):
+    def test_matches_drf_output(self):
+        data = {
+            'utc': datetime(2026, 3, 1, 9, 30, 15, 120000, tzinfo=timezone.utc),
+            'offset': datetime(2026, 3, 1, 9, 30, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+            'naive': datetime(2026, 3, 1, 9, 30),
+            'date': date(2026, 3, 1),
+            'decimal': Decimal('12.50'),
+            'lazy': gettext_lazy('Completed'),
+            'uuid': UUID('12345678-1234-5678-1234-567812345678'),
+            'numpy': np.float64(0.25),
+            'array': np.arange(3),
+            1: 'int key',
+            'text': 'naïve   line',
+        }
+        ours, drf = ORJSONRenderer().render(data), JSONRenderer().render(data)
+        self.assertEqual(json.loads(ours), json.loads(drf))
+        self.assertIn(b'"2026-03-01T09:30:15.120000Z"', ours)
+        self.assertIn(b'\\u2028', ours)
+
+    def test_indent_and_oversized_values_fall_back_to_drf(self):
+        data = {'big': 2 ** 70, 'id': 1}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            ORJSONRenderer().render({'id': 1}, 'application/json; indent=4'),
+            JSONRenderer().render({'id': 1}, 'application/json; indent=4'),
+        )
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_parser(self):
+        self.assertEqual(ORJSONParser().parse(BytesIO('{"name": "Ünïcode", "n": [1, 2.5]}'.encode())), {'name': 'Ünïcode', 'n': [1, 2.5]})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"name": '))
+
+
+class JSONResponseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('json-admin', 'j@example.com', 'pw', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.admin, action='UPDATE', table_name='training_batch', record_id=i, new_values={'status': 'running'})
+            for i in range(20)
+        ])
+
+    def test_api_round_trip(self):
+        response = self.client.post('/api/programs/', {'name': 'Python', 'description': 'ü'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content)['description'], 'ü')
+        response = self.client.post('/api/programs/', '{"name": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_gzip_negotiated_by_accept_encoding(self):
+        response = self.client.get('/api/audit-logs/', HTTP_ACCEPT='application/json', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn('Server-Timing', response)
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 20)
+
+        plain = self.client.get('/api/audit-logs/', HTTP_ACCEPT='application/json')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+    @override_settings(COMPRESSION_MIN_BYTES=10 ** 6)
+    def test_small_and_precompressed_bodies_are_not_compressed(self):
+        response = self.client.get('/api/audit-logs/', HTTP_ACCEPT='application/json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        with override_settings(COMPRESSION_MIN_BYTES=0):
+            response = self.client.get('/api/audit-logs/export/?compress=gzip', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertTrue(gzip.decompress(b''.join(response.streaming_content)).startswith(b'id,'))
+
+    def test_bench_json_command(self):
+        out = StringIO()
+        call_command('bench_json', sizes='5', repeat=1, stdout=out)
+        self.assertIn('ProgressRecordSerializer', out.getvalue())
+        self.assertIn('AuditLogSerializer', out.getvalue())
@@ -0,0 +1,113 @@
+"""Topic-hour weighted progress rollups kept current by signals."""
+from django.core.cache import cache
+from django.test import TestCase
+
+from training import rollups
+from training.models import Batch, BatchProgressRollup, Program, ProgramTopic, ProgressRecord, TraineeProgressRollup, User
+
+
+def trainee_rollups():
+    return {
+        (r.batch_id, r.trainee_id): (round(r.completion, 4), r.completed_topics, r.topic_count, r.completed_hours, r.total_hours)
+        for r in TraineeProgressRollup.objects.all()
+    }
+
+
+def batch_rollups():
+    return {r.batch_id: (round(r.completion, 4), r.trainee_count, r.completed_trainees) for r in BatchProgressRollup.objects.all()}
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ann = User.objects.create_user('rollup-ann', 'ann@example.com', 'pw', role='trainee')
+        self.bob = User.objects.create_user('rollup-bob', 'bob@example.com', 'pw', role='trainee')
+        self.python = Program.objects.create(name='Python')
+        self.basics = ProgramTopic.objects.create(program=self.python, topic_name='Basics', estimated_hours=1)
+        self.django = ProgramTopic.objects.create(program=self.python, topic_name='Django', estimated_hours=3)
+        self.batch = Batch.objects.create(name='Python 1', program=self.python)
+
+    def record(self, trainee, topic, pct, batch=None):
+        return ProgressRecord.objects.create(trainee=trainee, batch=batch or self.batch, topic=topic, completion_percentage=pct)
+
+    def rollup(self, trainee, batch=None):
+        return TraineeProgressRollup.objects.get(trainee=trainee, batch=batch or self.batch)
+
+    def assertMatchesRebuild(self):
+        maintained = (trainee_rollups(), batch_rollups())
+        rollups.rebuild_rollups()
+        self.assertEqual((trainee_rollups(), batch_rollups()), maintained)
+
+    def test_completion_is_weighted_by_topic_hours(self):
+        self.record(self.ann, self.basics, 100)
+        rollup = self.rollup(self.ann)
+        self.assertEqual((rollup.completion, rollup.completed_topics, rollup.topic_count), (25, 1, 2))
+        self.assertEqual((rollup.completed_hours, rollup.total_hours), (1, 4))
+        self.record(self.ann, self.django, 50)
+        self.assertEqual(self.rollup(self.ann).completion, 62.5)
+        self.record(self.bob, self.django, 100)
+        self.assertEqual(BatchProgressRollup.objects.get(batch=self.batch).completion, (62.5 + 75) / 2)
+
+        # Changing the hours of a topic reweighs every trainee of the program.
+        self.django.estimated_hours = 1
+        self.django.save()
+        self.assertEqual(self.rollup(self.ann).completion, 75)
+        self.assertEqual(self.rollup(self.bob).completion, 50)
+        self.assertMatchesRebuild()
+
+    def test_topics_without_hours_weigh_the_same(self):
+        self.basics.estimated_hours = self.django.estimated_hours = 0
+        self.basics.save()
+        self.django.save()
+        self.record(self.ann, self.basics, 100)
+        self.record(self.ann, self.django, 20)
+        self.assertEqual(self.rollup(self.ann).completion, 60)
+        # A zero-hour topic in a program that has hours adds nothing.
+        self.django.estimated_hours = 4
+        self.django.save()
+        self.assertEqual(self.rollup(self.ann).completion, 20)
+        self.assertMatchesRebuild()
+
+    def test_the_latest_record_per_topic_wins(self):
+        self.record(self.ann, self.basics, 100)
+        self.record(self.ann, self.basics, 40)
+        self.assertEqual(self.rollup(self.ann).completion, 10)
+        self.assertMatchesRebuild()
+
+    def test_topic_moving_between_programs(self):
+        java = Program.objects.create(name='Java')
+        java_batch = Batch.objects.create(name='Java 1', program=java)
+        self.record(self.ann, self.basics, 100)
+        self.record(self.ann, self.django, 100)
+        self.assertEqual(self.rollup(self.ann).completion, 100)
+
+        self.django.program = java
+        self.django.save()
+        rollup = self.rollup(self.ann)
+        self.assertEqual((rollup.completion, rollup.topic_count, rollup.total_hours), (100, 1, 1))
+        # The moved topic's record is in a batch of the old program, so it no longer counts.
+        self.record(self.bob, self.django, 100, batch=java_batch)
+        self.assertEqual(self.rollup(self.bob, java_batch).completion, 100)
+        self.assertMatchesRebuild()
+
+        self.basics.delete()
+        self.assertEqual(self.rollup(self.ann).completion, 0)
+        self.assertMatchesRebuild()
+
+    def test_record_moving_between_batches(self):
+        other = Batch.objects.create(name='Python 2', program=self.python)
+        record = self.record(self.ann, self.django, 100)
+        self.assertEqual(batch_rollups(), {self.batch.pk: (75, 1, 0)})
+
+        record.batch = other
+        record.save()
+        self.assertFalse(TraineeProgressRollup.objects.filter(batch=self.batch).exists())
+        self.assertEqual(batch_rollups(), {other.pk: (75, 1, 0)})
+
+        record.trainee = self.bob
+        record.save()
+        self.assertEqual(list(TraineeProgressRollup.objects.values_list('trainee_id', flat=True)), [self.bob.pk])
+        self.assertMatchesRebuild()
+
+        record.delete()
+        self.assertEqual((trainee_rollups(), batch_rollups()), ({}, {}))
@@ -0,0 +1,120 @@
+"""Class time slots, the schedule interval index and the iCal feed."""
+import random
+from datetime import datetime
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from training import schedule
+from training.models import Class, ClassSlot, User
+from training.timings import format_minute, parse_timings
+
+
+class ParseTimingsTests(SimpleTestCase):
+    def parsed(self, text):
+        return [f'{format_minute(start)}-{format_minute(end)[4:]}' for start, end in parse_timings(text)]
+
+    def test_formats(self):
+        self.assertEqual(self.parsed('Mon, Wed, Fri 10:00 AM - 12:00 PM'), ['Mon 10:00-12:00', 'Wed 10:00-12:00', 'Fri 10:00-12:00'])
+        self.assertEqual(self.parsed('Tue-Thu 9-11am'), ['Tue 09:00-11:00', 'Wed 09:00-11:00', 'Thu 09:00-11:00'])
+        self.assertEqual(self.parsed('Weekends 14:00-16:00'), ['Sat 14:00-16:00', 'Sun 14:00-16:00'])
+        self.assertEqual(self.parsed('Tue 6 PM - 7 PM; Thursday 7:30 PM to 9 PM'), ['Tue 18:00-19:00', 'Thu 19:30-21:00'])
+        self.assertEqual(self.parsed('11-1 PM on Fridays'), ['Fri 11:00-13:00'])
+        self.assertEqual(len(parse_timings('6 PM - 7 PM')), 7)
+        self.assertEqual(parse_timings('To be announced'), [])
+
+    def test_past_sunday_midnight_is_split(self):
+        self.assertEqual(parse_timings('Sun 11 PM - 1 AM'), [(0, 60), (6 * 1440 + 23 * 60, 7 * 1440)])
+
+
+class ScheduleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.trainer = User.objects.create_user('sched-trainer', 't@example.com', 'pw', role='trainer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.trainer)
+        self.python = Class.objects.create(name='Python', trainer_name='Ada', class_timings='Mon, Wed 10:00 AM - 12:00 PM')
+        self.sql = Class.objects.create(name='SQL', trainer_name=' ada ', class_timings='Wed 11:30 AM - 1 PM')
+        self.late = Class.objects.create(name='Late', trainer_name='Grace', class_timings='Sun 11 PM - 1 AM',
+                                         google_meet_link='https://meet.example.com/late')
+
+    def test_slots_follow_timings(self):
+        self.assertEqual(ClassSlot.objects.filter(klass=self.python).count(), 2)
+        self.python.class_timings = 'Fri 9-10 AM'
+        self.python.save()
+        self.assertEqual(list(ClassSlot.objects.filter(klass=self.python).values_list('start', 'end')), [(4 * 1440 + 540, 4 * 1440 + 600)])
+
+    def test_upcoming(self):
+        # Wednesday 11:00: Python is running, SQL starts at 11:30.
+        now = timezone.make_aware(datetime(2026, 10, 14, 11, 0))
+        results = schedule.upcoming(now, hours=1)
+        self.assertEqual([(r['name'], r['start'].hour, r['start'].minute) for r in results], [('Python', 10, 0), ('SQL', 11, 30)])
+        # Sunday 22:30 over the week boundary: the late class, both halves.
+        now = timezone.make_aware(datetime(2026, 10, 18, 22, 30))
+        results = schedule.upcoming(now, hours=12)
+        self.assertEqual([(r['name'], r['start'].day, r['start'].hour) for r in results],
+                         [('Late', 18, 23), ('Late', 19, 0), ('Python', 19, 10)])
+        self.python.is_active = False
+        self.python.save()
+        self.assertEqual([r['name'] for r in schedule.upcoming(now, hours=12)], ['Late', 'Late'])
+
+    def test_conflicts_and_free_slots(self):
+        conflicts = self.client.get('/api/classes/conflicts/').data['results']
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual([c['name'] for c in conflicts[0]['classes']], ['Python', 'SQL'])
+        self.assertEqual((conflicts[0]['overlap_start'], conflicts[0]['overlap_end'], conflicts[0]['overlap_minutes']), ('Wed 11:30', 'Wed 12:00', 30))
+        self.assertEqual(self.client.get('/api/classes/conflicts/?trainer=Grace').data['count'], 0)
+
+        free = self.client.get('/api/classes/free-slots/?trainer=ada&day_start=09:00&day_end=14:00&min_minutes=60').data['results']
+        self.assertEqual([(f['start'], f['end']) for f in free if f['start'].startswith(('Mon', 'Wed'))],
+                         [('Mon 09:00', 'Mon 10:00'), ('Mon 12:00', 'Mon 14:00'), ('Wed 09:00', 'Wed 10:00'), ('Wed 13:00', 'Wed 14:00')])
+        self.assertEqual(self.client.get('/api/classes/free-slots/?day_start=18:00&day_end=09:00').status_code, 400)
+
+    def test_index_is_reused_until_a_class_changes(self):
+        index = schedule.get_index()
+        with self.assertNumQueries(1):  # the version counters only
+            self.assertIs(schedule.get_index(), index)
+        self.python.is_active = False
+        self.python.save()
+        rebuilt = schedule.get_index()
+        self.assertIsNot(rebuilt, index)
+        self.assertNotIn(self.python.pk, {slot.class_id for slot in rebuilt.intervals().slots})
+        # Rewriting the slots alone also counts as a change.
+        schedule.sync_slots(self.sql)
+        self.assertIsNot(schedule.get_index(), rebuilt)
+
+    def test_index_matches_brute_force(self):
+        rng = random.Random(7)
+        slots = []
+        for n in range(500):
+            start = rng.randrange(0, 7 * 1440 - 240)
+            slots.append(schedule.Slot(start, start + rng.randrange(15, 240), n, f'c{n}', f't{n % 20}', '', None, ''))
+        index = schedule.ScheduleIndex(slots)
+        for _ in range(200):
+            a = rng.randrange(0, 7 * 1440)
+            b = a + rng.randrange(1, 600)
+            expected = sorted(s.class_id for s in slots if s.start < b and s.end > a)
+            self.assertEqual(sorted(s.class_id for s in index.intervals().overlapping(a, b)), expected)
+        expected = {
+            (x.class_id, y.class_id) for x in slots for y in slots
+            if x.trainer_name == y.trainer_name and x.class_id < y.class_id and x.start < y.end and y.start < x.end
+        }
+        self.assertEqual({tuple(sorted((x.class_id, y.class_id))) for x, y in index.conflicts()}, expected)
+
+    def test_calendar_feed(self):
+        response = self.client.get('/api/classes/calendar/', HTTP_ACCEPT='text/calendar')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode('utf-8')
+        self.assertEqual(body.count('BEGIN:VEVENT'), 5)
+        self.assertIn('RRULE:FREQ=WEEKLY', body)
+        self.assertIn('URL:https://meet.example.com/late', body)
+        self.assertTrue(all(len(line.encode('utf-8')) <= 75 for line in body.split('\r\n')))
+
+        with self.assertNumQueries(1):
+            cached = self.client.get('/api/classes/calendar/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.sql.delete()
+        self.assertEqual(self.client.get('/api/classes/calendar/').content.decode('utf-8').count('BEGIN:VEVENT'), 4)
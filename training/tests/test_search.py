@@ -0,0 +1,93 @@
+"""Full-text search index, run on both the FTS5 and the portable backend."""
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from training import search
+from training.models import Class, Program, ProgramTopic, SearchTerm, User
+
+
+class SearchIndexTests:
+    def setUp(self):
+        self.admin = User.objects.create_superuser('search-admin', 'search@example.com', 'pw', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.python = Program.objects.create(name='Python Fundamentals', description='Variables, loops and functions.')
+        self.data = Program.objects.create(name='Data Engineering', description='Pipelines written in Python and SQL.')
+        self.cafe = Program.objects.create(name='Café operations', description='Running a small business.')
+        self.topic = ProgramTopic.objects.create(program=self.data, topic_name='Python generators')
+        self.klass = Class.objects.create(name='Evening cohort', trainer_name='Grace Hopper', class_timings='Mon 6 PM')
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.ids('/api/programs/?search=python'), [self.python.id, self.data.id])
+        self.assertEqual(search.search(Program, 'PYTH'), [self.python.id, self.data.id])
+
+    def test_every_word_must_match_as_a_prefix(self):
+        self.assertEqual(self.ids('/api/programs/?search=pyth%20sql'), [self.data.id])
+        self.assertEqual(self.ids('/api/programs/?search=python%20cobol'), [])
+        self.assertEqual(self.ids('/api/programs/?search=cafe'), [self.cafe.id])
+
+    def test_explicit_ordering_wins(self):
+        self.assertEqual(self.ids('/api/programs/?search=python&ordering=-name'), [self.python.id, self.data.id])
+        self.assertEqual(self.ids('/api/programs/?search=python&ordering=name'), [self.data.id, self.python.id])
+
+    def test_topics_and_classes(self):
+        self.assertEqual(self.ids('/api/program-topics/?search=generator'), [self.topic.id])
+        self.assertEqual(self.ids('/api/classes/?search=hopper'), [self.klass.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.python.name = 'Rust Fundamentals'
+        self.python.save()
+        self.assertEqual(search.search(Program, 'python'), [self.data.id])
+        self.assertEqual(search.search(Program, 'rust'), [self.python.id])
+        self.data.delete()
+        self.assertEqual(search.search(Program, 'python'), [])
+        self.assertEqual(search.search(ProgramTopic, 'generators'), [])
+
+    def test_rebuild(self):
+        Program.objects.filter(pk=self.cafe.pk).update(name='Bakery operations')
+        self.assertEqual(search.search(Program, 'bakery'), [])
+        self.assertEqual(search.rebuild(), {'program': 3, 'topic': 1, 'class': 1})
+        self.assertEqual(search.search(Program, 'bakery'), [self.cafe.id])
+        self.assertEqual(search.search(Program, 'python'), [self.python.id, self.data.id])
+
+    def test_migration_indexes_existing_rows(self):
+        SearchTerm.objects.all().delete()
+        if search.uses_fts5(connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        self.assertEqual(search.search(Program, 'python'), [])
+
+        migration = import_module('training.migrations.0011_search_index')
+        migration.index_existing_rows(apps, SimpleNamespace(connection=connection))
+        self.assertEqual(self.ids('/api/programs/?search=python'), [self.python.id, self.data.id])
+        self.assertEqual(self.ids('/api/program-topics/?search=generator'), [self.topic.id])
+        self.assertEqual(search.search(Class, 'grace'), [self.klass.id])
+
+
+class FTS5SearchTests(SearchIndexTests, TestCase):
+    def setUp(self):
+        if not search.uses_fts5(connection.alias):
+            self.skipTest('SQLite FTS5 is not available')
+        super().setUp()
+
+    def test_uses_the_virtual_table(self):
+        self.assertFalse(SearchTerm.objects.exists())
+
+
+@override_settings(SEARCH_BACKEND='python')
+class PythonSearchTests(SearchIndexTests, TestCase):
+    def test_uses_postings(self):
+        self.assertEqual(
+            set(SearchTerm.objects.filter(kind='program', object_id=self.python.id).values_list('term', flat=True)),
+            {'python', 'fundamentals', 'variables', 'loops', 'and', 'functions'},
+        )
@@ -0,0 +1,121 @@
+"""Dashboard counters kept current by signals, their migration backfill and the summary endpoint."""
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from training import stats
+from training.models import Batch, BatchTrainee, Class, DashboardCounter, Program, ProgressRecord, User
+
+
+def counters():
+    return set(DashboardCounter.objects.filter(value__gt=0).values_list('metric', 'bucket', 'trainee_id', 'value'))
+
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('stats-admin', 's@example.com', 'pw', role='admin')
+        self.ann = User.objects.create_user('stats-ann', 'ann@example.com', 'pw', role='trainee')
+        self.bob = User.objects.create_user('stats-bob', 'bob@example.com', 'pw', role='trainee')
+        self.program = Program.objects.create(name='Python')
+        self.batch = Batch.objects.create(name='Python 1', program=self.program)
+
+    def counter(self, metric, bucket='', trainee=None):
+        return DashboardCounter.objects.filter(metric=metric, bucket=bucket, trainee=trainee).values_list('value', flat=True).first() or 0
+
+    def test_create_update_and_delete_move_the_counters(self):
+        enrollment = BatchTrainee.objects.create(batch=self.batch, trainee=self.ann)
+        self.assertEqual((self.counter('batch_trainees', 'enrolled'), self.counter('batch_trainees', 'enrolled', self.ann)), (1, 1))
+
+        # A bucket change moves the row between buckets, globally and per trainee.
+        enrollment.status = 'completed'
+        enrollment.save()
+        self.assertEqual(self.counter('batch_trainees', 'enrolled'), 0)
+        self.assertEqual((self.counter('batch_trainees', 'completed'), self.counter('batch_trainees', 'completed', self.ann)), (1, 1))
+
+        # So does moving it to another trainee.
+        enrollment.trainee = self.bob
+        enrollment.save()
+        self.assertEqual((self.counter('batch_trainees', 'completed', self.ann), self.counter('batch_trainees', 'completed', self.bob)), (0, 1))
+
+        # Saves that only touch untracked fields leave the counters alone.
+        enrollment.completion_date = None
+        enrollment.save(update_fields=['completion_date'])
+        self.assertEqual(self.counter('batch_trainees', 'completed'), 1)
+
+        enrollment.delete()
+        self.assertEqual((self.counter('batch_trainees', 'completed'), self.counter('batch_trainees', 'completed', self.bob)), (0, 0))
+        self.program.delete()
+        self.assertEqual((self.counter('programs'), self.counter('batches', 'scheduled')), (0, 0))
+        self.assertFalse(DashboardCounter.objects.filter(value__lt=0).exists())
+
+    def test_maintained_counters_match_a_rebuild(self):
+        Class.objects.create(name='Intro', trainer_name='Ada', class_timings='Mon 10:00 AM - 11:00 AM')
+        ProgressRecord.objects.create(batch=self.batch, trainee=self.ann, status='completed', completion_percentage=100)
+        record = ProgressRecord.objects.create(batch=self.batch, trainee=self.bob)
+        record.status = 'in_progress'
+        record.save()
+        BatchTrainee.objects.create(batch=self.batch, trainee=self.bob, status='dropped')
+        self.bob.role = 'trainer'
+        self.bob.save()
+        maintained = counters()
+        stats.rebuild_counters()
+        self.assertEqual(maintained, counters())
+
+    def test_migration_backfills_existing_rows(self):
+        BatchTrainee.objects.create(batch=self.batch, trainee=self.ann)
+        ProgressRecord.objects.create(batch=self.batch, trainee=self.ann)
+        expected = counters()
+        DashboardCounter.objects.all().delete()
+        import_module('training.migrations.0006_dashboardcounter').count_rows(apps, None)
+        self.assertEqual(counters(), expected)
+
+    def test_global_counters_are_unique(self):
+        DashboardCounter.objects.create(metric='widgets', bucket='', value=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DashboardCounter.objects.create(metric='widgets', bucket='', value=1)
+        DashboardCounter.objects.create(metric='widgets', bucket='', trainee=self.ann, value=1)
+
+    def test_delta_retries_the_update_when_another_transaction_created_the_row(self):
+        DashboardCounter.objects.create(metric='widgets', bucket='', value=2)
+        update = QuerySet.update
+        calls = []
+
+        def racing_update(queryset, **kwargs):
+            # The first UPDATE runs before the competing insert is visible.
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=racing_update):
+            stats.apply_deltas({('widgets', '', None): 3})
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(list(DashboardCounter.objects.filter(metric='widgets').values_list('value', flat=True)), [5])
+
+    def test_summary_is_scoped_to_the_user(self):
+        BatchTrainee.objects.create(batch=self.batch, trainee=self.ann, status='in_progress')
+        BatchTrainee.objects.create(batch=self.batch, trainee=self.bob)
+        ProgressRecord.objects.create(batch=self.batch, trainee=self.bob)
+        client = APIClient()
+
+        client.force_authenticate(self.admin)
+        summary = client.get('/api/dashboard/summary/').data
+        self.assertEqual(summary['role'], 'admin')
+        self.assertEqual(summary['batch_trainees']['total'], 2)
+        self.assertEqual(summary['batch_trainees']['by_status']['dropped'], 0)
+        self.assertEqual(summary['progress_records']['total'], 1)
+        self.assertEqual(summary['users']['by_role'], {'admin': 1, 'trainer': 0, 'trainee': 2})
+        self.assertEqual(summary['batches'], {'total': 1, 'by_status': {'scheduled': 1, 'running': 0, 'completed': 0, 'cancelled': 0}})
+
+        client.force_authenticate(self.ann)
+        summary = client.get('/api/dashboard/summary/').data
+        self.assertEqual(summary['batch_trainees']['total'], 1)
+        self.assertEqual(summary['batch_trainees']['by_status']['in_progress'], 1)
+        self.assertEqual(summary['progress_records']['total'], 0)
+        self.assertNotIn('users', summary)
+        self.assertEqual(summary['programs'], {'total': 1})
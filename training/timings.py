@@ -0,0 +1,122 @@
+"""Parse free-text class timings into weekly recurring slots.
+
+``Class.class_timings`` is typed by trainers, e.g. ``"Mon, Wed, Fri 10:00 AM -
+12:00 PM"``, ``"Mon-Fri 9-11am"``, ``"Weekends 14:00-16:00"`` or
+``"Tue 6 PM - 7 PM; Thu 7:30 PM to 9 PM"``.  :func:`parse_timings` turns such a
+string into ``(start, end)`` pairs in minutes from Monday 00:00; a slot that
+runs past Sunday midnight is split in two.  Strings without a recognisable time
+range give no slots; a time range without any day means every day.
+
+Migration 0013 backfilled slots with its own frozen copy of this parser; after
+changing it, run ``manage.py rebuild_class_slots`` to re-derive existing slots.
+"""
+import re
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+WEEKDAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+DAYS = {
+    'm': 0, 'mo': 0, 'mon': 0, 'monday': 0, 'mondays': 0,
+    'tu': 1, 'tue': 1, 'tues': 1, 'tuesday': 1, 'tuesdays': 1,
+    'w': 2, 'wed': 2, 'weds': 2, 'wednesday': 2, 'wednesdays': 2,
+    'th': 3, 'thu': 3, 'thur': 3, 'thurs': 3, 'thursday': 3, 'thursdays': 3,
+    'f': 4, 'fr': 4, 'fri': 4, 'friday': 4, 'fridays': 4,
+    'sa': 5, 'sat': 5, 'saturday': 5, 'saturdays': 5,
+    'su': 6, 'sun': 6, 'sunday': 6, 'sundays': 6,
+}
+DAY_GROUPS = {
+    'daily': range(7), 'everyday': range(7),
+    'weekday': range(5), 'weekdays': range(5),
+    'weekend': (5, 6), 'weekends': (5, 6),
+}
+RANGE_WORDS = {'-', '–', '—', 'to', 'through', 'thru', 'till', 'until'}
+
+_CLOCK = r'(\d{1,2})(?:[:.](\d{2}))?(?:\s*([ap])\.?(?:m\.?)?(?![a-z]))?'
+_TIME_RANGE = re.compile(
+    rf'(?<![\d:]){_CLOCK}\s*(?:-|–|—|to|till|until)\s*{_CLOCK}(?![\d:])',
+    re.IGNORECASE,
+)
+_DAY_TOKEN = re.compile(r'[a-z]+|[-–—]', re.IGNORECASE)
+
+
+def _minutes(hour, minute, meridiem):
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower() == 'p' else 0)
+    if hour > 24 or minute > 59:
+        return None
+    return min(hour * 60 + minute, MINUTES_PER_DAY)
+
+
+def _time_range(match):
+    start_h, start_m, start_ap, end_h, end_m, end_ap = match.groups()
+    if end_ap and not start_ap:
+        # "9-11 AM" means 9 AM; "11-1 PM" means 11 AM.
+        start_ap = end_ap
+        if _minutes(start_h, start_m, start_ap) is not None and _minutes(start_h, start_m, start_ap) > _minutes(end_h, end_m, end_ap):
+            start_ap = 'a' if end_ap.lower() == 'p' else 'p'
+    start, end = _minutes(start_h, start_m, start_ap), _minutes(end_h, end_m, end_ap)
+    if start is None or end is None or start == end:
+        return None
+    return start, end
+
+
+def _days(text):
+    """Weekdays (0 = Monday) named in ``text``, with ``Mon-Fri`` style ranges expanded."""
+    tokens = [t.lower() for t in _DAY_TOKEN.findall(text)]
+    days = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token in DAY_GROUPS:
+            days.extend(DAY_GROUPS[token])
+        elif token in DAYS:
+            first = DAYS[token]
+            if i + 2 < len(tokens) and tokens[i + 1] in RANGE_WORDS and tokens[i + 2] in DAYS:
+                last = DAYS[tokens[i + 2]]
+                days.extend((first + k) % 7 for k in range((last - first) % 7 + 1))
+                i += 2
+            else:
+                days.append(first)
+        i += 1
+    return list(dict.fromkeys(days))
+
+
+def parse_timings(text):
+    """Sorted, de-duplicated ``(start, end)`` minute-of-week slots described by ``text``."""
+    if not text:
+        return []
+    slots = set()
+    days = []
+    position = 0
+    matches = list(_TIME_RANGE.finditer(text))
+    for n, match in enumerate(matches):
+        # Days are named before their time range ("Mon 9-10") or, for the last one, after it ("9-10 on Mon").
+        named = _days(text[position:match.start()])
+        if not named and n == len(matches) - 1:
+            named = _days(text[match.end():])
+        days = named or days or list(range(7))
+        position = match.end()
+        times = _time_range(match)
+        if times is None:
+            continue
+        start, end = times
+        length = end - start if end > start else end + MINUTES_PER_DAY - start
+        for day in days:
+            begin = day * MINUTES_PER_DAY + start
+            finish = begin + length
+            if finish > MINUTES_PER_WEEK:
+                slots.add((begin, MINUTES_PER_WEEK))
+                slots.add((0, finish - MINUTES_PER_WEEK))
+            else:
+                slots.add((begin, finish))
+    return sorted(slots)
+
+
+def format_minute(minute):
+    """``'Mon 10:00'`` for a minute of the week."""
+    day, minute = divmod(minute, MINUTES_PER_DAY)
+    return f'{WEEKDAY_NAMES[day % 7]} {minute // 60:02d}:{minute % 60:02d}'
@@ -1,6 +1,6 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path
-from . import views
+from . import events, views
 router = DefaultRouter()
 router.register(r'users', views.UserViewSet)
 router.register(r'programs', views.ProgramViewSet)
@@ -21,4 +21,10 @@ urlpatterns = router.urls + [
     path('password-reset/', views.password_reset_request, name='password_reset_request'),
     path('password-reset/confirm/', views.password_reset_confirm, name='password_reset_confirm'),
     path('auth/user/', views.get_current_user, name='current_user'),
+    path('dashboard/summary/', views.dashboard_summary, name='dashboard_summary'),
+    path('analytics/cohorts/', views.cohort_analytics, name='cohort_analytics'),
+    path('compliance/', views.compliance_summary, name='compliance_summary'),
+    path('compliance/trainees/<int:trainee_id>/', views.trainee_compliance, name='trainee_compliance'),
+    path('events/batches/<int:pk>/', events.event_stream, {'kind': 'batches'}, name='batch_events'),
+    path('events/trainees/<int:pk>/', events.event_stream, {'kind': 'trainees'}, name='trainee_events'),
 ]
@@ -1,25 +1,39 @@
 from rest_framework import viewsets, permissions, filters, status, generics
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.utils.dateparse import parse_date, parse_datetime
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import HttpResponse
+import io
 import secrets
-from datetime import timedelta
-from .models import User, Program, ProgramTopic, Batch, BatchTrainer, BatchTrainee, Designation, DesignationProgram, TraineeDesignation, ProgressRecord, AuditLog, PasswordResetToken, Class
+from datetime import datetime, timedelta
+from .models import User, Program, ProgramTopic, Batch, BatchTrainer, BatchTrainee, Designation, DesignationProgram, TraineeDesignation, ProgressRecord, AuditLog, PasswordResetToken, Class, TraineeProgressRollup, BatchProgressRollup
 from .serializers import *
 from .permissions import IsAdmin, IsTrainerOrAdmin
+from .pagination import KeysetCursorPagination
+from .caching import ConditionalGetMixin, ProgramTreeCacheMixin, etag_matches, weak_etag
+from .exports import ExportMixin
+from .fieldsets import SparseFieldsetMixin
+from .search import IndexedSearchFilter
+from .audit import audit_sink
+from .audit_archive import AuditTimeline
+from . import analytics, bulk, compliance, enrollment, outbox, schedule, stats
 
 class StandardListMixin:
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter)
+    filter_backends = (DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter)
     search_fields = ()
     ordering_fields = '__all__'
     filterset_fields = ()
 
-class UserViewSet(viewsets.ModelViewSet, StandardListMixin):
+class UserViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet, StandardListMixin):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdmin]
@@ -27,21 +41,60 @@ class UserViewSet(viewsets.ModelViewSet, StandardListMixin):
     ordering_fields = ('id','username','email')
     filterset_fields = ('role', 'is_active_flag')
 
-class ProgramViewSet(viewsets.ModelViewSet, StandardListMixin):
-    queryset = Program.objects.all()
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def bulk_import(self, request):
+        """
+        Create users from an uploaded CSV (``file``) in one transaction.
+        Optional ``designation``/``batch`` ids (repeatable) are assigned to every trainee,
+        and ``dry_run=true`` only validates. Nothing is written if any row is invalid.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'Upload the CSV as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            designation_ids = [int(v) for v in request.data.getlist('designation')]
+            batch_ids = [int(v) for v in request.data.getlist('batch')]
+        except ValueError:
+            return Response({'detail': 'designation and batch must be ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        unknown = {
+            name: ids for name, ids in (
+                ('designation', bulk.unknown_ids(Designation, designation_ids)),
+                ('batch', bulk.unknown_ids(Batch, batch_ids)),
+            ) if ids
+        }
+        if unknown:
+            return Response({name: [f'Invalid pk "{i}" - object does not exist.' for i in ids] for name, ids in unknown.items()},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        rows, errors = bulk.parse_user_import(stream, designation_ids, batch_ids)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.USER_IMPORT_MAX_ROWS:
+            return Response({'detail': f'At most {settings.USER_IMPORT_MAX_ROWS} rows per import.'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.data.get('dry_run') in ('1', 'true', 'True'):
+            return Response({'valid': len(rows)})
+
+        created, timings = bulk.import_users(rows, created_by=request.user, workers=settings.USER_IMPORT_HASH_WORKERS or None)
+        return Response({'created': [user.pk for user in created], 'timings': timings}, status=status.HTTP_201_CREATED)
+
+class ProgramViewSet(ProgramTreeCacheMixin, SparseFieldsetMixin, viewsets.ModelViewSet, StandardListMixin):
+    queryset = Program.objects.prefetch_related(
+        Prefetch('topics', queryset=ProgramTopic.objects.order_by('topic_order', 'id'))
+    ).order_by('id')
     serializer_class = ProgramSerializer
     permission_classes = [IsAdmin]
     search_fields = ('name','description')
     filterset_fields = ('is_active',)
     ordering_fields = ('name','created_at')
 
-class ProgramTopicViewSet(viewsets.ModelViewSet, StandardListMixin):
+class ProgramTopicViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet, StandardListMixin):
     queryset = ProgramTopic.objects.all()
     serializer_class = ProgramTopicSerializer
     permission_classes = [IsAdmin]
     filterset_fields = ('program',)
 
-class BatchViewSet(viewsets.ModelViewSet, StandardListMixin):
+class BatchViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet, StandardListMixin):
     queryset = Batch.objects.all()
     serializer_class = BatchSerializer
     permission_classes = [IsTrainerOrAdmin]
@@ -49,16 +102,55 @@ class BatchViewSet(viewsets.ModelViewSet, StandardListMixin):
     filterset_fields = ('program','status')
     ordering_fields = ('start_date','end_date')
 
-class BatchTrainerViewSet(viewsets.ModelViewSet, StandardListMixin):
+    @action(detail=True, methods=['get'], url_path='progress-summary')
+    def progress_summary(self, request, pk=None):
+        batch = self.get_object()
+        rollup = BatchProgressRollup.objects.filter(batch=batch).first()
+        trainees = TraineeProgressRollup.objects.filter(batch=batch).order_by('-completion', 'trainee_id')
+        return Response({
+            'batch': batch.id,
+            'summary': BatchProgressRollupSerializer(rollup).data if rollup else None,
+            'trainees': TraineeProgressRollupSerializer(trainees, many=True).data,
+        })
+
+    @action(detail=False, methods=['get'], url_path='progress-summary')
+    def bulk_progress_summary(self, request):
+        """
+        Batch rollups for ``?ids=1,2,3``, or for every batch matching the list filters
+        """
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                batch_ids = [int(i) for i in ids.split(',') if i.strip()]
+            except ValueError:
+                return Response({'ids': 'Expected a comma-separated list of batch ids.'}, status=status.HTTP_400_BAD_REQUEST)
+            batches = self.get_queryset().filter(pk__in=batch_ids)
+        else:
+            batches = self.filter_queryset(self.get_queryset())
+        rollups = BatchProgressRollup.objects.filter(batch__in=batches).order_by('batch_id')
+        page = self.paginate_queryset(rollups)
+        if page is not None:
+            return self.get_paginated_response(BatchProgressRollupSerializer(page, many=True).data)
+        return Response(BatchProgressRollupSerializer(rollups, many=True).data)
+
+class BatchTrainerViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet, StandardListMixin):
     queryset = BatchTrainer.objects.all()
     serializer_class = BatchTrainerSerializer
     permission_classes = [IsTrainerOrAdmin]
 
-class BatchTraineeViewSet(viewsets.ModelViewSet, StandardListMixin):
+class BatchTraineeViewSet(ConditionalGetMixin, ExportMixin, SparseFieldsetMixin, viewsets.ModelViewSet, StandardListMixin):
     queryset = BatchTrainee.objects.all()
     serializer_class = BatchTraineeSerializer
     permission_classes = [permissions.IsAuthenticated]
     filterset_fields = ('batch','trainee','status')
+    export_filename = 'enrollments'
+    export_columns = (
+        ('id', 'id'), ('batch', 'batch_id'), ('batch_name', 'batch__name'), ('program_name', 'batch__program__name'),
+        ('trainee', 'trainee_id'), ('trainee_username', 'trainee__username'),
+        ('trainee_first_name', 'trainee__first_name'), ('trainee_last_name', 'trainee__last_name'),
+        ('enrollment_date', 'enrollment_date'), ('completion_date', 'completion_date'), ('status', 'status'),
+        ('rating', 'rating'), ('feedback', 'feedback'), ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    )
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
@@ -67,25 +159,93 @@ class BatchTraineeViewSet(viewsets.ModelViewSet, StandardListMixin):
             return BatchTrainee.objects.filter(trainee=user)
         return BatchTrainee.objects.all()
 
-class DesignationViewSet(viewsets.ModelViewSet, StandardListMixin):
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            self._claim_seat(serializer.validated_data['batch'].pk, serializer.validated_data.get('status', 'enrolled'))
+            serializer.save()
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        batch = serializer.validated_data.get('batch', instance.batch)
+        with transaction.atomic():
+            # Moving to another batch, or off the waitlist, takes a seat.
+            if batch.pk != instance.batch_id or not enrollment.holds_seat(instance.status):
+                self._claim_seat(batch.pk, serializer.validated_data.get('status', instance.status))
+            serializer.save()
+
+    def _claim_seat(self, batch_id, status):
+        """Lock the batch and refuse a seat-holding enrollment once it is full."""
+        if not enrollment.holds_seat(status):
+            return
+        batch = enrollment.lock_batches([batch_id])[batch_id]
+        if not enrollment.allocate(batch, 1):
+            raise ValidationError({'batch': ['This batch is full.']})
+
+    @action(detail=False, methods=['post'], url_path='bulk', permission_classes=[IsTrainerOrAdmin])
+    def bulk_enroll(self, request):
+        """
+        Enroll many trainees in one batch in one transaction, in the order given.
+        {"batch": id, "trainees": [ids], "overflow": "reject" | "trim" | "waitlist"}: trainees
+        past the capacity fail the whole request (409), are left out, or are waitlisted.
+        """
+        serializer = BatchEnrollmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if not Batch.objects.filter(pk=data['batch']).exists():
+            return Response({'batch': [f'Invalid pk "{data["batch"]}" - object does not exist.']}, status=status.HTTP_400_BAD_REQUEST)
+        errors = bulk.validate_enrollment(data['batch'], data['trainees'])
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = bulk.enroll_trainees(data['batch'], data['trainees'], request.user, data['overflow'])
+        if result['duplicates']:
+            errors = [
+                {'trainee': ['This trainee is already in the batch.']} if trainee_id in result['duplicates'] else {}
+                for trainee_id in data['trainees']
+            ]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        if result['refused'] and data['overflow'] == 'reject':
+            return Response({
+                'detail': f'The batch has {result["free_seats"]} free seats; {len(data["trainees"])} requested.',
+                'free_seats': result['free_seats'],
+            }, status=status.HTTP_409_CONFLICT)
+        return Response({
+            'enrolled': [row.pk for row in result['enrolled']],
+            'waitlisted': [row.pk for row in result['waitlisted']],
+            'refused': result['refused'],
+            'free_seats': result['free_seats'],
+        })
+
+class DesignationViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet, StandardListMixin):
     queryset = Designation.objects.all()
     serializer_class = DesignationSerializer
     permission_classes = [IsAdmin]
 
-class DesignationProgramViewSet(viewsets.ModelViewSet, StandardListMixin):
+class DesignationProgramViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet, StandardListMixin):
     queryset = DesignationProgram.objects.all()
     serializer_class = DesignationProgramSerializer
     permission_classes = [IsAdmin]
 
-class TraineeDesignationViewSet(viewsets.ModelViewSet, StandardListMixin):
+class TraineeDesignationViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet, StandardListMixin):
     queryset = TraineeDesignation.objects.all()
     serializer_class = TraineeDesignationSerializer
     permission_classes = [IsAdmin]
 
-class ProgressRecordViewSet(viewsets.ModelViewSet, StandardListMixin):
+class ProgressRecordViewSet(ConditionalGetMixin, ExportMixin, SparseFieldsetMixin, viewsets.ModelViewSet, StandardListMixin):
     queryset = ProgressRecord.objects.all()
     serializer_class = ProgressRecordSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetCursorPagination
+    cursor_ordering = ('-last_updated', '-id')
+    export_filename = 'progress-records'
+    export_columns = (
+        ('id', 'id'), ('trainee', 'trainee_id'), ('trainee_username', 'trainee__username'),
+        ('trainee_first_name', 'trainee__first_name'), ('trainee_last_name', 'trainee__last_name'),
+        ('batch', 'batch_id'), ('batch_name', 'batch__name'), ('program_name', 'batch__program__name'),
+        ('topic', 'topic_id'), ('topic_name', 'topic__topic_name'), ('status', 'status'),
+        ('completion_percentage', 'completion_percentage'), ('notes', 'notes'),
+        ('last_updated', 'last_updated'), ('updated_by_username', 'updated_by__username'),
+    )
     filterset_fields = ('trainee','batch','status')
     def get_queryset(self):
         user = self.request.user
@@ -99,26 +259,101 @@ class ProgressRecordViewSet(viewsets.ModelViewSet, StandardListMixin):
         else:
             serializer.save()
 
-class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = AuditLog.objects.all().order_by('-created_at')
+    bulk_max_rows = 5000
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_upsert(self, request):
+        """
+        Insert or update many (trainee, batch, topic) progress rows in one transaction.
+        Accepts a list of rows or {"records": [...]}; nothing is written if any row is invalid.
+        """
+        rows = request.data.get('records') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'detail': 'Expected a non-empty list of progress rows.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.bulk_max_rows:
+            return Response({'detail': f'At most {self.bulk_max_rows} rows per request.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = ProgressRecordBulkRowSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            errors = serializer.errors
+            if isinstance(errors, dict):
+                # Newer DRF versions report list errors sparsely, keyed by index.
+                errors = [errors.get(i, {}) for i in range(len(rows))]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        validated = serializer.validated_data
+        user = request.user
+        if getattr(user,'role','') == 'trainee':
+            for row in validated:
+                row['trainee'] = user.id
+
+        errors, created, updated = bulk.upsert_progress(validated, user)
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'created': [record.pk for record in created],
+            'updated': [record.pk for record in updated],
+        })
+
+class AuditLogViewSet(ConditionalGetMixin, ExportMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = AuditLog.objects.all().order_by('-created_at', '-id')
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = KeysetCursorPagination
+    cursor_ordering = ('-created_at', '-id')
+    export_filename = 'audit-logs'
+    export_ordering = ('created_at', 'id')
+    export_columns = (
+        ('id', 'id'), ('created_at', 'created_at'), ('user', 'user_id'), ('username', 'user__username'),
+        ('action', 'action'), ('table_name', 'table_name'), ('record_id', 'record_id'),
+        ('old_values', 'old_values'), ('new_values', 'new_values'),
+        ('ip_address', 'ip_address'), ('user_agent', 'user_agent'),
+    )
 
-class ClassViewSet(viewsets.ModelViewSet, StandardListMixin):
-    queryset = Class.objects.all()
-    serializer_class = ClassSerializer
-    permission_classes = [IsTrainerOrAdmin]
-    search_fields = ('name', 'trainer_name', 'description')
-    filterset_fields = ('is_active',)
-    ordering_fields = ('name', 'created_at')
+    def get_time_range(self):
+        """``(start, end)`` from ``?created_after=`` / ``?created_before=`` (ISO date or datetime)."""
+        bounds = []
+        for name in ('created_after', 'created_before'):
+            value = self.request.query_params.get(name)
+            if not value:
+                bounds.append(None)
+                continue
+            parsed = parse_datetime(value)
+            if parsed is None:
+                day = parse_date(value)
+                if day is None:
+                    raise ValidationError({name: ['Expected an ISO 8601 date or datetime.']})
+                parsed = datetime.combine(day, datetime.min.time())
+            bounds.append(timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed)
+        return tuple(bounds)
 
-    def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        start, end = self.get_time_range()
+        if start is not None:
+            queryset = queryset.filter(created_at__gte=start)
+        if end is not None:
+            queryset = queryset.filter(created_at__lt=end)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        A time range (``created_after``/``created_before``) also covers rows moved to the
+        monthly archives by ``archive_audit_logs``, newest first after the live rows.
+        Keyset (``?cursor=``) pages only read the live table.
+        """
+        start, end = self.get_time_range()
+        if (start is None and end is None) or self.paginator.uses_cursor(request):
+            return super().list(request, *args, **kwargs)
+        # Archived rows are appended newest first, so the live rows keep that order too.
+        queryset = self.filter_queryset(self.get_queryset()).order_by(*self.cursor_ordering)
+        timeline = AuditTimeline(queryset, start, end)
+        page = self.paginate_queryset(timeline)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
-class ClassViewSet(viewsets.ModelViewSet, StandardListMixin):
+class ClassViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet, StandardListMixin):
     queryset = Class.objects.all()
     serializer_class = ClassSerializer
     permission_classes = [IsTrainerOrAdmin]
@@ -129,6 +364,75 @@ class ClassViewSet(viewsets.ModelViewSet, StandardListMixin):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    def _trainer(self, request):
+        return request.query_params.get('trainer') or None
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def upcoming(self, request):
+        """
+        Active classes running at any time in the next ``hours`` hours (default 24, max 168),
+        one entry per occurrence with its start/end, soonest first. Optional ?trainer=<name>.
+        """
+        try:
+            hours = float(request.query_params.get('hours', 24))
+        except ValueError:
+            raise ValidationError({'hours': ['Must be a number.']})
+        if not 0 < hours <= 168:
+            raise ValidationError({'hours': ['Must be between 0 and 168.']})
+        results = schedule.upcoming(hours=hours, trainer=self._trainer(request))
+        return Response({'hours': hours, 'count': len(results), 'results': results})
+
+    @action(detail=False, methods=['get'])
+    def conflicts(self, request):
+        """Pairs of active classes of the same trainer whose weekly slots overlap. Optional ?trainer=<name>."""
+        results = schedule.conflicts(self._trainer(request))
+        return Response({'count': len(results), 'results': results})
+
+    @action(detail=False, methods=['get'], url_path='free-slots')
+    def free_slots(self, request):
+        """
+        Weekly gaps of at least ``min_minutes`` (default 30) between ``day_start`` and ``day_end``
+        (default 08:00-18:00) with no active class, for one ?trainer=<name> or across all classes.
+        """
+        errors = {}
+        bounds = {}
+        for name, default in (('day_start', '08:00'), ('day_end', '18:00')):
+            value = request.query_params.get(name, default)
+            try:
+                hour, minute = (int(part) for part in value.split(':'))
+                if not (0 <= hour <= 24 and 0 <= minute < 60 and hour * 60 + minute <= 24 * 60):
+                    raise ValueError
+                bounds[name] = hour * 60 + minute
+            except ValueError:
+                errors[name] = ['Expected HH:MM.']
+        try:
+            min_minutes = int(request.query_params.get('min_minutes', 30))
+            if min_minutes < 1:
+                raise ValueError
+        except ValueError:
+            errors['min_minutes'] = ['Must be a positive whole number.']
+        if not errors and bounds['day_start'] >= bounds['day_end']:
+            errors['day_end'] = ['Must be after day_start.']
+        if errors:
+            raise ValidationError(errors)
+        results = schedule.free_slots(self._trainer(request), bounds['day_start'], bounds['day_end'], min_minutes)
+        return Response({'count': len(results), 'results': results})
+
+    @action(detail=False, methods=['get'], url_path='calendar', permission_classes=[permissions.IsAuthenticated],
+            content_negotiation_class=schedule.IgnoreClientContentNegotiation)
+    def calendar(self, request):
+        """Every active class slot as a weekly recurring event (text/calendar). Optional ?trainer=<name>."""
+        version, text = schedule.calendar(self._trainer(request))
+        etag = weak_etag('class-calendar', version, request.get_full_path())
+        if etag_matches(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(text, content_type='text/calendar; charset=utf-8')
+            response['Content-Disposition'] = 'inline; filename="classes.ics"'
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
 # Authentication Views
 class UserRegistrationView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -141,7 +445,7 @@ class UserRegistrationView(generics.CreateAPIView):
         user = serializer.save()
 
         # Log the registration
-        AuditLog.objects.create(
+        audit_sink.record(
             user=user,
             action='USER_REGISTERED',
             table_name='User',
@@ -165,41 +469,29 @@ def password_reset_request(request):
     # Generate secure token
     token = secrets.token_urlsafe(32)
     expires_at = timezone.now() + timedelta(hours=1)
-
-    # Create reset token
-    PasswordResetToken.objects.create(
-        user=user,
-        token=token,
-        expires_at=expires_at
-    )
-
-    # Send email (implementation depends on email backend)
     reset_link = f"{getattr(settings, 'FRONTEND_URL', 'http://localhost:3000')}/reset-password?token={token}"
-    try:
-        send_mail(
+
+    # The email goes out through the outbox (manage.py process_outbox), never inside the request.
+    with transaction.atomic():
+        PasswordResetToken.objects.create(
+            user=user,
+            token=token,
+            expires_at=expires_at
+        )
+        outbox.enqueue(
             'Password Reset Request',
             f'Click the following link to reset your password: {reset_link}',
-            getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@example.com'),
             [user.email],
-            fail_silently=False,
         )
-    except Exception as e:
-        # Log email failure but don't expose to user
-        AuditLog.objects.create(
+
+        # Log the request
+        audit_sink.record(
             user=user,
-            action='PASSWORD_RESET_EMAIL_FAILED',
+            action='PASSWORD_RESET_REQUESTED',
             table_name='PasswordResetToken',
-            new_values={'error': str(e)}
+            new_values={'email': user.email}
         )
 
-    # Log the request
-    AuditLog.objects.create(
-        user=user,
-        action='PASSWORD_RESET_REQUESTED',
-        table_name='PasswordResetToken',
-        new_values={'email': user.email}
-    )
-
     return Response({"message": "Password reset email sent"})
 
 @api_view(['POST'])
@@ -220,7 +512,7 @@ def password_reset_confirm(request):
     reset_token.save()
 
     # Log the reset
-    AuditLog.objects.create(
+    audit_sink.record(
         user=user,
         action='PASSWORD_RESET_COMPLETED',
         table_name='User',
@@ -229,6 +521,60 @@ def password_reset_confirm(request):
 
     return Response({"message": "Password reset successfully"})
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def dashboard_summary(request):
+    """
+    Per-role dashboard counts read from the incrementally maintained stats table
+    """
+    return Response(stats.dashboard_summary(request.user))
+
+@api_view(['GET'])
+@permission_classes([IsTrainerOrAdmin])
+def cohort_analytics(request):
+    """
+    Completion distributions per batch and program, and completion rates per topic.
+    Optional ?program=<id> narrows the cohort and ?threshold=<0-100> sets the straggler cutoff.
+    """
+    try:
+        program_id = int(request.query_params['program']) if request.query_params.get('program') else None
+        threshold = float(request.query_params['threshold']) if request.query_params.get('threshold') else None
+    except ValueError:
+        return Response({'detail': 'program must be an id and threshold a number.'}, status=status.HTTP_400_BAD_REQUEST)
+    if threshold is not None and not 0 <= threshold <= 100:
+        return Response({'threshold': ['Must be between 0 and 100.']}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(analytics.cohort_analytics(program_id, threshold))
+
+@api_view(['GET'])
+@permission_classes([IsTrainerOrAdmin])
+def compliance_summary(request):
+    """
+    Required-program compliance per designation.
+    With ?designation=<id>, the trainee x required-program status matrix of that designation.
+    """
+    designation = request.query_params.get('designation')
+    if not designation:
+        return Response(compliance.designation_summaries())
+    try:
+        designation_id = int(designation)
+    except ValueError:
+        return Response({'detail': 'designation must be an id.'}, status=status.HTTP_400_BAD_REQUEST)
+    if not Designation.objects.filter(pk=designation_id).exists():
+        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(compliance.designation_matrix(designation_id))
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def trainee_compliance(request, trainee_id):
+    """
+    Every program a trainee's designations require, with its status. Trainees only see their own.
+    """
+    if getattr(request.user, 'role', '') == 'trainee' and request.user.pk != trainee_id:
+        return Response({'detail': 'You can only view your own compliance.'}, status=status.HTTP_403_FORBIDDEN)
+    if not User.objects.filter(pk=trainee_id).exists():
+        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(compliance.trainee_compliance(trainee_id))
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_current_user(request):
@@ -23,14 +23,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "training.middleware.RequestMetricsMiddleware",
+    "training.middleware.CompressionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "training.middleware.ReplicaRoutingMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "training.middleware.AuditBufferMiddleware",
 ]
 
 ROOT_URLCONF = "training_tracker.urls"
@@ -52,17 +56,79 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "training_tracker.wsgi.application"
+ASGI_APPLICATION = "training_tracker.asgi.application"
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Database: SQLite by default; DB_ENGINE=mysql uses the MYSQL_* variables.  Setting
+# MYSQL_REPLICA_HOST adds a "replica" alias that list/retrieve requests read from
+# (see training.db).
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+
+if DB_ENGINE == "mysql":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.getenv("MYSQL_DATABASE", "training_db"),
+            'USER': os.getenv("MYSQL_USER", ""),
+            'PASSWORD': os.getenv("MYSQL_PASSWORD", ""),
+            'HOST': os.getenv("MYSQL_HOST", "127.0.0.1"),
+            'PORT': os.getenv("MYSQL_PORT", "3306"),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'charset': 'utf8mb4'},
+        }
     }
-}
+    if os.getenv("MYSQL_REPLICA_HOST"):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv("MYSQL_REPLICA_HOST"),
+            'PORT': os.getenv("MYSQL_REPLICA_PORT", DATABASES['default']['PORT']),
+            'USER': os.getenv("MYSQL_REPLICA_USER", DATABASES['default']['USER']),
+            'PASSWORD': os.getenv("MYSQL_REPLICA_PASSWORD", DATABASES['default']['PASSWORD']),
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("SQLITE_PATH", BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+
+DATABASE_ROUTERS = ["training.db.PrimaryReplicaRouter"]
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# After a request writes, the same client reads from the primary for this long
+DATABASE_REPLICA_PIN_SECONDS = float(os.getenv("DATABASE_REPLICA_PIN_SECONDS", "5"))
+
+# Applied to every new connection by training.db.tune_connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+MYSQL_TRANSACTION_ISOLATION = os.getenv("MYSQL_TRANSACTION_ISOLATION", "READ-COMMITTED")
+MYSQL_SQL_MODE = os.getenv("MYSQL_SQL_MODE", "STRICT_TRANS_TABLES")
+MYSQL_LOCK_WAIT_TIMEOUT = int(os.getenv("MYSQL_LOCK_WAIT_TIMEOUT", "10"))
 
 
 AUTH_USER_MODEL = 'training.User'
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+PROGRAM_CACHE_TIMEOUT = int(os.getenv("PROGRAM_CACHE_TIMEOUT", "3600"))
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv("ANALYTICS_CACHE_TIMEOUT", "300"))
+ANALYTICS_STRAGGLER_THRESHOLD = float(os.getenv("ANALYTICS_STRAGGLER_THRESHOLD", "50"))
+COMPLIANCE_CACHE_TIMEOUT = int(os.getenv("COMPLIANCE_CACHE_TIMEOUT", "300"))
+CLASS_CALENDAR_CACHE_TIMEOUT = int(os.getenv("CLASS_CALENDAR_CACHE_TIMEOUT", "3600"))
+
+# Full-text search: "auto" uses SQLite FTS5 when available, "python" forces the portable index.
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "1000"))
+
 AUTH_PASSWORD_VALIDATORS = []
 LANGUAGE_CODE = "en-us"
 TIME_ZONE = "UTC"
@@ -71,21 +137,84 @@ USE_TZ = True
 STATIC_URL = "/static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# JSON renderer/parser: "orjson" (training.renderers; DRF's encoder if orjson is missing) or "json" (DRF's)
+JSON_BACKENDS = {
+    "orjson": ("training.renderers.ORJSONRenderer", "training.renderers.ORJSONParser"),
+    "json": ("rest_framework.renderers.JSONRenderer", "rest_framework.parsers.JSONParser"),
+}
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson")
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "training.authentication.CachedJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
-        "rest_framework.filters.SearchFilter",
+        "training.search.IndexedSearchFilter",
         "rest_framework.filters.OrderingFilter",
     ),
+    "DEFAULT_RENDERER_CLASSES": (JSON_BACKENDS[JSON_BACKEND][0], "rest_framework.renderers.BrowsableAPIRenderer"),
+    "DEFAULT_PARSER_CLASSES": (
+        JSON_BACKENDS[JSON_BACKEND][1],
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
 }
 
+# Audit log writer: "sync", "buffered" (bulk insert per request) or "background"
+AUDIT_LOG_MODE = os.getenv("AUDIT_LOG_MODE", "buffered")
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "2.0"))
+AUDIT_LOG_MAX_BUFFER = int(os.getenv("AUDIT_LOG_MAX_BUFFER", "500"))
+
+# Audit retention: rows older than this are moved to monthly archives by archive_audit_logs
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "365"))
+AUDIT_ARCHIVE_DIR = Path(os.getenv("AUDIT_ARCHIVE_DIR", BASE_DIR / "audit_archive"))
+
+# Email is queued in OutboxEmail and delivered by `manage.py process_outbox`
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "25"))
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "False") == "True"
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", "30"))
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "noreply@example.com")
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
+EMAIL_OUTBOX_BACKOFF_SECONDS = int(os.getenv("EMAIL_OUTBOX_BACKOFF_SECONDS", "30"))
+EMAIL_OUTBOX_MAX_BACKOFF_SECONDS = int(os.getenv("EMAIL_OUTBOX_MAX_BACKOFF_SECONDS", "3600"))
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", "7"))
+
+# Request metrics: Server-Timing header on every response, Prometheus text at /metrics
+# (needs "Authorization: Bearer <METRICS_TOKEN>"; without a token only open when DEBUG is on)
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "True") == "True"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# gzip responses of at least this many bytes for clients sending "Accept-Encoding: gzip"
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+# Server-sent event streams (/api/events/..., ASGI only). EVENT_RELAY: "memory" delivers within
+# one process; "db" relays through the StreamEvent table so every worker sees every event
+EVENT_RELAY = os.getenv("EVENT_RELAY", "memory")
+EVENT_RELAY_POLL_INTERVAL = float(os.getenv("EVENT_RELAY_POLL_INTERVAL", "1.0"))
+EVENT_RELAY_LOOKBACK_SECONDS = float(os.getenv("EVENT_RELAY_LOOKBACK_SECONDS", "5"))
+EVENT_RELAY_RETENTION_SECONDS = int(os.getenv("EVENT_RELAY_RETENTION_SECONDS", "3600"))
+EVENT_STREAM_KEEPALIVE_SECONDS = float(os.getenv("EVENT_STREAM_KEEPALIVE_SECONDS", "15"))
+EVENT_STREAM_MAX_SECONDS = float(os.getenv("EVENT_STREAM_MAX_SECONDS", "600"))
+EVENT_STREAM_QUEUE_SIZE = int(os.getenv("EVENT_STREAM_QUEUE_SIZE", "256"))
+
+# In-process cache of JWT-authenticated users (entries, seconds)
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+
+# Processes used to hash passwords during bulk user imports (0 = one per CPU)
+USER_IMPORT_HASH_WORKERS = int(os.getenv("USER_IMPORT_HASH_WORKERS", "0"))
+USER_IMPORT_MAX_ROWS = int(os.getenv("USER_IMPORT_MAX_ROWS", "10000"))
+
 CORS_ALLOWED_ORIGINS = os.environ.get("CORS_ALLOWED_ORIGINS", "").split(",")
 
 CORS_ALLOW_CREDENTIALS = True
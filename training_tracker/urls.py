@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
 from rest_framework_simplejwt.views import TokenRefreshView
+from training.metrics import metrics_view
 from training.views import CustomTokenObtainPairView
 
 def api_root(request):
@@ -14,7 +15,8 @@ def api_root(request):
             "api": "/api/",
             "api_auth": "/api-auth/",
             "token_obtain": "/api/token/",
-            "token_refresh": "/api/token/refresh/"
+            "token_refresh": "/api/token/refresh/",
+            "metrics": "/metrics"
         }
     })
 
@@ -25,4 +27,5 @@ urlpatterns = [
     path("api-auth/", include("rest_framework.urls")),
     path("api/token/", CustomTokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("metrics", metrics_view, name="metrics"),
 ]